@@ -1,11 +1,20 @@
 import os
+import csv
 import json
+import time
+import uuid
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 from src.database import Database
 from src.content_gen import ContentGenerator
 from src.crm_manager import HubSpotManager
 from src.analytics_engine import AnalyticsEngine
 from src.optimizer import ContentOptimizer
+from src.pipeline import (CampaignContext, Pipeline, PipelineRun, StageFailed, campaign_pipeline,
+                          checkpointer, sync_contacts)
 
 # Load environment variables
 load_dotenv()
@@ -15,193 +24,150 @@ def print_banner():
     print("🚀 NOVAMIND CONTENT PIPELINE")
     print("="*60 + "\n")
 
-def load_mock_contacts():
-    with open('data/mock_contacts.json', 'r') as f:
-        data = json.load(f)
-    return data['contacts']
-
-def run_full_pipeline(topic: str, additional_context: str = ""):
-    print_banner()
-    
-    # Initialize components
-    print("🔧 Initializing pipeline components...")
-    db = Database()
-    generator = ContentGenerator()
-    crm = HubSpotManager()
-    analytics = AnalyticsEngine(db)
-    optimizer = ContentOptimizer()
-    print("✅ All components initialized\n")
-    
-    # STEP 1: Generate blog content
-    print("=" * 60)
-    print("STEP 1: GENERATING BLOG CONTENT")
-    print("=" * 60)
-    
-    blog_content = generator.generate_blog_post(topic, additional_context)
-    blog_id = db.save_blog_post(
-        topic=topic,
-        title=blog_content['title'],
-        outline=blog_content['outline'],
-        content=blog_content['content'],
-        metadata={'status': 'published'}
-    )
-    
-    print(f"\n📝 Blog Post Created (ID: {blog_id})")
-    print(f"   Title: {blog_content['title']}")
-    print(f"   Word Count: {len(blog_content['content'].split())}")
-    
-    # STEP 2: Generate personalized newsletters
+def print_step(title: str):
     print("\n" + "=" * 60)
-    print("STEP 2: GENERATING PERSONALIZED NEWSLETTERS")
+    print(title)
     print("=" * 60)
+
+def print_report(results: dict):
+    blog = results['blog']
+    newsletters = results['newsletters']['newsletters']
     
-    newsletters = generator.generate_newsletter_variations(blog_content)
+    print_step("STEP 1: BLOG CONTENT")
+    print(f"\n📝 Blog Post Created (ID: {blog['blog_id']})")
+    print(f"   Title: {blog['blog']['title']}")
+    print(f"   Word Count: {len(blog['blog']['content'].split())}")
     
-    newsletter_ids = {}
+    print_step("STEP 2: PERSONALIZED NEWSLETTERS")
     for persona_key, newsletter in newsletters.items():
-        newsletter_id = db.save_newsletter(
-            blog_id=blog_id,
-            persona=newsletter['persona'],
-            subject_line=newsletter['subject_line'],
-            preview_text=newsletter['preview_text'],
-            content=newsletter['content']
-        )
-        newsletter_ids[persona_key] = newsletter_id
-        
         print(f"\n📧 Newsletter for {newsletter['persona']}")
         print(f"   Subject: {newsletter['subject_line']}")
         print(f"   Preview: {newsletter['preview_text'][:50]}...")
     
-    # STEP 3: Create alternative versions (BONUS FEATURE)
-    print("\n" + "=" * 60)
-    print("STEP 3: GENERATING ALTERNATIVE VERSIONS (A/B TEST)")
-    print("=" * 60)
-    
-    alternatives = {}
-    for persona_key, newsletter in newsletters.items():
-        alts = generator.generate_alternative_versions(
-            newsletter['subject_line'],
-            content_type="subject_line",
-            count=2
-        )
-        alternatives[persona_key] = alts
-        
-        print(f"\n🔄 Alternatives for {newsletter['persona']}:")
+    print_step("STEP 3: ALTERNATIVE VERSIONS (A/B TEST)")
+    for persona_key, alts in results['alternatives'].items():
+        print(f"\n🔄 Alternatives for {newsletters[persona_key]['persona']}:")
         for i, alt in enumerate(alts, 1):
             print(f"   {i}. {alt}")
     
-    # STEP 4: Create contacts in CRM
-    print("\n" + "=" * 60)
-    print("STEP 4: SYNCING CONTACTS TO HUBSPOT")
-    print("=" * 60)
-    
-    contacts = load_mock_contacts()
-    contact_map = crm.bulk_create_contacts(contacts)
-    
-    # Group contacts by persona
-    contacts_by_persona = {}
-    for contact in contacts:
-        persona = contact['persona']
-        if persona not in contacts_by_persona:
-            contacts_by_persona[persona] = []
-        contacts_by_persona[persona].append(contact_map.get(contact['email']))
-    
-    # STEP 5: Send newsletters
-    print("\n" + "=" * 60)
-    print("STEP 5: DISTRIBUTING NEWSLETTERS")
-    print("=" * 60)
-    
-    campaign_name = f"{blog_content['title']} - {topic}"
-    campaign_id = db.create_campaign(blog_id, campaign_name, hubspot_campaign_id="sim_campaign")
-    
-    for persona_key, newsletter in newsletters.items():
-        contact_ids = contacts_by_persona.get(persona_key, [])
-        if contact_ids:
-            crm.send_email_to_segment(
-                persona=newsletter['persona'],
-                contact_ids=contact_ids,
-                email_content=newsletter
-            )
-    
-    print(f"\n✅ Campaign launched: {campaign_name}")
+    print_step("STEPS 4-5: CONTACT SYNC & DISTRIBUTION")
+    if 'contacts' in results:
+        print(f"\n👥 {len(results['contacts']['contact_map'])} contacts synced")
+    print(f"✅ Campaign launched: {results['send']['campaign_name']}")
     
-    # STEP 6: Collect performance data
-    print("\n" + "=" * 60)
-    print("STEP 6: COLLECTING PERFORMANCE METRICS")
-    print("=" * 60)
-    
-    metrics_by_persona = {}
-    for persona_key in newsletters.keys():
-        metrics = crm.generate_simulated_stats(persona_key)
-        db.save_performance_metrics(campaign_id, persona_key, metrics)
-        metrics_by_persona[persona_key] = metrics
-        
+    print_step("STEP 6: PERFORMANCE METRICS")
+    for persona_key, metrics in results['metrics'].items():
         print(f"\n📊 {persona_key.upper()} Metrics:")
         print(f"   Sent: {metrics['sent']}")
         print(f"   Opens: {metrics['opens']} ({metrics['open_rate']}%)")
         print(f"   Clicks: {metrics['clicks']} ({metrics['click_rate']}%)")
     
-    # STEP 7: Analyze performance
-    print("\n" + "=" * 60)
-    print("STEP 7: ANALYZING PERFORMANCE & GENERATING INSIGHTS")
-    print("=" * 60)
-    
-    analysis = analytics.analyze_campaign_performance(campaign_id, metrics_by_persona)
-    
+    print_step("STEP 7: PERFORMANCE ANALYSIS & INSIGHTS")
+    analysis = results['analysis']
     print(f"\n📈 Campaign Summary:")
     print(f"   Total Sent: {analysis['summary']['total_sent']}")
     print(f"   Average Open Rate: {analysis['summary']['avg_open_rate']}%")
     print(f"   Average Click Rate: {analysis['summary']['avg_click_rate']}%")
     
-    print(f"\n🏆 Best Performer: {analysis['best_performer']['persona']}")
-    print(f"   Click Rate: {analysis['best_performer']['click_rate']}%")
+    best, worst = analysis['best_performer'], analysis['worst_performer']
+    print(f"\n🏆 Best Performer: {best['persona']}")
+    print(f"   Click Rate: {best['click_rate']}% (95% CI {best['ci'][0]}-{best['ci'][1]}%)")
     
-    print(f"\n📉 Needs Improvement: {analysis['worst_performer']['persona']}")
-    print(f"   Click Rate: {analysis['worst_performer']['click_rate']}%")
+    print(f"\n📉 Needs Improvement: {worst['persona']}")
+    print(f"   Click Rate: {worst['click_rate']}% (95% CI {worst['ci'][0]}-{worst['ci'][1]}%)")
+    
+    comparison = analysis['best_vs_worst']
+    print(f"   Difference {'is' if comparison['significant'] else 'is not'} significant "
+          f"(p={comparison['p_value']})")
     
     print(f"\n🤖 AI Insights:\n{analysis['ai_insights']}")
     
-    # Save analysis
-    analytics.save_analysis_report(campaign_id, analysis)
+    print_step("STEP 8: OPTIMIZATION SUGGESTIONS")
+    print(f"\n💡 Suggestions for {results['optimize']['persona']}:")
+    for suggestion in results['optimize']['suggestions']:
+        print(f"   • {suggestion}")
     
-    # STEP 8: Generate optimization suggestions (BONUS)
-    print("\n" + "=" * 60)
-    print("STEP 8: GENERATING OPTIMIZATION SUGGESTIONS")
-    print("=" * 60)
+    print_step("STEP 9: NEXT BLOG TOPICS")
+    print("\n📝 Recommended topics for next campaign:")
+    for i, topic in enumerate(results['next_topics'], 1):
+        print(f"   {i}. {topic}")
+
+def print_timings(run: PipelineRun):
+    report = run.timing_report()
+    print(f"\n⏱️  Stage timings (wall {report['wall_seconds']}s vs {report['stage_seconds']}s sequential):")
+    for name, timing in sorted(report['stages'].items(), key=lambda item: item[1]['start']):
+        print(f"   {name:<17} +{timing['start']:>7.2f}s  {timing['seconds']:>7.2f}s")
+
+def execute_campaign_run(db, ctx: CampaignContext, run_id: str, pipeline: Pipeline,
+                         results: Optional[Dict] = None) -> PipelineRun:
+    """Runs the pipeline, checkpointing each stage's output under run_id."""
+    # Independent stages (A/B alternatives, contact sync, newsletter
+    # persistence, topic suggestions) run concurrently. Each stage's output
+    # is checkpointed so a failed run can be resumed.
+    db.update_pipeline_run(run_id, 'running')
+    try:
+        run = pipeline.run(ctx, results=results,
+                           on_stage_done=checkpointer(db, run_id, pipeline))
+    except Exception as e:
+        # Anything escaping the scheduler (a failed stage, a checkpoint
+        # write) leaves the run resumable rather than stuck as running
+        db.update_pipeline_run(run_id, 'failed', error=str(e))
+        print(f"\n❌ [{ctx.topic}] {e}")
+        if isinstance(e, StageFailed):
+            print_timings(e.run)
+        print(f"\n♻️  Resume with: python run_pipeline.py --resume {run_id}")
+        raise
+    db.update_pipeline_run(run_id, 'succeeded')
+    return run
+
+def run_full_pipeline(topic: str = "", additional_context: str = "",
+                      resume_run_id: Optional[str] = None, use_batch_api: bool = False):
+    print_banner()
     
-    worst_performer = analysis['worst_performer']['persona']
-    worst_metrics = metrics_by_persona[worst_performer]
-    worst_newsletter = newsletters[worst_performer]
+    # Initialize components
+    print("🔧 Initializing pipeline components...")
+    db = Database()
     
-    improvements = optimizer.suggest_improvements(
-        worst_newsletter['content'],
-        worst_metrics
+    if resume_run_id:
+        saved = db.get_pipeline_run(resume_run_id)
+        if saved is None:
+            raise ValueError(f"Pipeline run {resume_run_id} not found")
+        run_id = resume_run_id
+        topic = saved['params'].get('topic', '')
+        additional_context = saved['params'].get('additional_context', '')
+        results = saved['checkpoints']
+        pipeline = campaign_pipeline().resumable(results)
+    else:
+        run_id = uuid.uuid4().hex
+        db.create_pipeline_run(run_id, {'topic': topic, 'additional_context': additional_context})
+        results = {}
+        pipeline = campaign_pipeline()
+    
+    generator = ContentGenerator(use_batch_api=use_batch_api)
+    ctx = CampaignContext(
+        db=db,
+        generator=generator,
+        crm=HubSpotManager(db=db),
+        analytics=AnalyticsEngine(db),
+        optimizer=ContentOptimizer(),
+        topic=topic,
+        additional_context=additional_context,
+        wait_for_insights=True,
+        run_id=run_id
     )
+    print("✅ All components initialized\n")
     
-    print(f"\n💡 Suggestions for {worst_performer}:")
-    for suggestion in improvements['suggestions']:
-        print(f"   • {suggestion}")
-    
-    # Save suggestions to database
-    for suggestion in improvements['suggestions']:
-        db.save_optimization_suggestion(
-            campaign_id=campaign_id,
-            suggestion_type="content_improvement",
-            suggestion_text=suggestion,
-            confidence_score=improvements['confidence']
-        )
+    print(f"🆔 Run ID: {run_id}")
+    if results:
+        print(f"♻️  Resuming \"{topic}\"; skipping completed stages: {', '.join(sorted(results))}")
     
-    # STEP 9: Suggest next topics (BONUS)
-    print("\n" + "=" * 60)
-    print("STEP 9: SUGGESTING NEXT BLOG TOPICS")
-    print("=" * 60)
+    run = execute_campaign_run(db, ctx, run_id, pipeline, results)
     
-    campaigns = db.get_all_campaigns()
-    next_topics = analytics.suggest_next_topics(campaigns)
+    print_report(run.results)
+    print_timings(run)
     
-    print("\n📝 Recommended topics for next campaign:")
-    for i, topic in enumerate(next_topics, 1):
-        print(f"   {i}. {topic}")
+    blog_id = run.results['blog']['blog_id']
+    campaign_id = run.results['send']['campaign_id']
     
     # Final summary
     print("\n" + "=" * 60)
@@ -212,20 +178,152 @@ def run_full_pipeline(topic: str, additional_context: str = ""):
     print(f"   • Campaign ID: {campaign_id}")
     print(f"   • Database: data/novamind.db")
     print(f"   • Analysis: outputs/campaign_{campaign_id}_analysis_*.json")
+    llm_stats = generator.llm.stats()
+    print(f"   • LLM calls: {llm_stats['requests']} requests, "
+          f"{llm_stats['batch_requests']} batched, {llm_stats['retries']} retries, "
+          f"cache {llm_stats['cache']['hits']} hits / {llm_stats['cache']['misses']} misses")
     print("\n")
     
     return {
+        'run_id': run_id,
         'blog_id': blog_id,
         'campaign_id': campaign_id,
-        'analysis': analysis
+        'analysis': run.results['analysis'],
+        'timings': run.timing_report()
     }
 
-def main():
-    # Example usage
-    topic = "Boost Productivity with AI in 2025"
-    context = "Discover how AI tools can streamline your daily tasks, automate routine work, and help your team achieve more in less time"
+def load_topics(path: str) -> List[Dict]:
+    """Reads {"topic", "context"} entries from a .jsonl or .csv file."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    
+    topics = []
+    for row in rows:
+        topic = (row.get('topic') or '').strip()
+        if topic:
+            topics.append({'topic': topic, 'context': (row.get('context') or '').strip()})
+    return topics
+
+def run_batch(topics_path: str, workers: int = 3, use_batch_api: bool = False):
+    """Runs one campaign per topic on a bounded worker pool.
+
+    All runs share one database pool, LLM gateway and CRM session, and the
+    contact list is synced once up front for the whole batch. With
+    use_batch_api each campaign's newsletters and A/B alternatives go
+    through the Message Batches API.
+    """
+    print_banner()
+    topics = load_topics(topics_path)
+    print(f"📚 {len(topics)} topics from {topics_path}, {workers} at a time")
+    
+    print("🔧 Initializing shared pipeline components...")
+    db = Database(pool_size=max(5, workers * 2))
+    generator = ContentGenerator(use_batch_api=use_batch_api)
+    components = {
+        'db': db,
+        'generator': generator,
+        'crm': HubSpotManager(db=db),
+        'analytics': AnalyticsEngine(db),
+        'optimizer': ContentOptimizer()
+    }
+    print("✅ All components initialized\n")
+    
+    contacts = sync_contacts(CampaignContext(**components))
+    
+    def run_topic(entry: Dict) -> Dict:
+        run_id = uuid.uuid4().hex
+        summary = {'topic': entry['topic'], 'run_id': run_id}
+        started = time.perf_counter()
+        
+        # One topic failing, for whatever reason, must not lose the others'
+        # results or the batch report
+        try:
+            db.create_pipeline_run(run_id, {'topic': entry['topic'],
+                                            'additional_context': entry['context']})
+            ctx = CampaignContext(**components, topic=entry['topic'],
+                                  additional_context=entry['context'], wait_for_insights=True,
+                                  run_id=run_id)
+            run = execute_campaign_run(db, ctx, run_id, campaign_pipeline(),
+                                       results={'contacts': contacts})
+        except Exception as e:
+            return dict(summary, status='failed', error=str(e),
+                        wall_seconds=round(time.perf_counter() - started, 3))
+        
+        analysis = run.results['analysis']
+        print(f"✅ [{entry['topic']}] campaign {run.results['send']['campaign_id']} complete")
+        return dict(
+            summary,
+            status='succeeded',
+            blog_id=run.results['blog']['blog_id'],
+            campaign_id=run.results['send']['campaign_id'],
+            title=run.results['blog']['blog']['title'],
+            avg_open_rate=analysis['summary']['avg_open_rate'],
+            avg_click_rate=analysis['summary']['avg_click_rate'],
+            best_performer=analysis['best_performer']['persona'],
+            worst_performer=analysis['worst_performer']['persona'],
+            newsletter_failures=run.results['newsletters']['failures'],
+            wall_seconds=round(run.wall_seconds, 3)
+        )
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="novamind-topic") as executor:
+        runs = list(executor.map(run_topic, topics))
+    
+    succeeded = [r for r in runs if r['status'] == 'succeeded']
+    report = {
+        'topics_file': topics_path,
+        'finished_at': datetime.now().isoformat(),
+        'workers': workers,
+        'batch_api': use_batch_api,
+        'contacts_synced': len(contacts['contact_map']),
+        'succeeded': len(succeeded),
+        'failed': len(runs) - len(succeeded),
+        'wall_seconds': round(time.perf_counter() - started, 3),
+        'llm': generator.llm.stats(),
+        'runs': runs
+    }
     
-    run_full_pipeline(topic, context)
+    os.makedirs('outputs', exist_ok=True)
+    report_path = f"outputs/batch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    print_step("BATCH SUMMARY")
+    for r in runs:
+        if r['status'] == 'succeeded':
+            print(f"✅ {r['topic']}: campaign {r['campaign_id']}, "
+                  f"{r['avg_open_rate']}% open / {r['avg_click_rate']}% click, "
+                  f"best {r['best_performer']} ({r['wall_seconds']}s)")
+        else:
+            print(f"❌ {r['topic']}: {r['error']} (resume with --resume {r['run_id']})")
+    print(f"\n📊 {report['succeeded']}/{len(runs)} campaigns in {report['wall_seconds']}s, "
+          f"{report['llm']['requests']} LLM requests, {report['llm']['batch_requests']} batched")
+    print(f"   • Report: {report_path}\n")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the NovaMind content pipeline")
+    parser.add_argument("--topic", default="Boost Productivity with AI in 2025")
+    parser.add_argument("--context", default="Discover how AI tools can streamline your daily tasks, automate routine work, and help your team achieve more in less time")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="continue a failed run, skipping its completed stages")
+    parser.add_argument("--batch", metavar="TOPICS_FILE",
+                        help="run one campaign per topic in a .jsonl or .csv file")
+    parser.add_argument("--workers", type=int, default=3,
+                        help="campaigns to run at once in batch mode")
+    parser.add_argument("--batch-api", action="store_true",
+                        help="generate newsletters and A/B alternatives through the Message "
+                             "Batches API (slower, for overnight runs)")
+    args = parser.parse_args()
+    
+    if args.batch:
+        run_batch(args.batch, workers=max(1, args.workers), use_batch_api=args.batch_api)
+    else:
+        run_full_pipeline(args.topic, args.context, resume_run_id=args.resume,
+                          use_batch_api=args.batch_api)
 
 if __name__ == "__main__":
     main()
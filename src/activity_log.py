@@ -0,0 +1,123 @@
+import os
+import glob
+import gzip
+import json
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+from src.json_stream import iter_json_array
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+class ActivityLog:
+    """Append-only JSON Lines log with size-based rotation.
+
+    Each append writes a single line under an exclusive file lock, so
+    concurrent workers and processes can share one log. Once the live file
+    reaches max_bytes it is moved aside into a timestamped segment and only
+    the newest backup_count segments are kept. Segments are optionally
+    gzipped by the writer that rotated them, after it releases the lock.
+    """
+
+    def __init__(self, path: str = "data/campaign_logs.jsonl", max_bytes: int = 5 * 1024 * 1024,
+                 backup_count: int = 20, compress: bool = True,
+                 legacy_path: str = "data/campaign_logs.json"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.legacy_path = legacy_path
+        self._thread_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, entry: Dict):
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        segment = None
+        with self._locked():
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            if os.path.getsize(self.path) >= self.max_bytes:
+                segment = self._rotate()
+        
+        # Compressing takes far longer than the rename, so other writers
+        # carry on appending to the new live file meanwhile
+        if segment and self.compress:
+            self._compress(segment)
+
+    def _segment_pattern(self) -> str:
+        base, ext = os.path.splitext(self.path)
+        return f"{base}.*{ext}*"
+
+    def _segments(self):
+        paths = set(glob.glob(self._segment_pattern()))
+        # Timestamped names sort chronologically. A segment that has been
+        # gzipped but not yet removed is read from its .gz copy only
+        return sorted(p for p in paths if p != self.path and not p.endswith(('.lock', '.tmp'))
+                      and f"{p}.gz" not in paths)
+
+    def _rotate(self) -> str:
+        """Moves the live file aside (under the lock) and prunes old segments."""
+        base, ext = os.path.splitext(self.path)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        segment = f"{base}.{stamp}{ext}"
+        os.replace(self.path, segment)
+
+        segments = self._segments()
+        for old in segments[:max(0, len(segments) - self.backup_count)]:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+        return segment
+
+    def _compress(self, segment: str):
+        # Written under a temporary name so readers never see a partial .gz
+        partial = f"{segment}.gz.tmp"
+        try:
+            with open(segment, 'rb') as src, gzip.open(partial, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        except FileNotFoundError:
+            # Pruned by another writer in the meantime
+            return
+        os.replace(partial, f"{segment}.gz")
+        os.remove(segment)
+
+    def iter_entries(self) -> Iterator[Dict]:
+        """Yields every entry, oldest first, reading one line at a time."""
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            # Pre-JSONL logs were a single JSON array; stream it rather than
+            # loading it whole, stopping at the first unreadable entry
+            try:
+                yield from iter_json_array(self.legacy_path)
+            except ValueError:
+                pass
+
+        for path in self._segments() + [self.path]:
+            if not os.path.exists(path):
+                continue
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
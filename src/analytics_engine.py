@@ -1,69 +1,191 @@
-import os
 import json
-from typing import Dict, List
-from anthropic import Anthropic
-from datetime import datetime
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.llm_gateway import get_gateway
+from src.stats import compare_segments, find_comparison
+from datetime import datetime, timedelta
+
+COUNT_COLUMNS = ['sent', 'delivered', 'opens', 'clicks', 'unsubscribes']
+PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
 
 class AnalyticsEngine:
     def __init__(self, db):
         self.db = db
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if api_key:
-            self.client = Anthropic(api_key=api_key)
-        else:
-            self.client = None
+        self.llm = get_gateway()
+        # Background AI insight refreshes, at most one in flight per
+        # campaign and fingerprint
+        self._insight_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="novamind-insights")
+        self._insight_refreshes: Dict[Tuple[int, str], Future] = {}
+        self._insight_lock = threading.Lock()
     
     def analyze_campaign_performance(self, campaign_id: int, 
-                                    metrics_by_persona: Dict[str, Dict]) -> Dict:
+                                    metrics_by_persona: Dict[str, Dict],
+                                    wait_for_insights: bool = False) -> Dict:
+        """Weighted rates, significance and insights for one campaign.
+
+        AI insights are reused while the campaign's metrics fingerprint is
+        unchanged. Otherwise they are regenerated in the background and the
+        basic insights are returned meanwhile, unless wait_for_insights is set.
+        """
         print(f"\n Analyzing campaign performance...")
         
-        total_sent = sum(m['sent'] for m in metrics_by_persona.values())
-        total_opens = sum(m['opens'] for m in metrics_by_persona.values())
-        total_clicks = sum(m['clicks'] for m in metrics_by_persona.values())
+        personas = list(metrics_by_persona)
+        delivered = np.array([m.get('delivered', m['sent']) for m in metrics_by_persona.values()])
+        opens = np.array([m['opens'] for m in metrics_by_persona.values()])
+        clicks = np.array([m['clicks'] for m in metrics_by_persona.values()])
         
-        avg_open_rate = sum(m['open_rate'] for m in metrics_by_persona.values()) / len(metrics_by_persona)
-        avg_click_rate = sum(m['click_rate'] for m in metrics_by_persona.values()) / len(metrics_by_persona)
+        # Rates weighted by volume: opens over delivered, clicks over opens
+        open_stats = compare_segments(personas, opens, delivered)
+        click_stats = compare_segments(personas, clicks, opens)
         
-        # Find best performing persona
-        best_persona = max(metrics_by_persona.items(), 
-                          key=lambda x: x[1]['click_rate'])
-        worst_persona = min(metrics_by_persona.items(), 
-                           key=lambda x: x[1]['click_rate'])
+        # Rank on the interval bounds so a tiny segment's lucky click rate
+        # cannot outrank a large segment's well-measured one
+        segments = click_stats['segments']
+        best = max(segments, key=lambda s: (s['ci_low'], s['rate']))
+        others = [s for s in segments if s is not best] or segments
+        worst = min(others, key=lambda s: (s['ci_high'], s['rate']))
+        best_vs_worst = find_comparison(click_stats, best['segment'], worst['segment'])
         
         analysis = {
             'summary': {
-                'total_sent': total_sent,
-                'total_opens': total_opens,
-                'total_clicks': total_clicks,
-                'avg_open_rate': round(avg_open_rate, 2),
-                'avg_click_rate': round(avg_click_rate, 2)
+                'total_sent': int(sum(m['sent'] for m in metrics_by_persona.values())),
+                'total_opens': int(opens.sum()),
+                'total_clicks': int(clicks.sum()),
+                'avg_open_rate': round(opens.sum() / delivered.sum() * 100, 2) if delivered.sum() else 0.0,
+                'avg_click_rate': round(clicks.sum() / opens.sum() * 100, 2) if opens.sum() else 0.0
             },
             'best_performer': {
-                'persona': best_persona[0],
-                'click_rate': best_persona[1]['click_rate']
+                'persona': best['segment'],
+                'click_rate': best['rate'],
+                'ci': [best['ci_low'], best['ci_high']]
             },
             'worst_performer': {
-                'persona': worst_persona[0],
-                'click_rate': worst_persona[1]['click_rate']
+                'persona': worst['segment'],
+                'click_rate': worst['rate'],
+                'ci': [worst['ci_low'], worst['ci_high']]
+            },
+            'best_vs_worst': best_vs_worst,
+            'significance': {
+                'open_rate': open_stats,
+                'click_rate': click_stats
             }
         }
         
+        variants = self.compare_variants(campaign_id)
+        if variants:
+            analysis['variants'] = variants
+        
         # Generate AI insights
-        if self.client:
-            insights = self.generate_ai_insights(metrics_by_persona, analysis)
+        if self.llm.available:
+            insights, status = self.memoised_insights(campaign_id, metrics_by_persona, analysis,
+                                                      wait=wait_for_insights)
             analysis['ai_insights'] = insights
+            analysis['ai_insights_status'] = status
         else:
             analysis['ai_insights'] = self.generate_basic_insights(analysis)
+            analysis['ai_insights_status'] = 'basic'
         
         print(f"✅ Analysis complete")
         return analysis
     
+    @staticmethod
+    def metrics_fingerprint(analysis: Dict) -> str:
+        """Hash of the analysed metrics, quantised so that noise-level changes
+        (a few extra sends, rates moving within a point) keep the same
+        fingerprint and reuse the stored insights."""
+        quantised = {}
+        for metric, result in analysis['significance'].items():
+            for segment in result['segments']:
+                trials = segment['trials']
+                quantised[f"{segment['segment']}:{metric}"] = [
+                    round(segment['rate']),
+                    float(f"{trials:.2g}") if trials else 0
+                ]
+        payload = json.dumps(quantised, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def memoised_insights(self, campaign_id: int, metrics: Dict[str, Dict], analysis: Dict,
+                          wait: bool = False) -> Tuple[str, str]:
+        """Returns (insights, status) where status is 'cached', 'fresh' or 'refreshing'."""
+        fingerprint = self.metrics_fingerprint(analysis)
+        stored = self.db.get_campaign_insights(campaign_id)
+        if stored and stored['fingerprint'] == fingerprint:
+            print("✅ Reusing AI insights for unchanged metrics")
+            return stored['insights'], 'cached'
+        
+        future = self._refresh_insights(campaign_id, fingerprint, metrics, analysis)
+        if wait:
+            insights = future.result()
+            if insights is not None:
+                return insights, 'fresh'
+        return self.generate_basic_insights(analysis), 'refreshing'
+    
+    def _refresh_insights(self, campaign_id: int, fingerprint: str, metrics: Dict[str, Dict],
+                          analysis: Dict) -> Future:
+        key = (campaign_id, fingerprint)
+        with self._insight_lock:
+            future = self._insight_refreshes.get(key)
+            if future is None:
+                future = self._insight_executor.submit(
+                    self._generate_and_store_insights, campaign_id, fingerprint, metrics, analysis
+                )
+                self._insight_refreshes[key] = future
+                future.add_done_callback(lambda _: self._forget_refresh(key))
+            return future
+    
+    def _forget_refresh(self, key: Tuple[int, str]):
+        with self._insight_lock:
+            self._insight_refreshes.pop(key, None)
+    
+    def _generate_and_store_insights(self, campaign_id: int, fingerprint: str,
+                                     metrics: Dict[str, Dict], analysis: Dict) -> Optional[str]:
+        try:
+            insights = self._request_ai_insights(metrics, analysis)
+        except Exception as e:
+            print(f"⚠️  Could not refresh AI insights for campaign {campaign_id}: {str(e)}")
+            return None
+        self.db.save_campaign_insights(campaign_id, fingerprint, insights)
+        return insights
+
+    
+    def compare_variants(self, campaign_id: int) -> Dict[str, Dict]:
+        """A/B variant comparison per persona, for personas sent more than one variant."""
+        totals: Dict[str, Dict[int, np.ndarray]] = {}
+        for row in self.db.get_campaign_performance(campaign_id):
+            counts = np.array([row['delivered'] or row['sent'], row['opens'], row['clicks']])
+            variants = totals.setdefault(row['persona'], {})
+            variants[row['variant']] = variants.get(row['variant'], 0) + counts
+        
+        comparisons = {}
+        for persona, variants in totals.items():
+            if len(variants) < 2:
+                continue
+            labels = [f"variant {variant}" for variant in sorted(variants)]
+            delivered, opens, clicks = np.array([variants[v] for v in sorted(variants)]).T
+            comparisons[persona] = {
+                'open_rate': compare_segments(labels, opens, delivered),
+                'click_rate': compare_segments(labels, clicks, opens)
+            }
+        return comparisons
+    
     def generate_ai_insights(self, metrics: Dict[str, Dict], analysis: Dict) -> str:
+        try:
+            return self._request_ai_insights(metrics, analysis)
+        except Exception as e:
+            print(f"⚠️  Could not generate AI insights: {str(e)}")
+            return self.generate_basic_insights(analysis)
+    
+    def _request_ai_insights(self, metrics: Dict[str, Dict], analysis: Dict) -> str:
         print("🤖 Generating AI-powered insights...")
         
         metrics_text = "\n".join([
-            f"- {persona}: {data['open_rate']}% open rate, {data['click_rate']}% click rate"
-            for persona, data in metrics.items()
+            f"- {s['segment']}: {s['rate']}% click rate (95% CI {s['ci_low']}-{s['ci_high']}%, "
+            f"{s['trials']} opens)"
+            for s in analysis['significance']['click_rate']['segments']
         ])
         
         prompt = f"""Analyze this email campaign performance data and provide actionable insights:
@@ -75,6 +197,7 @@ Overall Performance:
 - Average open rate: {analysis['summary']['avg_open_rate']}%
 - Average click rate: {analysis['summary']['avg_click_rate']}%
 - Best performer: {analysis['best_performer']['persona']} ({analysis['best_performer']['click_rate']}% CTR)
+- Best vs worst difference is {'' if analysis['best_vs_worst']['significant'] else 'NOT '}statistically significant (p={analysis['best_vs_worst']['p_value']})
 
 Provide:
 1. Key insights about what worked well
@@ -84,30 +207,29 @@ Provide:
 
 Keep response under 200 words and make it actionable."""
 
-        try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=500,
-                temperature=0.7,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            insights = message.content[0].text
-            print("✅ AI insights generated")
-            return insights
-            
-        except Exception as e:
-            print(f"⚠️  Could not generate AI insights: {str(e)}")
-            return self.generate_basic_insights(analysis)
+        insights = self.llm.complete(
+            prompt,
+            max_tokens=500,
+            temperature=0.7
+        )
+        print("✅ AI insights generated")
+        return insights
     
     def generate_basic_insights(self, analysis: Dict) -> str:
         best = analysis['best_performer']
         worst = analysis['worst_performer']
+        comparison = analysis.get('best_vs_worst', {})
+        if comparison.get('significant'):
+            confidence_note = f"This gap is statistically significant (p={comparison['p_value']})."
+        else:
+            confidence_note = (f"This gap is not yet statistically significant "
+                               f"(p={comparison.get('p_value', 1.0)}); gather more sends before scaling either copy.")
         
         return f"""Performance Summary:
 
 The {best['persona']} segment performed best with a {best['click_rate']}% click rate. 
 The {worst['persona']} segment had the lowest engagement at {worst['click_rate']}%.
+{confidence_note}
 
 Recommendations:
 1. Replicate successful elements from the {best['persona']} newsletter
@@ -118,7 +240,7 @@ Recommendations:
     def suggest_next_topics(self, campaign_history: List[Dict]) -> List[str]:
         print("\n💡 Generating topic suggestions...")
         
-        if not self.client:
+        if not self.llm.available:
             return [
                 "AI automation tools comparison",
                 "Workflow optimization case studies",
@@ -141,14 +263,11 @@ Suggest 5 new blog topics that:
 Return just the 5 topics, one per line."""
 
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
+            response = self.llm.complete(
+                prompt,
                 max_tokens=300,
-                temperature=0.8,
-                messages=[{"role": "user", "content": prompt}]
+                temperature=0.8
             )
-            
-            response = message.content[0].text
             topics = [line.strip('- ').strip() for line in response.split('\n') 
                      if line.strip() and not line.strip().isdigit()]
             
@@ -163,6 +282,114 @@ Return just the 5 topics, one per line."""
                 "Creative productivity hacks"
             ]
     
+    @staticmethod
+    def _window_start(months: Optional[int]) -> Optional[datetime]:
+        # Rollups are kept per whole week, so windows start on a Monday
+        if not months:
+            return None
+        since = datetime.now() - timedelta(days=30 * months)
+        return datetime.combine(since.date() - timedelta(days=since.weekday()), datetime.min.time())
+    
+    def load_rollup_frame(self, months: Optional[int] = 6, persona: Optional[str] = None,
+                          period: str = 'week') -> pd.DataFrame:
+        """Pre-aggregated totals per period, persona and topic over the last months."""
+        columns, rows = self.db.get_metric_rollups(period=period, since=self._window_start(months),
+                                                   persona=persona)
+        frame = pd.DataFrame.from_records(rows, columns=columns)
+        frame['period_start'] = pd.to_datetime(frame['period_start'])
+        return self._with_rates(frame)
+    
+    def load_campaign_frame(self, months: Optional[int] = 6,
+                            persona: Optional[str] = None) -> pd.DataFrame:
+        """Per-campaign, per-persona totals over the last months."""
+        columns, rows = self.db.get_campaign_rollups(since=self._window_start(months),
+                                                     persona=persona)
+        return self._with_rates(pd.DataFrame.from_records(rows, columns=columns))
+    
+    @staticmethod
+    def _with_rates(frame: pd.DataFrame) -> pd.DataFrame:
+        # Same definitions as the per-send metrics: opens over delivered,
+        # clicks over opens. Computed from counts so aggregates are weighted
+        # by volume rather than averaging percentages.
+        delivered = frame['delivered'].to_numpy(dtype=float)
+        opens = frame['opens'].to_numpy(dtype=float)
+        clicks = frame['clicks'].to_numpy(dtype=float)
+        frame['open_rate'] = np.round(np.divide(opens * 100, delivered, out=np.zeros_like(opens),
+                                                where=delivered > 0), 2)
+        frame['click_rate'] = np.round(np.divide(clicks * 100, opens, out=np.zeros_like(clicks),
+                                                 where=opens > 0), 2)
+        return frame
+    
+    def _aggregate(self, frame: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+        totals = frame.groupby(keys, sort=False)[COUNT_COLUMNS + ['sends', 'campaigns']].sum()
+        return self._with_rates(totals).reset_index()
+    
+    def persona_performance(self, rollups: pd.DataFrame) -> pd.DataFrame:
+        return self._aggregate(rollups, ['persona']).sort_values('click_rate', ascending=False)
+    
+    def topic_performance(self, rollups: pd.DataFrame, campaigns: pd.DataFrame,
+                          limit: int = 10) -> pd.DataFrame:
+        """Topics ranked by click rate, e.g. over frames loaded for one persona."""
+        topics = self._aggregate(rollups, ['topic'])
+        # Rollup campaign counts are per persona; count each campaign once per topic
+        topics['campaigns'] = topics['topic'].map(
+            campaigns.groupby('topic')['campaign_id'].nunique()
+        ).fillna(0).astype(int)
+        return topics.sort_values(['click_rate', 'delivered'], ascending=False).head(limit)
+    
+    def weekly_trends(self, rollups: pd.DataFrame) -> Dict:
+        """Weekly rates per persona plus the least-squares slope of each
+        persona's weekly click rate (percentage points per week)."""
+        weekly = self._aggregate(rollups, ['persona', 'period_start']).sort_values(
+            ['persona', 'period_start'])
+        
+        trends = {}
+        for persona, group in weekly.groupby('persona', sort=False):
+            weeks = ((group['period_start'] - group['period_start'].min()).dt.days / 7).to_numpy()
+            slope = np.polyfit(weeks, group['click_rate'].to_numpy(), 1)[0] if len(group) > 1 else 0.0
+            trends[persona] = {
+                'click_rate_slope': round(float(slope), 3),
+                'weeks': [
+                    {'week': week.strftime('%Y-%m-%d'), 'open_rate': float(open_rate),
+                     'click_rate': float(click_rate), 'sent': int(sent)}
+                    for week, open_rate, click_rate, sent in zip(
+                        group['period_start'], group['open_rate'], group['click_rate'], group['sent'])
+                ]
+            }
+        return trends
+    
+    def rate_percentiles(self, campaigns: pd.DataFrame) -> Dict:
+        """Distribution of per-campaign open and click rates for each persona."""
+        quantiles = campaigns.groupby('persona')[['open_rate', 'click_rate']].quantile(PERCENTILES)
+        result = {}
+        for (persona, quantile), row in quantiles.iterrows():
+            label = f"p{int(round(quantile * 100))}"
+            result.setdefault(persona, {'open_rate': {}, 'click_rate': {}})
+            result[persona]['open_rate'][label] = round(float(row['open_rate']), 2)
+            result[persona]['click_rate'][label] = round(float(row['click_rate']), 2)
+        return result
+    
+    def cross_campaign_report(self, months: Optional[int] = 6, persona: Optional[str] = None,
+                              topic_limit: int = 10) -> Dict:
+        """Persona, topic and weekly performance across every campaign sent in
+        the window, e.g. which topics perform for founders over 6 months.
+        Reads only the rollup tables."""
+        rollups = self.load_rollup_frame(months=months, persona=persona)
+        campaigns = self.load_campaign_frame(months=months, persona=persona)
+        if rollups.empty:
+            return {'campaigns': 0, 'personas': [], 'topics': [], 'trends': {}, 'percentiles': {}}
+        
+        def records(table: pd.DataFrame) -> List[Dict]:
+            return json.loads(table.to_json(orient='records'))
+        
+        return {
+            'campaigns': int(campaigns['campaign_id'].nunique()),
+            'personas': records(self.persona_performance(rollups)),
+            'topics': records(self.topic_performance(rollups, campaigns, limit=topic_limit)),
+            'trends': self.weekly_trends(rollups),
+            'percentiles': self.rate_percentiles(campaigns)
+        }
+    
     def save_analysis_report(self, campaign_id: int, analysis: Dict, 
                             output_path: str = None):
         if not output_path:
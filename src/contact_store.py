@@ -0,0 +1,296 @@
+import os
+import csv
+import json
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from src.json_stream import iter_chunks, iter_json_array
+
+# Secondary attributes indexed alongside persona
+INDEXED_FIELDS = ('company', 'jobtitle')
+
+DEFAULT_CONTACTS_PATH = "data/mock_contacts.json"
+
+# Contacts handed to the CRM sync and segment indexes at a time
+CONTACT_CHUNK_SIZE = 1000
+
+def iter_contacts(path: str) -> Iterator[Dict]:
+    """Yields contacts one at a time from a .json, .jsonl or .csv export.
+
+    JSON files may be either {"contacts": [...]} or a bare array; they are
+    parsed incrementally so the whole list is never held in memory.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    elif extension == '.csv':
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                yield {key: value for key, value in row.items() if value not in (None, '')}
+    else:
+        yield from iter_json_array(path, key='contacts')
+
+class _Vocabulary:
+    """Interns repeated strings (persona keys, companies, job titles) as small
+    integer codes so each row stores a number rather than its own string."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        if not value:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value: str) -> int:
+        return self._codes.get(value, -1)
+
+    def value(self, code: int) -> Optional[str]:
+        return self.values[code] if code >= 0 else None
+
+
+class _CodeIndex:
+    """One dictionary-encoded column plus the row ids grouped by its value.
+
+    Each row also records its position within its group's array, so moving
+    a row between groups swaps the group's last row into the gap rather
+    than scanning for it; a row whose value is unchanged is left alone.
+    """
+
+    def __init__(self):
+        self.vocab = _Vocabulary()
+        self.codes = array('i')
+        self.groups: Dict[int, array] = {}
+        self._positions = array('i')
+
+    def add_row(self):
+        self.codes.append(-1)
+        self._positions.append(-1)
+
+    def set(self, row_id: int, value: Optional[str]):
+        code = self.vocab.code(value)
+        previous = self.codes[row_id]
+        if code == previous:
+            return
+        if previous >= 0:
+            rows = self.groups[previous]
+            position = self._positions[row_id]
+            last = rows.pop()
+            if last != row_id:
+                rows[position] = last
+                self._positions[last] = position
+        self.codes[row_id] = code
+        if code >= 0:
+            rows = self.groups.setdefault(code, array('I'))
+            self._positions[row_id] = len(rows)
+            rows.append(row_id)
+        else:
+            self._positions[row_id] = -1
+
+    def value(self, row_id: int) -> Optional[str]:
+        return self.vocab.value(self.codes[row_id])
+
+    def rows(self, value: str) -> array:
+        return self.groups.get(self.vocab.lookup(value), array('I'))
+
+    def sizes(self) -> Dict[str, int]:
+        return {self.vocab.value(code): len(rows) for code, rows in self.groups.items()}
+
+
+class ContactStore:
+    """Compact contact index with precomputed segment indexes.
+
+    Only what segmenting needs is kept per contact: its email plus integer
+    codes for its persona and indexed fields, held in flat arrays by row id.
+    Names and other properties stay in the source file, which the CRM sync
+    streams directly. Personas and the secondary fields map to arrays of
+    row ids, so segment lookups cost the same regardless of list size, and
+    adding, changing or removing a contact updates them in constant time.
+    """
+
+    def __init__(self, personas: Optional[Dict] = None):
+        self.personas = personas or {}
+        self._emails: List[Optional[str]] = []
+        self._row_by_email: Dict[str, int] = {}
+        self._persona = _CodeIndex()
+        self._fields: Dict[str, _CodeIndex] = {field: _CodeIndex() for field in INDEXED_FIELDS}
+        self._persona_names = {
+            info['name'].lower(): key for key, info in self.personas.items() if 'name' in info
+        }
+        self.source_path = None
+        self.source_mtime = None
+        # Shared by request threads and job workers in the web app
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_CONTACTS_PATH,
+                  personas: Optional[Dict] = None) -> "ContactStore":
+        store = cls(personas)
+        store.load(path)
+        return store
+
+    def load(self, path: str):
+        self.upsert_many(iter_contacts(path))
+        self.source_path = path
+        self.source_mtime = os.path.getmtime(path)
+
+    def reload_if_changed(self) -> bool:
+        """Re-applies the source file when it has been modified since loading.
+
+        The store lock is taken a chunk at a time, so lookups from other
+        threads are served (from a partly applied file) during a reload.
+        """
+        with self._reload_lock:
+            if not self.source_path or not os.path.exists(self.source_path):
+                return False
+            mtime = os.path.getmtime(self.source_path)
+            if mtime == self.source_mtime:
+                return False
+
+            # One byte per existing row marks the contacts still in the file
+            with self._lock:
+                seen = bytearray(len(self._emails))
+            for chunk in iter_chunks(iter_contacts(self.source_path), CONTACT_CHUNK_SIZE):
+                with self._lock:
+                    for contact in chunk:
+                        row_id = self.upsert(contact)
+                        if row_id < len(seen):
+                            seen[row_id] = 1
+            for start in range(0, len(seen), CONTACT_CHUNK_SIZE):
+                with self._lock:
+                    for row_id in range(start, min(start + CONTACT_CHUNK_SIZE, len(seen))):
+                        email = self._emails[row_id]
+                        if email is not None and not seen[row_id]:
+                            self.remove(email)
+            self.source_mtime = mtime
+            return True
+
+    def iter_source(self) -> Iterator[Dict]:
+        """Full contact records: streamed from the source file, or the stored
+        fields when the store was not loaded from one."""
+        if self.source_path:
+            return iter_contacts(self.source_path)
+        return self.contacts()
+
+    def persona_key(self, persona: str) -> Optional[str]:
+        """Maps a persona key or display name (e.g. "Founders / Decision-Makers")
+        to its key in personas.json."""
+        if not persona:
+            return None
+        value = persona.strip().lower()
+        if value in self.personas or not self.personas:
+            return value
+        if value in self._persona_names:
+            return self._persona_names[value]
+        # Older newsletters may carry names that have since been edited;
+        # fall back to matching on the leading word
+        first_word = value.split()[0]
+        return first_word if first_word in self.personas else None
+
+    def upsert(self, contact: Dict) -> int:
+        with self._lock:
+            email = contact['email']
+            key = email.lower()
+            if key == email:
+                # Share one string between the row and the email index
+                key = email
+            row_id = self._row_by_email.get(key)
+
+            if row_id is None:
+                row_id = len(self._emails)
+                self._emails.append(email)
+                self._persona.add_row()
+                for index in self._fields.values():
+                    index.add_row()
+                self._row_by_email[key] = row_id
+            else:
+                self._emails[row_id] = email
+
+            self._persona.set(row_id, self.persona_key(contact.get('persona', '')))
+            for field, index in self._fields.items():
+                index.set(row_id, (contact.get(field) or '').strip().lower())
+            return row_id
+
+    def upsert_many(self, contacts: Iterable[Dict]):
+        for contact in contacts:
+            self.upsert(contact)
+
+    def remove(self, email: str) -> bool:
+        with self._lock:
+            row_id = self._row_by_email.pop(email.lower(), None)
+            if row_id is None:
+                return False
+            self._emails[row_id] = None
+            self._persona.set(row_id, None)
+            for index in self._fields.values():
+                index.set(row_id, None)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._row_by_email)
+
+    def contacts(self) -> Iterator[Dict]:
+        """The stored fields (email, persona and indexed fields) of every contact."""
+        with self._lock:
+            row_count = len(self._emails)
+        for row_id in range(row_count):
+            contact = self.get(row_id)
+            if contact is not None:
+                yield contact
+
+    def get(self, row_id: int) -> Optional[Dict]:
+        with self._lock:
+            if not 0 <= row_id < len(self._emails) or self._emails[row_id] is None:
+                return None
+            contact = {'email': self._emails[row_id]}
+            persona = self._persona.value(row_id)
+            if persona:
+                contact['persona'] = persona
+            for field, index in self._fields.items():
+                value = index.value(row_id)
+                if value:
+                    contact[field] = value
+            return contact
+
+    def segment(self, persona: str) -> array:
+        """A snapshot of the row ids in the persona segment."""
+        with self._lock:
+            return array('I', self._segment(persona))
+
+    def _segment(self, persona: str) -> array:
+        # The live index; only iterate it while holding the lock
+        return self._persona.rows(self.persona_key(persona) or '')
+
+    def segment_sizes(self) -> Dict[str, int]:
+        with self._lock:
+            return self._persona.sizes()
+
+    def segment_contact_ids(self, persona: str, contact_map: Dict[str, str]) -> List[str]:
+        """CRM contact ids for a persona segment, given the email -> id map from a sync."""
+        with self._lock:
+            contact_ids = []
+            for row_id in self._segment(persona):
+                contact_id = contact_map.get(self._emails[row_id])
+                if contact_id:
+                    contact_ids.append(contact_id)
+            return contact_ids
+
+    def find(self, field: str, value: str) -> List[Dict]:
+        """Contacts whose company or jobtitle matches value (case-insensitive),
+        with their stored fields."""
+        with self._lock:
+            if field not in self._fields:
+                raise ValueError(f"{field} is not indexed; choose from {', '.join(INDEXED_FIELDS)}")
+            rows = self._fields[field].rows(value.strip().lower())
+            return [self.get(row_id) for row_id in rows]
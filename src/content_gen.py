@@ -1,16 +1,35 @@
 import os
 import json
-from typing import Dict, List
-from anthropic import Anthropic
-import httpx
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+from src.llm_gateway import get_gateway
+
+NEWSLETTER_MAX_TOKENS = 800
+NEWSLETTER_TEMPERATURE = 0.8
+ALTERNATIVES_MAX_TOKENS = 300
+ALTERNATIVES_TEMPERATURE = 0.9
+
+class NewsletterGenerationError(Exception):
+    """Raised when one or more persona newsletters could not be generated."""
+
+    def __init__(self, failures: Dict[str, Exception], newsletters: Dict[str, Dict]):
+        self.failures = failures
+        self.newsletters = newsletters
+        super().__init__(
+            f"Newsletter generation failed for: {', '.join(failures)} "
+            f"({len(newsletters)} of {len(failures) + len(newsletters)} succeeded)"
+        )
+
 class ContentGenerator:
-    def __init__(self):
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if not api_key:
+    def __init__(self, max_concurrency: Optional[int] = None, use_batch_api: bool = False):
+        self.llm = get_gateway()
+        if not self.llm.available:
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
-        client=httpx.Client()
-        self.client = Anthropic(api_key=api_key,http_client=client)
         self.personas = self.load_personas()
+        self.max_concurrency = max_concurrency or int(os.getenv('NOVAMIND_LLM_CONCURRENCY', '8'))
+        # Offline mode: persona newsletters and subject line alternatives are
+        # each submitted as one Message Batches job instead of many live calls
+        self.use_batch_api = use_batch_api
     
     def load_personas(self) -> Dict:
         personas_path = 'data/personas.json'
@@ -39,10 +58,8 @@ class ContentGenerator:
             }
         }
     
-    def generate_blog_post(self, topic: str, additional_context: str = "") -> Dict:
-        print(f"\n🤖 Generating blog post about: {topic}")
-        
-        prompt = f"""You are a content writer for NovaMind, an AI startup helping creative agencies automate workflows.
+    def _blog_prompt(self, topic: str, additional_context: str = "") -> str:
+        return f"""You are a content writer for NovaMind, an AI startup helping creative agencies automate workflows.
 
 Topic: {topic}
 {f'Additional Context: {additional_context}' if additional_context else ''}
@@ -65,54 +82,146 @@ OUTLINE:
 CONTENT:
 [full blog post here]"""
 
+    def _parse_blog_post(self, response_text: str) -> Dict:
+        parts = response_text.split('\n\n')
+        title = ""
+        outline = ""
+        content = ""
+        
+        current_section = None
+        for part in parts:
+            if part.startswith('TITLE:'):
+                title = part.replace('TITLE:', '').strip()
+                current_section = 'title'
+            elif part.startswith('OUTLINE:'):
+                current_section = 'outline'
+            elif part.startswith('CONTENT:'):
+                current_section = 'content'
+            else:
+                if current_section == 'outline':
+                    outline += part + '\n\n'
+                elif current_section == 'content':
+                    content += part + '\n\n'
+        
+        return {
+            'title': title,
+            'outline': outline.strip(),
+            'content': content.strip()
+        }
+    
+    def generate_blog_post(self, topic: str, additional_context: str = "") -> Dict:
+        print(f"\n🤖 Generating blog post about: {topic}")
+        
+        prompt = self._blog_prompt(topic, additional_context)
+
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
+            response_text = self.llm.complete(
+                prompt,
                 max_tokens=2000,
-                temperature=0.7,
-                messages=[{"role": "user", "content": prompt}]
+                temperature=0.7
             )
             
-            response_text = message.content[0].text
-            
-            parts = response_text.split('\n\n')
-            title = ""
-            outline = ""
-            content = ""
-            
-            current_section = None
-            for part in parts:
-                if part.startswith('TITLE:'):
-                    title = part.replace('TITLE:', '').strip()
-                    current_section = 'title'
-                elif part.startswith('OUTLINE:'):
-                    current_section = 'outline'
-                elif part.startswith('CONTENT:'):
-                    current_section = 'content'
-                else:
-                    if current_section == 'outline':
-                        outline += part + '\n\n'
-                    elif current_section == 'content':
-                        content += part + '\n\n'
-            
-            print(f"✅ Blog post generated: {title}")
-            
-            return {
-                'title': title,
-                'outline': outline.strip(),
-                'content': content.strip()
-            }
+            blog = self._parse_blog_post(response_text)
+            print(f"✅ Blog post generated: {blog['title']}")
+            return blog
         except Exception as e:
             print(f"❌ Error generating blog post: {str(e)}")
             raise
     
-    def generate_newsletter_variations(self, blog_content: Dict) -> Dict[str, Dict]:
+    def stream_blog_post(self, topic: str, additional_context: str = "") -> Iterator[Dict]:
+        """Yields {'type': 'token', 'text': ...} events as the blog is written,
+        followed by a single {'type': 'blog', 'blog': {...}} with the parsed post."""
+        print(f"\n🤖 Streaming blog post about: {topic}")
+        
+        prompt = self._blog_prompt(topic, additional_context)
+        chunks = []
+        
+        try:
+            for text in self.llm.stream(prompt, max_tokens=2000, temperature=0.7):
+                chunks.append(text)
+                yield {'type': 'token', 'text': text}
+        except Exception as e:
+            print(f"❌ Error generating blog post: {str(e)}")
+            raise
+        
+        blog = self._parse_blog_post(''.join(chunks))
+        print(f"✅ Blog post generated: {blog['title']}")
+        yield {'type': 'blog', 'blog': blog}
+    
+    def generate_newsletter_variations(self, blog_content: Dict,
+                                       max_concurrency: Optional[int] = None) -> Dict[str, Dict]:
+        """Generates one newsletter per persona, issuing the LLM calls concurrently
+        (or as a single message batch in batch mode).
+
+        Results keep the order of self.personas. A failing persona does not
+        stop the others; once every call has finished, any failures are raised
+        together as a NewsletterGenerationError carrying the successful ones.
+        """
         print(f"\n📧 Generating personalized newsletters...")
         
-        newsletters = {}
+        results = {}
+        failures = {}
+        
+        variations = (self._batch_newsletter_variations(blog_content) if self.use_batch_api
+                      else self.iter_newsletter_variations(blog_content, max_concurrency))
+        for persona_key, newsletter, error in variations:
+            if error is None:
+                results[persona_key] = newsletter
+            else:
+                failures[persona_key] = error
+        
+        newsletters = {key: results[key] for key in self.personas if key in results}
+        
+        if failures:
+            raise NewsletterGenerationError(failures, newsletters)
         
-        for persona_key, persona_info in self.personas.items():
-            prompt = f"""Based on this blog post, create a personalized newsletter version for {persona_info['name']}.
+        return newsletters
+    
+    def iter_newsletter_variations(self, blog_content: Dict, max_concurrency: Optional[int] = None
+                                   ) -> Iterator[Tuple[str, Optional[Dict], Optional[Exception]]]:
+        """Yields (persona_key, newsletter, error) in completion order."""
+        workers = max(1, min(max_concurrency or self.max_concurrency, len(self.personas) or 1))
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._generate_persona_newsletter, blog_content, persona_info): persona_key
+                for persona_key, persona_info in self.personas.items()
+            }
+            for future in as_completed(futures):
+                persona_key = futures[future]
+                try:
+                    newsletter = future.result()
+                except Exception as e:
+                    print(f"❌ Error generating newsletter for {persona_key}: {str(e)}")
+                    yield persona_key, None, e
+                else:
+                    print(f"✅ Newsletter created for {self.personas[persona_key]['name']}")
+                    yield persona_key, newsletter, None
+    
+    def _batch_newsletter_variations(self, blog_content: Dict
+                                     ) -> Iterator[Tuple[str, Optional[Dict], Optional[Exception]]]:
+        """Yields (persona_key, newsletter, error) once the whole batch has ended."""
+        # Persona keys come from personas.json, so custom ids use the position
+        persona_keys = list(self.personas)
+        outcomes = self.llm.complete_batch({
+            f"newsletter-{i}": {
+                'prompt': self._newsletter_prompt(blog_content, self.personas[persona_key]),
+                'max_tokens': NEWSLETTER_MAX_TOKENS,
+                'temperature': NEWSLETTER_TEMPERATURE
+            }
+            for i, persona_key in enumerate(persona_keys)
+        })
+        for i, persona_key in enumerate(persona_keys):
+            outcome = outcomes[f"newsletter-{i}"]
+            if isinstance(outcome, Exception):
+                print(f"❌ Error generating newsletter for {persona_key}: {str(outcome)}")
+                yield persona_key, None, outcome
+            else:
+                print(f"✅ Newsletter created for {self.personas[persona_key]['name']}")
+                yield persona_key, self._parse_newsletter(outcome, self.personas[persona_key]), None
+    
+    def _newsletter_prompt(self, blog_content: Dict, persona_info: Dict) -> str:
+        return f"""Based on this blog post, create a personalized newsletter version for {persona_info['name']}.
 
 Blog Title: {blog_content['title']}
 Blog Content: {blog_content['content']}
@@ -135,53 +244,41 @@ SUBJECT: [subject line]
 PREVIEW: [preview text]
 BODY: [newsletter content]"""
 
-            try:
-                message = self.client.messages.create(
-                    model="claude-sonnet-4-20250514",
-                    max_tokens=800,
-                    temperature=0.8,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                
-                response = message.content[0].text
-                
-                subject = ""
-                preview = ""
-                body = ""
-                
-                lines = response.split('\n')
-                current_section = None
-                
-                for line in lines:
-                    if line.startswith('SUBJECT:'):
-                        subject = line.replace('SUBJECT:', '').strip()
-                    elif line.startswith('PREVIEW:'):
-                        preview = line.replace('PREVIEW:', '').strip()
-                    elif line.startswith('BODY:'):
-                        current_section = 'body'
-                    elif current_section == 'body' and line.strip():
-                        body += line + '\n'
-                
-                newsletters[persona_key] = {
-                    'persona': persona_info['name'],
-                    'subject_line': subject,
-                    'preview_text': preview,
-                    'content': body.strip()
-                }
-                
-                print(f"✅ Newsletter created for {persona_info['name']}")
-                
-            except Exception as e:
-                print(f"❌ Error generating newsletter for {persona_key}: {str(e)}")
-                raise
+    def _parse_newsletter(self, response: str, persona_info: Dict) -> Dict:
+        subject = ""
+        preview = ""
+        body = ""
         
-        return newsletters
-    
-    def generate_alternative_versions(self, original_content: str, 
-                                     content_type: str = "subject_line", count: int = 3) -> List[str]:
-        print(f"\n🔄 Generating {count} alternatives for {content_type}...")
+        lines = response.split('\n')
+        current_section = None
+        
+        for line in lines:
+            if line.startswith('SUBJECT:'):
+                subject = line.replace('SUBJECT:', '').strip()
+            elif line.startswith('PREVIEW:'):
+                preview = line.replace('PREVIEW:', '').strip()
+            elif line.startswith('BODY:'):
+                current_section = 'body'
+            elif current_section == 'body' and line.strip():
+                body += line + '\n'
         
-        prompt = f"""Generate {count} alternative versions of this {content_type}:
+        return {
+            'persona': persona_info['name'],
+            'subject_line': subject,
+            'preview_text': preview,
+            'content': body.strip()
+        }
+    
+    def _generate_persona_newsletter(self, blog_content: Dict, persona_info: Dict) -> Dict:
+        response = self.llm.complete(
+            self._newsletter_prompt(blog_content, persona_info),
+            max_tokens=NEWSLETTER_MAX_TOKENS,
+            temperature=NEWSLETTER_TEMPERATURE
+        )
+        return self._parse_newsletter(response, persona_info)
+    
+    def _alternatives_prompt(self, original_content: str, content_type: str, count: int) -> str:
+        return f"""Generate {count} alternative versions of this {content_type}:
 
 Original: {original_content}
 
@@ -192,28 +289,74 @@ Make each version:
 
 Return just the {count} alternatives, numbered 1-{count}."""
 
+    def _parse_alternatives(self, response: str, count: int) -> List[str]:
+        alternatives = []
+        
+        for line in response.split('\n'):
+            line = line.strip()
+            if line and line[0].isdigit():
+                if '. ' in line:
+                    alternatives.append(line.split('. ', 1)[1])
+                else:
+                    alternatives.append(line)
+        
+        return alternatives[:count]
+    
+    def generate_alternative_versions(self, original_content: str, 
+                                     content_type: str = "subject_line", count: int = 3) -> List[str]:
+        print(f"\n🔄 Generating {count} alternatives for {content_type}...")
+        
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=300,
-                temperature=0.9,
-                messages=[{"role": "user", "content": prompt}]
+            response = self.llm.complete(
+                self._alternatives_prompt(original_content, content_type, count),
+                max_tokens=ALTERNATIVES_MAX_TOKENS,
+                temperature=ALTERNATIVES_TEMPERATURE
             )
-            
-            response = message.content[0].text
-            alternatives = []
-            
-            for line in response.split('\n'):
-                line = line.strip()
-                if line and line[0].isdigit():
-                    if '. ' in line:
-                        alternatives.append(line.split('. ', 1)[1])
-                    else:
-                        alternatives.append(line)
-            
+            alternatives = self._parse_alternatives(response, count)
             print(f"✅ Generated {len(alternatives)} alternatives")
-            return alternatives[:count]
+            return alternatives
             
         except Exception as e:
             print(f"❌ Error generating alternatives: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+    
+    def generate_subject_line_alternatives(self, newsletters: Dict[str, Dict],
+                                           count: int = 3) -> Dict[str, List[str]]:
+        """A/B subject line alternatives for each persona's newsletter.
+
+        Batch mode submits every persona as one message batch; a persona
+        whose request fails gets no alternatives, as with a failed live call.
+        """
+        if not self.use_batch_api:
+            return {
+                persona_key: self.generate_alternative_versions(
+                    newsletter['subject_line'], content_type="subject_line", count=count
+                )
+                for persona_key, newsletter in newsletters.items()
+            }
+        
+        print(f"\n🔄 Generating {count} subject line alternatives per persona as a batch...")
+        persona_keys = list(newsletters)
+        try:
+            outcomes = self.llm.complete_batch({
+                f"subject-{i}": {
+                    'prompt': self._alternatives_prompt(newsletters[persona_key]['subject_line'],
+                                                        "subject_line", count),
+                    'max_tokens': ALTERNATIVES_MAX_TOKENS,
+                    'temperature': ALTERNATIVES_TEMPERATURE
+                }
+                for i, persona_key in enumerate(persona_keys)
+            })
+        except Exception as e:
+            print(f"❌ Error generating alternatives: {str(e)}")
+            return {persona_key: [] for persona_key in persona_keys}
+        
+        alternatives = {}
+        for i, persona_key in enumerate(persona_keys):
+            outcome = outcomes[f"subject-{i}"]
+            if isinstance(outcome, Exception):
+                print(f"❌ Error generating alternatives for {persona_key}: {str(outcome)}")
+                alternatives[persona_key] = []
+            else:
+                alternatives[persona_key] = self._parse_alternatives(outcome, count)
+        return alternatives
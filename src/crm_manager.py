@@ -1,18 +1,54 @@
 import os
 import json
+import time
+import hashlib
+import threading
 import requests
 import random
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
+from src.activity_log import ActivityLog
+from src.rate_limit import TokenBucket
+
+# Maximum inputs accepted by the CRM v3 batch endpoints
+BATCH_SIZE = 100
 
 class HubSpotManager:
-    def __init__(self):
+    def __init__(self, db=None, max_workers: Optional[int] = None,
+                 requests_per_second: float = 9.0, pool_size: int = 10,
+                 base_url: Optional[str] = None, verify_after_seconds: Optional[float] = None):
+        # Optional Database used to cache email -> HubSpot contact id lookups
+        self.db = db
         self.api_key = os.getenv('HUBSPOT_API_KEY')
-        self.base_url = "https://api.hubapi.com"
+        # NOVAMIND_HUBSPOT_BASE_URL points the client at a local stub server
+        self.base_url = (base_url or os.getenv('NOVAMIND_HUBSPOT_BASE_URL')
+                         or "https://api.hubapi.com").rstrip('/')
         self.headers = {
             "Authorization": f"Bearer {self.api_key}" if self.api_key else "",
             "Content-Type": "application/json"
         }
+        self.activity_log = ActivityLog()
+        # Cached contact ids are re-checked against HubSpot this often, so
+        # contacts deleted or merged there are re-created instead of skipped
+        self.verify_after_seconds = (verify_after_seconds if verify_after_seconds is not None
+                                     else float(os.getenv('NOVAMIND_CRM_VERIFY_SECONDS', '86400')))
+        self.max_workers = max_workers or int(os.getenv('NOVAMIND_CRM_WORKERS', '1'))
+        
+        # One keep-alive session for every call so requests reuse pooled
+        # TCP/TLS connections instead of handshaking each time
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, self.max_workers))
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        
+        # HubSpot allows roughly 10 requests/second per private app
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.request_count = 0
+        self.request_seconds = 0.0
+        self._stats_lock = threading.Lock()
 
         if not self.api_key:
             print("⚠️  WARNING: HUBSPOT_API_KEY not found. Using simulation mode.")
@@ -25,7 +61,7 @@ class HubSpotManager:
         """Checks if HubSpot connection is valid."""
         test_url = f"{self.base_url}/crm/v3/objects/contacts?limit=1"
         try:
-            response = requests.get(test_url, headers=self.headers, timeout=10)
+            response = self._request('GET', test_url, timeout=10)
             if response.status_code == 200:
                 print("✅ Successfully connected to HubSpot API.")
                 return True
@@ -38,6 +74,36 @@ class HubSpotManager:
             print("⚠️  Switching to simulation mode.")
             return False
 
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        self.rate_limiter.acquire()
+        started = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self.request_count += 1
+                self.request_seconds += elapsed
+
+    def http_stats(self) -> Dict:
+        """Request timings plus how many connections the pool actually opened."""
+        connections_opened = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections_opened += pool.num_connections
+        
+        with self._stats_lock:
+            return {
+                'requests': self.request_count,
+                'connections_opened': connections_opened,
+                'connections_reused': max(0, self.request_count - connections_opened),
+                'total_seconds': round(self.request_seconds, 3),
+                'avg_ms': round(self.request_seconds / self.request_count * 1000, 1)
+                          if self.request_count else 0.0
+            }
+
     def create_or_update_contact(self, contact_data: Dict) -> Optional[str]:
         if self.simulation_mode:
             print(f"   [SIM] Created contact: {contact_data['email']}")
@@ -55,8 +121,26 @@ class HubSpotManager:
         }
 
         try:
-            response = requests.post(search_url, headers=self.headers, 
-                                    json=search_payload, timeout=10)
+            cached_id = self.db.get_crm_contact_id(contact_data['email']) if self.db else None
+            if cached_id:
+                update_response = self._request(
+                    'PATCH',
+                    f"{self.base_url}/crm/v3/objects/contacts/{cached_id}",
+                    json={"properties": self._contact_properties(contact_data)},
+                    timeout=10
+                )
+                
+                if update_response.status_code == 200:
+                    print(f"   ✅ Updated contact: {contact_data['email']}")
+                    return cached_id
+                elif update_response.status_code == 404:
+                    # Deleted or merged in HubSpot since we cached it
+                    self.db.delete_crm_contact(contact_data['email'])
+                else:
+                    print(f"   ❌ Update failed ({update_response.status_code}): {update_response.text}")
+                    return None
+            
+            response = self._request('POST', search_url, json=search_payload, timeout=10)
             
             if response.status_code == 200:
                 results = response.json().get('results', [])
@@ -73,15 +157,16 @@ class HubSpotManager:
                         "hs_persona": contact_data.get('persona')
                     }
                     
-                    update_response = requests.patch(
-                        update_url, 
-                        headers=self.headers,
+                    update_response = self._request(
+                        'PATCH',
+                        update_url,
                         json={"properties": properties},
                         timeout=10
                     )
                     
                     if update_response.status_code == 200:
                         print(f"   ✅ Updated contact: {contact_data['email']}")
+                        self._remember_contacts({contact_data['email']: contact_id}, [contact_data])
                         return contact_id
                     else:
                         print(f"   ❌ Update failed ({update_response.status_code}): {update_response.text}")
@@ -97,9 +182,9 @@ class HubSpotManager:
                         "hs_persona": contact_data.get('persona')
                     }
                     
-                    create_response = requests.post(
+                    create_response = self._request(
+                        'POST',
                         create_url,
-                        headers=self.headers,
                         json={"properties": properties},
                         timeout=10
                     )
@@ -107,6 +192,7 @@ class HubSpotManager:
                     if create_response.status_code == 201:
                         contact_id = create_response.json()['id']
                         print(f"   ✅ Created contact: {contact_data['email']}")
+                        self._remember_contacts({contact_data['email']: contact_id}, [contact_data])
                         return contact_id
                     else:
                         print(f"   ❌ Create failed ({create_response.status_code}): {create_response.text}")
@@ -118,17 +204,240 @@ class HubSpotManager:
             print(f"   ❌ Error with contact {contact_data['email']}: {str(e)}")
             return None
 
-    def bulk_create_contacts(self, contacts: List[Dict]) -> Dict[str, str]:
+    def properties_hash(self, contact_data: Dict) -> str:
+        payload = json.dumps(self._contact_properties(contact_data), sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _remember_contacts(self, contact_ids: Dict[str, str], contacts: List[Dict]):
+        if self.db is None or not contact_ids:
+            return
+        hashes = {
+            contact['email']: self.properties_hash(contact)
+            for contact in contacts if contact['email'] in contact_ids
+        }
+        self.db.save_crm_contact_ids(contact_ids, hashes)
+
+    def bulk_create_contacts(self, contacts: List[Dict], incremental: bool = False) -> Dict[str, str]:
+        report = self.sync_contacts(contacts, incremental=incremental)
+        return report['contact_map']
+
+    def sync_contacts(self, contacts: List[Dict], incremental: bool = False) -> Dict:
+        """Upserts contacts by email through the CRM v3 batch endpoint.
+
+        With incremental=True, contacts whose synced properties hash matches
+        the one stored at their last successful sync are skipped and served
+        from the local id cache. Cached ids HubSpot has not confirmed within
+        verify_after_seconds are batch-read first; ids it no longer has are
+        forgotten and those contacts are upserted again.
+
+        Returns a report with the email -> contact id map, created/updated/
+        skipped/failed counts and a per-email error message for every contact
+        that was rejected. Emails are case-insensitive, so when the list holds
+        the same address more than once only the last entry is synced and the
+        earlier ones are reported as errors.
+        """
         print(f"\n👥 Creating/updating {len(contacts)} contacts in HubSpot...")
         
-        contact_map = {}
-        for contact in contacts:
-            contact_id = self.create_or_update_contact(contact)
-            if contact_id:
-                contact_map[contact['email']] = contact_id
+        report = {
+            'contact_map': {},
+            'created': 0,
+            'updated': 0,
+            'skipped': 0,
+            'failed': 0,
+            'errors': {}
+        }
+        
+        contacts, duplicates = self._dedupe_by_email(contacts)
+        report['errors'].update(duplicates)
+        
+        if incremental and self.db is not None and not self.simulation_mode:
+            known = self.db.get_crm_contacts((contact['email'] for contact in contacts),
+                                             verify_after_seconds=self.verify_after_seconds)
+            checked, missing = self._check_contact_ids(
+                {contact_id for contact_id, _, stale in known.values() if stale}
+            )
+            changed = []
+            gone = []
+            verified = []
+            for contact in contacts:
+                contact_id, stored_hash, _ = known.get(contact['email'].lower(), (None, None, False))
+                if contact_id in missing:
+                    gone.append(contact['email'])
+                    changed.append(contact)
+                    continue
+                if contact_id in checked:
+                    verified.append(contact['email'])
+                if stored_hash is not None and stored_hash == self.properties_hash(contact):
+                    report['contact_map'][contact['email']] = contact_id
+                    report['skipped'] += 1
+                else:
+                    changed.append(contact)
+            if verified:
+                self.db.mark_crm_contacts_verified(verified)
+            if gone:
+                self.db.delete_crm_contacts(gone)
+                print(f"   🗑️  {len(gone)} cached contact ids no longer exist in HubSpot; re-syncing them")
+            print(f"   ⏭️  {report['skipped']} unchanged contacts skipped, {len(changed)} to sync")
+            contacts = changed
+        
+        batches = [contacts[start:start + BATCH_SIZE] for start in range(0, len(contacts), BATCH_SIZE)]
+        workers = min(self.max_workers, len(batches)) if not self.simulation_mode else 1
         
-        print(f"✅ Processed {len(contact_map)} contacts")
-        return contact_map
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                batch_reports = list(executor.map(self._upsert_contact_batch, batches))
+        else:
+            batch_reports = [self._upsert_contact_batch(batch) for batch in batches]
+        
+        for batch_report in batch_reports:
+            report['contact_map'].update(batch_report['contact_map'])
+            report['errors'].update(batch_report['errors'])
+            report['created'] += batch_report['created']
+            report['updated'] += batch_report['updated']
+        
+        if not self.simulation_mode:
+            # Only the contacts actually sent; skipped ones keep their stored hash
+            synced = {
+                contact['email']: report['contact_map'][contact['email']]
+                for contact in contacts if contact['email'] in report['contact_map']
+            }
+            self._remember_contacts(synced, contacts)
+        
+        report['failed'] = len(report['errors'])
+        for email, error in report['errors'].items():
+            print(f"   ❌ {email}: {error}")
+        print(f"✅ Processed {len(report['contact_map'])} contacts "
+              f"({report['created']} created, {report['updated']} updated, "
+              f"{report['skipped']} skipped, {report['failed']} failed)")
+        if not self.simulation_mode:
+            report['http'] = self.http_stats()
+            print(f"   🔌 {report['http']['requests']} HTTP requests over "
+                  f"{report['http']['connections_opened']} connection(s), "
+                  f"avg {report['http']['avg_ms']} ms")
+        return report
+
+    def _contact_properties(self, contact_data: Dict) -> Dict:
+        return {
+            "email": contact_data['email'],
+            "firstname": contact_data.get('firstname'),
+            "lastname": contact_data.get('lastname'),
+            "company": contact_data.get('company'),
+            "jobtitle": contact_data.get('jobtitle'),
+            "hs_persona": contact_data.get('persona')
+        }
+
+    def _check_contact_ids(self, contact_ids: set) -> Tuple[set, set]:
+        """Batch-reads cached contact ids. Returns (checked, missing): the ids
+        HubSpot answered for and, of those, the ones it no longer has. Ids in
+        a chunk that could not be read are in neither and are checked again
+        on the next sync."""
+        if not contact_ids:
+            return set(), set()
+        
+        ids = sorted(contact_ids)
+        read_url = f"{self.base_url}/crm/v3/objects/contacts/batch/read"
+        found = set()
+        checked = set()
+        for start in range(0, len(ids), BATCH_SIZE):
+            chunk = ids[start:start + BATCH_SIZE]
+            try:
+                response = self._request('POST', read_url, timeout=30, json={
+                    "properties": ["email"],
+                    "inputs": [{"id": contact_id} for contact_id in chunk]
+                })
+            except requests.exceptions.RequestException as e:
+                print(f"   ⚠️  Could not verify cached contact ids: {str(e)}")
+                continue
+            if response.status_code not in (200, 207):
+                print(f"   ⚠️  Could not verify cached contact ids ({response.status_code})")
+                continue
+            found.update(str(result['id']) for result in response.json().get('results', []))
+            checked.update(chunk)
+        
+        return checked, checked - found
+
+    @staticmethod
+    def _dedupe_by_email(contacts: List[Dict]):
+        """Keeps the last contact for each case-insensitive email, matching the
+        contact store, and an error for each earlier entry that was dropped."""
+        last_index = {contact['email'].lower(): i for i, contact in enumerate(contacts)}
+        if len(last_index) == len(contacts):
+            return contacts, {}
+        
+        kept = []
+        duplicates = {}
+        for i, contact in enumerate(contacts):
+            keeper = contacts[last_index[contact['email'].lower()]]
+            if i == last_index[contact['email'].lower()]:
+                kept.append(contact)
+            elif contact['email'] != keeper['email']:
+                duplicates[contact['email']] = f"Duplicate of {keeper['email']}; only that entry was synced"
+        return kept, duplicates
+
+    def _upsert_contact_batch(self, batch: List[Dict]) -> Dict:
+        # HubSpot normalises emails to lower case and rejects duplicate ids
+        # within one request; sync_contacts has already dropped duplicates,
+        # so the lower-cased address identifies each contact
+        by_email = {contact['email'].lower(): contact for contact in batch}
+        report = {'contact_map': {}, 'created': 0, 'updated': 0, 'errors': {}}
+        
+        if self.simulation_mode:
+            for contact in by_email.values():
+                print(f"   [SIM] Created contact: {contact['email']}")
+                report['contact_map'][contact['email']] = f"sim_{contact['email']}"
+                report['created'] += 1
+            return report
+        
+        upsert_url = f"{self.base_url}/crm/v3/objects/contacts/batch/upsert"
+        payload = {
+            "inputs": [
+                {
+                    "idProperty": "email",
+                    "id": contact['email'],
+                    "properties": self._contact_properties(contact)
+                }
+                for contact in by_email.values()
+            ]
+        }
+        
+        try:
+            response = self._request('POST', upsert_url, json=payload, timeout=30)
+        except requests.exceptions.RequestException as e:
+            for contact in by_email.values():
+                report['errors'][contact['email']] = f"Request error: {str(e)}"
+            return report
+        
+        if response.status_code not in (200, 201, 207):
+            message = f"Batch upsert failed ({response.status_code}): {response.text[:200]}"
+            for contact in by_email.values():
+                report['errors'][contact['email']] = message
+            return report
+        
+        body = response.json()
+        for result in body.get('results', []):
+            email = ((result.get('properties') or {}).get('email') or '').lower()
+            contact = by_email.get(email)
+            if contact is None:
+                continue
+            report['contact_map'][contact['email']] = result['id']
+            report['created' if result.get('new') else 'updated'] += 1
+        
+        for error in body.get('errors', []):
+            context = error.get('context') or {}
+            failed_ids = context.get('ids') or context.get('id') or []
+            if isinstance(failed_ids, str):
+                failed_ids = [failed_ids]
+            for failed_id in failed_ids:
+                contact = by_email.get(str(failed_id).lower())
+                if contact is not None:
+                    report['errors'][contact['email']] = error.get('message', 'Unknown error')
+        
+        for contact in by_email.values():
+            email = contact['email']
+            if email not in report['contact_map'] and email not in report['errors']:
+                report['errors'][email] = "No result returned by batch upsert"
+        
+        return report
 
     def send_email_to_segment(self, persona: str, contact_ids: List[str],
                              email_content: Dict) -> bool:
@@ -147,31 +456,12 @@ class HubSpotManager:
 
     def log_campaign_activity(self, campaign_id: str, contact_ids: List[str],
                              activity_type: str) -> bool:
-        timestamp = datetime.now().isoformat()
-        log_entry = {
+        self.activity_log.append({
             "campaign_id": campaign_id,
             "activity": activity_type,
             "contacts": len(contact_ids),
-            "timestamp": timestamp
-        }
-        
-        log_path = "data/campaign_logs.json"
-        logs = []
-        
-        os.makedirs(os.path.dirname(log_path), exist_ok=True)
-        
-        if os.path.exists(log_path):
-            with open(log_path, 'r') as f:
-                try:
-                    logs = json.load(f)
-                except json.JSONDecodeError:
-                    logs = []
-        
-        logs.append(log_entry)
-        
-        with open(log_path, 'w') as f:
-            json.dump(logs, f, indent=2)
-        
+            "timestamp": datetime.now().isoformat()
+        })
         return True
 
     def generate_simulated_stats(self, persona: str) -> Dict:
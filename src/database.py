@@ -1,16 +1,409 @@
 import sqlite3
 import json
+import base64
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections shared across threads."""
+
+    def __init__(self, db_path: str, size: int = 5, synchronous: str = "NORMAL",
+                 timeout: float = 30.0):
+        self.db_path = db_path
+        self.size = size
+        self.synchronous = synchronous
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        # isolation_level=None puts the driver in autocommit mode so that
+        # transactions are only ever opened explicitly by Database.transaction()
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._open()
+                except Exception:
+                    self._created -= 1
+                    raise
+
+        return self._idle.get(timeout=self.timeout)
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+# Folds performance_metrics rows with id >= :first_id into the rollup tables.
+# New rows always carry the highest ids, so the same statements serve both
+# the incremental update after an insert and a full rebuild from id 0.
+ROLLUP_STATEMENTS = [
+    '''INSERT INTO metrics_rollups
+        (period, period_start, persona, topic, sends, campaigns,
+         sent, delivered, opens, clicks, unsubscribes)
+    SELECT p.period,
+           CASE p.period WHEN 'day' THEN date(c.send_date)
+                ELSE date(c.send_date, 'weekday 0', '-6 days') END,
+           m.persona, COALESCE(b.topic, '(no topic)'), COUNT(*),
+           -- A campaign counts once per persona, however many batches or
+           -- variants its metrics arrive in
+           COUNT(DISTINCT CASE WHEN NOT EXISTS (
+               SELECT 1 FROM performance_metrics earlier
+               WHERE earlier.campaign_id = m.campaign_id AND earlier.persona = m.persona
+                 AND earlier.id < :first_id
+           ) THEN m.campaign_id END),
+           SUM(m.sent_count), SUM(m.delivered_count), SUM(m.open_count),
+           SUM(m.click_count), SUM(m.unsubscribe_count)
+    FROM performance_metrics m
+    JOIN campaigns c ON c.id = m.campaign_id
+    LEFT JOIN blog_posts b ON b.id = c.blog_id
+    CROSS JOIN (SELECT 'day' AS period UNION ALL SELECT 'week') p
+    WHERE m.id >= :first_id
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (period, period_start, persona, topic) DO UPDATE SET
+        sends = sends + excluded.sends,
+        campaigns = campaigns + excluded.campaigns,
+        sent = sent + excluded.sent,
+        delivered = delivered + excluded.delivered,
+        opens = opens + excluded.opens,
+        clicks = clicks + excluded.clicks,
+        unsubscribes = unsubscribes + excluded.unsubscribes''',
+    '''INSERT INTO campaign_rollups
+        (campaign_id, persona, send_date, topic, sends,
+         sent, delivered, opens, clicks, unsubscribes)
+    SELECT m.campaign_id, m.persona, c.send_date, COALESCE(b.topic, '(no topic)'), COUNT(*),
+           SUM(m.sent_count), SUM(m.delivered_count), SUM(m.open_count),
+           SUM(m.click_count), SUM(m.unsubscribe_count)
+    FROM performance_metrics m
+    JOIN campaigns c ON c.id = m.campaign_id
+    LEFT JOIN blog_posts b ON b.id = c.blog_id
+    WHERE m.id >= :first_id
+    GROUP BY m.campaign_id, m.persona
+    ON CONFLICT (campaign_id, persona) DO UPDATE SET
+        sends = sends + excluded.sends,
+        sent = sent + excluded.sent,
+        delivered = delivered + excluded.delivered,
+        opens = opens + excluded.opens,
+        clicks = clicks + excluded.clicks,
+        unsubscribes = unsubscribes + excluded.unsubscribes''',
+]
+
+
+# Schema changes applied on top of the base tables, in order. Each entry is
+# (version, statements); PRAGMA user_version records the last one applied so
+# existing deployments only run what they are missing. A statement may be a
+# (sql, params) pair.
+MIGRATIONS = [
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_performance_metrics_campaign "
+        "ON performance_metrics (campaign_id)",
+        "CREATE INDEX IF NOT EXISTS idx_newsletters_blog ON newsletters (blog_id)",
+        "CREATE INDEX IF NOT EXISTS idx_campaigns_send_date ON campaigns (send_date, id)",
+    ]),
+    (2, [
+        '''CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            job_type TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL DEFAULT 0,
+            stage TEXT,
+            params TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)",
+    ]),
+    (3, [
+        '''CREATE TABLE IF NOT EXISTS crm_contacts (
+            email TEXT PRIMARY KEY,
+            contact_id TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ]),
+    (4, [
+        "ALTER TABLE crm_contacts ADD COLUMN properties_hash TEXT",
+    ]),
+    (5, [
+        "ALTER TABLE performance_metrics ADD COLUMN variant INTEGER DEFAULT 0",
+    ]),
+    (6, [
+        '''CREATE TABLE IF NOT EXISTS metrics_rollups (
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            persona TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            sends INTEGER DEFAULT 0,
+            campaigns INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            delivered INTEGER DEFAULT 0,
+            opens INTEGER DEFAULT 0,
+            clicks INTEGER DEFAULT 0,
+            unsubscribes INTEGER DEFAULT 0,
+            PRIMARY KEY (period, period_start, persona, topic)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS campaign_rollups (
+            campaign_id INTEGER NOT NULL,
+            persona TEXT NOT NULL,
+            send_date TIMESTAMP,
+            topic TEXT NOT NULL,
+            sends INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            delivered INTEGER DEFAULT 0,
+            opens INTEGER DEFAULT 0,
+            clicks INTEGER DEFAULT 0,
+            unsubscribes INTEGER DEFAULT 0,
+            PRIMARY KEY (campaign_id, persona)
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_campaign_rollups_send_date ON campaign_rollups (send_date)",
+        # Backfill from the metrics recorded so far
+        *[(statement, {'first_id': 0}) for statement in ROLLUP_STATEMENTS],
+    ]),
+    (7, [
+        '''CREATE TABLE IF NOT EXISTS campaign_insights (
+            campaign_id INTEGER PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            insights TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (campaign_id) REFERENCES campaigns (id)
+        )''',
+    ]),
+    (8, [
+        '''CREATE TABLE IF NOT EXISTS pipeline_runs (
+            id TEXT PRIMARY KEY,
+            params TEXT,
+            status TEXT NOT NULL DEFAULT 'running',
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS pipeline_checkpoints (
+            run_id TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            output TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (run_id, stage),
+            FOREIGN KEY (run_id) REFERENCES pipeline_runs (id)
+        )''',
+    ]),
+    (9, [
+        # The process that owns a job refreshes heartbeat_at while it is
+        # alive, so other processes can tell its jobs from abandoned ones
+        "ALTER TABLE jobs ADD COLUMN owner TEXT",
+        "ALTER TABLE jobs ADD COLUMN heartbeat_at TIMESTAMP",
+    ]),
+    (10, [
+        # When HubSpot last confirmed the cached contact id still exists;
+        # NULL for ids cached before verification was tracked
+        "ALTER TABLE crm_contacts ADD COLUMN verified_at TIMESTAMP",
+    ]),
+    (11, [
+        # A pipeline run's campaign and the personas already sent to, so a
+        # resumed run reuses the campaign instead of creating and sending
+        # it again
+        "ALTER TABLE pipeline_runs ADD COLUMN campaign_id INTEGER REFERENCES campaigns (id)",
+        '''CREATE TABLE IF NOT EXISTS campaign_sends (
+            campaign_id INTEGER NOT NULL,
+            persona TEXT NOT NULL,
+            contacts INTEGER DEFAULT 0,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (campaign_id, persona),
+            FOREIGN KEY (campaign_id) REFERENCES campaigns (id)
+        )''',
+    ]),
+]
+
 
 class Database:
-    def __init__(self, db_path: str = "data/novamind.db"):
+    # Hot read paths, shared with check_query_plans() so the plans verified
+    # there are exactly the queries the dashboard runs.
+    ALL_CAMPAIGNS_SQL = '''
+        SELECT c.id, c.campaign_name, c.send_date, c.status, b.title, b.topic
+        FROM campaigns c
+        JOIN blog_posts b ON c.blog_id = b.id
+        ORDER BY c.send_date DESC
+    '''
+    CAMPAIGNS_PAGE_SQL = '''
+        SELECT c.id, c.campaign_name, c.send_date, c.status, b.title, b.topic
+        FROM campaigns c
+        JOIN blog_posts b ON c.blog_id = b.id
+        {where}
+        ORDER BY c.send_date DESC, c.id DESC
+        LIMIT ?
+    '''
+    CAMPAIGN_PERFORMANCE_SQL = '''
+        SELECT persona, sent_count, open_count, click_count, 
+               open_rate, click_rate, unsubscribe_rate, delivered_count, variant,
+               unsubscribe_count
+        FROM performance_metrics
+        WHERE campaign_id = ?
+    '''
+    METRIC_ROLLUPS_SQL = '''
+        SELECT period_start, persona, topic, sends, campaigns,
+               sent, delivered, opens, clicks, unsubscribes
+        FROM metrics_rollups
+        WHERE period = ? {where}
+    '''
+    CAMPAIGN_ROLLUPS_SQL = '''
+        SELECT campaign_id, send_date, topic, persona, sends,
+               sent, delivered, opens, clicks, unsubscribes
+        FROM campaign_rollups
+        {where}
+    '''
+    NEWSLETTERS_FOR_BLOG_SQL = '''
+        SELECT id, persona, subject_line, preview_text, content
+        FROM newsletters
+        WHERE blog_id = ?
+    '''
+
+    def __init__(self, db_path: str = "data/novamind.db", pool_size: int = 5,
+                 synchronous: str = "NORMAL"):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, size=pool_size, synchronous=synchronous)
+        self._local = threading.local()
         self.init_database()
+
+    @contextmanager
+    def connection(self):
+        """Yields a pooled connection, reusing the one bound to an open transaction."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self.pool.acquire()
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Groups every write issued inside the block into a single commit.
+
+        Transactions nest: an inner block becomes a savepoint of the outer one.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth += 1
+            savepoint = f"sp_{self._local.depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            try:
+                yield conn.cursor()
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+                raise
+            else:
+                conn.execute(f"RELEASE {savepoint}")
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.pool.acquire()
+        self._local.conn = conn
+        self._local.depth = 0
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn.cursor()
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+        finally:
+            self._local.conn = None
+            self.pool.release(conn)
+
+    def close(self):
+        self.pool.close_all()
     
     def init_database(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.transaction() as cursor:
+            self._create_tables(cursor)
+            self._apply_migrations(cursor)
+
+    def _apply_migrations(self, cursor: sqlite3.Cursor):
+        current = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for version, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for statement in statements:
+                if isinstance(statement, tuple):
+                    cursor.execute(*statement)
+                else:
+                    cursor.execute(statement)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            print(f"applied schema migration {version}")
+
+    def schema_version(self) -> int:
+        with self.connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def check_query_plans(self) -> Dict[str, Dict]:
+        """Runs EXPLAIN QUERY PLAN on the hot queries and reports index usage."""
+        checks = {
+            'get_all_campaigns': (self.ALL_CAMPAIGNS_SQL, (), 'idx_campaigns_send_date'),
+            'get_campaigns_page': (
+                self.CAMPAIGNS_PAGE_SQL.format(where="WHERE (c.send_date, c.id) < (?, ?)"),
+                ('', 0, 20), 'idx_campaigns_send_date'),
+            'get_campaign_performance': (self.CAMPAIGN_PERFORMANCE_SQL, (0,),
+                                         'idx_performance_metrics_campaign'),
+            'get_newsletters_for_blog': (self.NEWSLETTERS_FOR_BLOG_SQL, (0,),
+                                         'idx_newsletters_blog'),
+            'get_metric_rollups': (
+                self.METRIC_ROLLUPS_SQL.format(where="AND period_start >= ?"),
+                ('week', ''), 'sqlite_autoindex_metrics_rollups_1'),
+            'get_campaign_rollups': (
+                self.CAMPAIGN_ROLLUPS_SQL.format(where="WHERE send_date >= ?"),
+                ('',), 'idx_campaign_rollups_send_date'),
+        }
+        
+        report = {}
+        with self.connection() as conn:
+            for name, (sql, params, index) in checks.items():
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+                report[name] = {
+                    'index': index,
+                    'uses_index': any(index in step for step in plan),
+                    'temp_sort': any('TEMP B-TREE' in step for step in plan),
+                    'plan': plan
+                }
+        return report
+
+    def _create_tables(self, cursor: sqlite3.Cursor):
         print("connection estabilished")
         
         cursor.execute('''
@@ -81,129 +474,487 @@ class Database:
             )
         ''')
         print("executed")
-        conn.commit()
-
-        conn.close()
     
     def save_blog_post(self, topic: str, title: str, outline: str, 
                        content: str, metadata: Dict = None) -> int:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         word_count = len(content.split())
         metadata_json = json.dumps(metadata) if metadata else "{}"
         
-        cursor.execute('''
-            INSERT INTO blog_posts (topic, title, outline, content, word_count, metadata)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (topic, title, outline, content, word_count, metadata_json))
-        
-        blog_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return blog_id
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO blog_posts (topic, title, outline, content, word_count, metadata)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (topic, title, outline, content, word_count, metadata_json))
+            
+            return cursor.lastrowid
     
     def save_newsletter(self, blog_id: int, persona: str, 
                        subject_line: str, preview_text: str, content: str) -> int:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO newsletters (blog_id, persona, subject_line, preview_text, content)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (blog_id, persona, subject_line, preview_text, content))
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO newsletters (blog_id, persona, subject_line, preview_text, content)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (blog_id, persona, subject_line, preview_text, content))
+            
+            return cursor.lastrowid
+    
+    def save_newsletters_bulk(self, blog_id: int, newsletters: Iterable[Dict]) -> List[int]:
+        rows = [
+            (blog_id, n['persona'], n['subject_line'], n.get('preview_text'), n['content'])
+            for n in newsletters
+        ]
         
-        newsletter_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return newsletter_id
+        with self.transaction() as cursor:
+            return self._executemany_returning_ids(cursor, '''
+                INSERT INTO newsletters (blog_id, persona, subject_line, preview_text, content)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
     
     def create_campaign(self, blog_id: int, campaign_name: str, 
-                       hubspot_campaign_id: str = None) -> int:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO campaigns (blog_id, campaign_name, send_date, hubspot_campaign_id, status)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (blog_id, campaign_name, datetime.now(), hubspot_campaign_id, 'sent'))
-        
-        campaign_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return campaign_id
+                       hubspot_campaign_id: str = None, run_id: Optional[str] = None) -> int:
+        """Inserts a campaign; with run_id it is also recorded against that
+        pipeline run in the same transaction."""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO campaigns (blog_id, campaign_name, send_date, hubspot_campaign_id, status)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (blog_id, campaign_name, datetime.now(), hubspot_campaign_id, 'sent'))
+            campaign_id = cursor.lastrowid
+            if run_id is not None:
+                cursor.execute("UPDATE pipeline_runs SET campaign_id = ? WHERE id = ?",
+                               (campaign_id, run_id))
+            return campaign_id
+    
+    def record_campaign_send(self, campaign_id: int, persona: str, contacts: int):
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO campaign_sends (campaign_id, persona, contacts)
+                VALUES (?, ?, ?)
+            ''', (campaign_id, persona, contacts))
+    
+    def get_sent_personas(self, campaign_id: int) -> Set[str]:
+        with self.connection() as conn:
+            rows = conn.execute("SELECT persona FROM campaign_sends WHERE campaign_id = ?",
+                                (campaign_id,)).fetchall()
+        return {row[0] for row in rows}
     
     def save_performance_metrics(self, campaign_id: int, persona: str, metrics: Dict):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO performance_metrics 
-            (campaign_id, persona, sent_count, delivered_count, open_count, 
-             click_count, unsubscribe_count, open_rate, click_rate, unsubscribe_rate)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            campaign_id, persona, metrics.get('sent', 0), metrics.get('delivered', 0),
-            metrics.get('opens', 0), metrics.get('clicks', 0), metrics.get('unsubscribes', 0),
-            metrics.get('open_rate', 0), metrics.get('click_rate', 0), 
-            metrics.get('unsubscribe_rate', 0)
-        ))
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO performance_metrics 
+                (campaign_id, persona, sent_count, delivered_count, open_count, 
+                 click_count, unsubscribe_count, open_rate, click_rate, unsubscribe_rate)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                campaign_id, persona, metrics.get('sent', 0), metrics.get('delivered', 0),
+                metrics.get('opens', 0), metrics.get('clicks', 0), metrics.get('unsubscribes', 0),
+                metrics.get('open_rate', 0), metrics.get('click_rate', 0), 
+                metrics.get('unsubscribe_rate', 0)
+            ))
+            self._update_rollups(cursor, cursor.lastrowid)
+    
+    def save_performance_metrics_bulk(self, rows: Iterable[Tuple[int, str, Dict]]) -> List[int]:
+        """Inserts (campaign_id, persona, metrics) rows in one transaction.
+
+        metrics may carry a 'variant' number for A/B sends; it defaults to 0.
+        """
+        params = [
+            (
+                campaign_id, persona, metrics.get('variant', 0), metrics.get('sent', 0),
+                metrics.get('delivered', 0), metrics.get('opens', 0), metrics.get('clicks', 0),
+                metrics.get('unsubscribes', 0), metrics.get('open_rate', 0),
+                metrics.get('click_rate', 0), metrics.get('unsubscribe_rate', 0)
+            )
+            for campaign_id, persona, metrics in rows
+        ]
         
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            ids = self._executemany_returning_ids(cursor, '''
+                INSERT INTO performance_metrics 
+                (campaign_id, persona, variant, sent_count, delivered_count, open_count, 
+                 click_count, unsubscribe_count, open_rate, click_rate, unsubscribe_rate)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', params)
+            if ids:
+                self._update_rollups(cursor, ids[0])
+            return ids
+    
+    def _update_rollups(self, cursor: sqlite3.Cursor, first_id: int):
+        # Runs inside the caller's transaction so metrics and rollups commit together
+        for statement in ROLLUP_STATEMENTS:
+            cursor.execute(statement, {'first_id': first_id})
+    
+    def rebuild_rollups(self) -> int:
+        """Recomputes every rollup row from performance_metrics (for backfills)."""
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM metrics_rollups")
+            cursor.execute("DELETE FROM campaign_rollups")
+            self._update_rollups(cursor, 0)
+            return cursor.execute("SELECT COUNT(*) FROM metrics_rollups").fetchone()[0]
     
     def save_optimization_suggestion(self, campaign_id: int, suggestion_type: str,
                                     suggestion_text: str, confidence_score: float):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO optimization_suggestions 
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO optimization_suggestions 
+                (campaign_id, suggestion_type, suggestion_text, confidence_score)
+                VALUES (?, ?, ?, ?)
+            ''', (campaign_id, suggestion_type, suggestion_text, confidence_score))
+    
+    def save_optimization_suggestions_bulk(self, campaign_id: int, suggestion_type: str,
+                                          suggestions: Iterable[str],
+                                          confidence_score: float) -> List[int]:
+        rows = [
             (campaign_id, suggestion_type, suggestion_text, confidence_score)
-            VALUES (?, ?, ?, ?)
-        ''', (campaign_id, suggestion_type, suggestion_text, confidence_score))
+            for suggestion_text in suggestions
+        ]
         
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            return self._executemany_returning_ids(cursor, '''
+                INSERT INTO optimization_suggestions 
+                (campaign_id, suggestion_type, suggestion_text, confidence_score)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+    
+    def _executemany_returning_ids(self, cursor: sqlite3.Cursor, sql: str,
+                                   rows: List[Tuple]) -> List[int]:
+        # executemany() does not report per-row ids. Inside our BEGIN IMMEDIATE
+        # transaction no other writer can interleave, and AUTOINCREMENT keys are
+        # handed out consecutively, so the batch occupies a contiguous id range
+        # ending at last_insert_rowid().
+        if not rows:
+            return []
+        cursor.executemany(sql, rows)
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        first_id = last_id - len(rows) + 1
+        return list(range(first_id, last_id + 1))
     
     def get_all_campaigns(self) -> List[Dict]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            rows = conn.execute(self.ALL_CAMPAIGNS_SQL).fetchall()
         
-        cursor.execute('''
-            SELECT c.id, c.campaign_name, c.send_date, c.status, b.title, b.topic
-            FROM campaigns c
-            JOIN blog_posts b ON c.blog_id = b.id
-            ORDER BY c.send_date DESC
-        ''')
+        return [self._campaign_from_row(row) for row in rows]
+    
+    def get_campaigns_page(self, limit: int = 20, cursor: Optional[str] = None,
+                           topic: Optional[str] = None,
+                           status: Optional[str] = None) -> Dict:
+        """Returns one page of campaigns, newest first.
+
+        Pagination is keyset-based on (send_date, id): pass the returned
+        next_cursor back in to fetch the following page. Cost per page is
+        independent of how many campaigns precede it.
+        """
+        clauses = []
+        params = []
+        
+        if cursor:
+            send_date, campaign_id = self.decode_campaign_cursor(cursor)
+            clauses.append("(c.send_date, c.id) < (?, ?)")
+            params.extend([send_date, campaign_id])
+        if topic:
+            clauses.append("b.topic LIKE ? ESCAPE '\\'")
+            escaped = topic.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f"%{escaped}%")
+        if status:
+            clauses.append("c.status = ?")
+            params.append(status)
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit + 1)
         
-        campaigns = []
-        for row in cursor.fetchall():
-            campaigns.append({
+        with self.connection() as conn:
+            rows = conn.execute(self.CAMPAIGNS_PAGE_SQL.format(where=where), params).fetchall()
+        
+        has_more = len(rows) > limit
+        campaigns = [self._campaign_from_row(row) for row in rows[:limit]]
+        next_cursor = None
+        if has_more and campaigns:
+            last = campaigns[-1]
+            next_cursor = self.encode_campaign_cursor(last['send_date'], last['id'])
+        
+        return {
+            'campaigns': campaigns,
+            'next_cursor': next_cursor
+        }
+    
+    @staticmethod
+    def encode_campaign_cursor(send_date: str, campaign_id: int) -> str:
+        raw = json.dumps([send_date, campaign_id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+    
+    @staticmethod
+    def decode_campaign_cursor(cursor: str) -> Tuple[str, int]:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            send_date, campaign_id = json.loads(base64.urlsafe_b64decode(padded))
+            return str(send_date), int(campaign_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid campaign cursor: {cursor}") from e
+    
+    @staticmethod
+    def _campaign_from_row(row) -> Dict:
+        return {
+            'id': row[0],
+            'name': row[1],
+            'send_date': row[2],
+            'status': row[3],
+            'blog_title': row[4],
+            'topic': row[5]
+        }
+    
+    def create_job(self, job_id: str, job_type: str, params: Dict, owner: Optional[str] = None):
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO jobs (id, job_type, params, owner, heartbeat_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (job_id, job_type, json.dumps(params), owner))
+    
+    def update_job(self, job_id: str, **fields):
+        allowed = {'status', 'progress', 'stage', 'result', 'error', 'cancel_requested'}
+        unknown = set(fields) - allowed
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self.transaction() as cursor:
+            cursor.execute(f'''
+                UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (*fields.values(), job_id))
+    
+    def claim_job(self, job_id: str, job_type: str, owner: Optional[str] = None) -> bool:
+        """Moves a queued job of job_type to running under owner; False if it
+        was already claimed, has finished or does not exist."""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET status = 'running', owner = ?, heartbeat_at = CURRENT_TIMESTAMP,
+                                updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND job_type = ? AND status = 'queued'
+            ''', (owner, job_id, job_type))
+            return cursor.rowcount == 1
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT id, job_type, status, progress, stage, params, result, error,
+                       cancel_requested, created_at, updated_at
+                FROM jobs
+                WHERE id = ?
+            ''', (job_id,)).fetchone()
+        
+        if row:
+            return {
                 'id': row[0],
-                'name': row[1],
-                'send_date': row[2],
-                'status': row[3],
-                'blog_title': row[4],
-                'topic': row[5]
-            })
+                'type': row[1],
+                'status': row[2],
+                'progress': row[3],
+                'stage': row[4],
+                'params': json.loads(row[5]) if row[5] else {},
+                'result': json.loads(row[6]) if row[6] else None,
+                'error': row[7],
+                'cancel_requested': bool(row[8]),
+                'created_at': row[9],
+                'updated_at': row[10]
+            }
+        return None
+    
+    def request_job_cancel(self, job_id: str) -> bool:
+        """Flags an unfinished job for cancellation; False if it has finished."""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET cancel_requested = 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status IN ('queued', 'running')
+            ''', (job_id,))
+            return cursor.rowcount == 1
+    
+    def get_cancel_requested_jobs(self, owner: str) -> List[str]:
+        with self.connection() as conn:
+            rows = conn.execute('''
+                SELECT id FROM jobs
+                WHERE owner = ? AND cancel_requested = 1 AND status IN ('queued', 'running')
+            ''', (owner,)).fetchall()
+        return [row[0] for row in rows]
+    
+    def heartbeat_jobs(self, owner: str) -> int:
+        """Marks owner's unfinished jobs as still alive."""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                WHERE owner = ? AND status IN ('queued', 'running')
+            ''', (owner,))
+            return cursor.rowcount
+    
+    def fail_stale_jobs(self, reason: str, stale_after_seconds: float) -> int:
+        """Fails queued or running jobs whose owner has not sent a heartbeat
+        for stale_after_seconds, leaving jobs of live processes alone."""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE status IN ('queued', 'running')
+                  AND COALESCE(heartbeat_at, updated_at) < datetime('now', ?)
+            ''', (reason, f"-{int(stale_after_seconds)} seconds"))
+            return cursor.rowcount
+    
+    def expire_queued_jobs(self, job_type: str, reason: str, older_than_seconds: float) -> int:
+        """Fails jobs of job_type still queued older_than_seconds after creation."""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE job_type = ? AND status = 'queued' AND created_at < datetime('now', ?)
+            ''', (reason, job_type, f"-{int(older_than_seconds)} seconds"))
+            return cursor.rowcount
+    
+    def create_pipeline_run(self, run_id: str, params: Dict):
+        with self.transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO pipeline_runs (id, params) VALUES (?, ?)",
+                (run_id, json.dumps(params))
+            )
+    
+    def update_pipeline_run(self, run_id: str, status: str, error: Optional[str] = None):
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE pipeline_runs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (status, error, run_id))
+    
+    def get_pipeline_run(self, run_id: str) -> Optional[Dict]:
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT id, params, status, error, created_at, updated_at, campaign_id
+                FROM pipeline_runs
+                WHERE id = ?
+            ''', (run_id,)).fetchone()
+            if row is None:
+                return None
+            checkpoints = conn.execute(
+                "SELECT stage, output FROM pipeline_checkpoints WHERE run_id = ?", (run_id,)
+            ).fetchall()
         
-        conn.close()
-        return campaigns
+        return {
+            'id': row[0],
+            'params': json.loads(row[1]) if row[1] else {},
+            'status': row[2],
+            'error': row[3],
+            'created_at': row[4],
+            'updated_at': row[5],
+            'campaign_id': row[6],
+            'checkpoints': {stage: json.loads(output) for stage, output in checkpoints}
+        }
     
-    def get_campaign_performance(self, campaign_id: int) -> List[Dict]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_pipeline_run_campaign(self, run_id: str) -> Optional[int]:
+        with self.connection() as conn:
+            row = conn.execute("SELECT campaign_id FROM pipeline_runs WHERE id = ?",
+                               (run_id,)).fetchone()
+        return row[0] if row else None
+    
+    def save_pipeline_checkpoint(self, run_id: str, stage: str, output):
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO pipeline_checkpoints (run_id, stage, output)
+                VALUES (?, ?, ?)
+            ''', (run_id, stage, json.dumps(output)))
+    
+    def get_campaign_insights(self, campaign_id: int) -> Optional[Dict]:
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT fingerprint, insights, updated_at FROM campaign_insights WHERE campaign_id = ?",
+                (campaign_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'fingerprint': row[0], 'insights': row[1], 'updated_at': row[2]}
+    
+    def save_campaign_insights(self, campaign_id: int, fingerprint: str, insights: str):
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO campaign_insights (campaign_id, fingerprint, insights, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (campaign_id) DO UPDATE SET
+                    fingerprint = excluded.fingerprint,
+                    insights = excluded.insights,
+                    updated_at = excluded.updated_at
+            ''', (campaign_id, fingerprint, insights))
+    
+    def get_crm_contact_id(self, email: str) -> Optional[str]:
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT contact_id FROM crm_contacts WHERE email = ?", (email.lower(),)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def get_crm_contacts(self, emails: Iterable[str], verify_after_seconds: Optional[float] = None
+                         ) -> Dict[str, Tuple[str, Optional[str], bool]]:
+        """Returns lower-cased email -> (contact_id, properties_hash, needs_verification)
+        for known contacts. An id needs verification once HubSpot has not
+        confirmed it for verify_after_seconds (never, if that is None)."""
+        emails = [email.lower() for email in emails]
+        cutoff = f"-{int(verify_after_seconds)} seconds" if verify_after_seconds is not None else None
+        known = {}
         
-        cursor.execute('''
-            SELECT persona, sent_count, open_count, click_count, 
-                   open_rate, click_rate, unsubscribe_rate
-            FROM performance_metrics
-            WHERE campaign_id = ?
-        ''', (campaign_id,))
+        with self.connection() as conn:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(emails), 500):
+                chunk = emails[start:start + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                rows = conn.execute(f'''
+                    SELECT email, contact_id, properties_hash,
+                           ? IS NOT NULL AND (verified_at IS NULL OR verified_at <= datetime('now', ?))
+                    FROM crm_contacts
+                    WHERE email IN ({placeholders})
+                ''', (cutoff, cutoff, *chunk)).fetchall()
+                for email, contact_id, properties_hash, stale in rows:
+                    known[email] = (contact_id, properties_hash, bool(stale))
+        
+        return known
+    
+    def save_crm_contact_ids(self, contact_ids: Dict[str, str],
+                             properties_hashes: Optional[Dict[str, str]] = None):
+        """Records email -> CRM contact id mappings, replacing existing ones.
+
+        A contact saved without a properties hash will be re-sent by the next
+        incremental sync.
+        """
+        properties_hashes = properties_hashes or {}
+        rows = [
+            (email.lower(), contact_id, properties_hashes.get(email))
+            for email, contact_id in contact_ids.items()
+        ]
+        
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO crm_contacts (email, contact_id, properties_hash, verified_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (email) DO UPDATE SET
+                    contact_id = excluded.contact_id,
+                    properties_hash = excluded.properties_hash,
+                    updated_at = CURRENT_TIMESTAMP,
+                    verified_at = CURRENT_TIMESTAMP
+            ''', rows)
+    
+    def mark_crm_contacts_verified(self, emails: Iterable[str]):
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "UPDATE crm_contacts SET verified_at = CURRENT_TIMESTAMP WHERE email = ?",
+                [(email.lower(),) for email in emails]
+            )
+    
+    def delete_crm_contact(self, email: str):
+        self.delete_crm_contacts([email])
+    
+    def delete_crm_contacts(self, emails: Iterable[str]):
+        with self.transaction() as cursor:
+            cursor.executemany("DELETE FROM crm_contacts WHERE email = ?",
+                               [(email.lower(),) for email in emails])
+    
+    def get_campaign_performance(self, campaign_id: int) -> List[Dict]:
+        with self.connection() as conn:
+            rows = conn.execute(self.CAMPAIGN_PERFORMANCE_SQL, (campaign_id,)).fetchall()
         
         metrics = []
-        for row in cursor.fetchall():
+        for row in rows:
             metrics.append({
                 'persona': row[0],
                 'sent': row[1],
@@ -211,24 +962,61 @@ class Database:
                 'clicks': row[3],
                 'open_rate': row[4],
                 'click_rate': row[5],
-                'unsubscribe_rate': row[6]
+                'unsubscribe_rate': row[6],
+                'delivered': row[7],
+                'variant': row[8],
+                'unsubscribes': row[9]
             })
         
-        conn.close()
         return metrics
     
-    def get_blog_post(self, blog_id: int) -> Optional[Dict]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_metric_rollups(self, period: str = 'week', since: Optional[datetime] = None,
+                           persona: Optional[str] = None) -> Tuple[List[str], List[Tuple]]:
+        """Daily or weekly totals per persona and topic, as (column names, rows)
+        ready to load into a DataFrame. since selects whole periods, so the
+        period containing it is included."""
+        if period not in ('day', 'week'):
+            raise ValueError(f"Unknown rollup period: {period}")
         
-        cursor.execute('''
-            SELECT id, topic, title, outline, content, created_at, word_count
-            FROM blog_posts
-            WHERE id = ?
-        ''', (blog_id,))
+        conditions, params = [], [period]
+        if since is not None:
+            modifiers = "" if period == 'day' else ", 'weekday 0', '-6 days'"
+            conditions.append(f"AND period_start >= date(?{modifiers})")
+            params.append(since)
+        if persona:
+            conditions.append("AND persona = ?")
+            params.append(persona)
+        
+        sql = self.METRIC_ROLLUPS_SQL.format(where=' '.join(conditions))
+        return self._fetch_with_columns(sql, params)
+    
+    def get_campaign_rollups(self, since: Optional[datetime] = None,
+                             persona: Optional[str] = None) -> Tuple[List[str], List[Tuple]]:
+        """Per-campaign, per-persona totals, as (column names, rows)."""
+        conditions, params = [], []
+        if since is not None:
+            conditions.append("send_date >= ?")
+            params.append(since)
+        if persona:
+            conditions.append("persona = ?")
+            params.append(persona)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
         
-        row = cursor.fetchone()
-        conn.close()
+        return self._fetch_with_columns(self.CAMPAIGN_ROLLUPS_SQL.format(where=where), params)
+    
+    def _fetch_with_columns(self, sql: str, params: List) -> Tuple[List[str], List[Tuple]]:
+        with self.connection() as conn:
+            cursor = conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return columns, cursor.fetchall()
+    
+    def get_blog_post(self, blog_id: int) -> Optional[Dict]:
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT id, topic, title, outline, content, created_at, word_count
+                FROM blog_posts
+                WHERE id = ?
+            ''', (blog_id,)).fetchone()
         
         if row:
             return {
@@ -243,17 +1031,11 @@ class Database:
         return None
     
     def get_newsletters_for_blog(self, blog_id: int) -> List[Dict]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, persona, subject_line, preview_text, content
-            FROM newsletters
-            WHERE blog_id = ?
-        ''', (blog_id,))
+        with self.connection() as conn:
+            rows = conn.execute(self.NEWSLETTERS_FOR_BLOG_SQL, (blog_id,)).fetchall()
         
         newsletters = []
-        for row in cursor.fetchall():
+        for row in rows:
             newsletters.append({
                 'id': row[0],
                 'persona': row[1],
@@ -262,5 +1044,26 @@ class Database:
                 'content': row[4]
             })
         
-        conn.close()
-        return newsletters
\ No newline at end of file
+        return newsletters
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="NovaMind database maintenance")
+    parser.add_argument("command", choices=["migrate", "check-plans", "rebuild-rollups"])
+    parser.add_argument("--db", default="data/novamind.db")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    if args.command == "migrate":
+        print(f"Schema version: {db.schema_version()}")
+    elif args.command == "rebuild-rollups":
+        print(f"Rebuilt {db.rebuild_rollups()} rollup rows")
+    elif args.command == "check-plans":
+        failures = 0
+        for name, result in db.check_query_plans().items():
+            ok = result['uses_index'] and not result['temp_sort']
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {name}: {' | '.join(result['plan'])}")
+        raise SystemExit(1 if failures else 0)
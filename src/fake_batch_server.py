@@ -0,0 +1,233 @@
+import re
+import json
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional
+
+def canned_response(params: Dict) -> str:
+    """Plausible text for the prompts ContentGenerator sends, so batch mode
+    can be exercised end to end without an API key."""
+    prompt = params['messages'][-1]['content']
+
+    persona = re.search(r"newsletter version for (.+?)\.\n", prompt)
+    if persona:
+        return (f"SUBJECT: What's new for {persona.group(1)}\n"
+                f"PREVIEW: A quick summary picked for {persona.group(1)}\n"
+                f"BODY: This week's post, summarised for {persona.group(1)}.\n"
+                f"Read the full blog for the details.")
+
+    alternatives = re.search(r"Generate (\d+) alternative versions", prompt)
+    if alternatives:
+        count = int(alternatives.group(1))
+        return '\n'.join(f"{i}. Alternative subject line {i}" for i in range(1, count + 1))
+
+    return "This is a canned response from the fake batch server."
+
+class FakeBatchServer:
+    """Local stand-in for the Message Batches endpoints, for tests and dry runs.
+
+    Batches finish processing_seconds after they are submitted. Each request
+    is answered by responder(params); custom ids listed in fail_custom_ids
+    come back errored instead. Point the client at it with base_url (or
+    NOVAMIND_BATCH_BASE_URL); the gateway still needs some ANTHROPIC_API_KEY
+    set, though any value will do:
+
+        with FakeBatchServer() as server:
+            client = MessageBatchClient("test-key", base_url=server.base_url, poll_interval=0.1)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, processing_seconds: float = 0.0,
+                 responder: Callable[[Dict], str] = canned_response,
+                 fail_custom_ids: Iterable[str] = ()):
+        self.processing_seconds = processing_seconds
+        self.responder = responder
+        self.fail_custom_ids = set(fail_custom_ids)
+        self.batches: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeBatchServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True,
+                                        name="fake-batch-server")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeBatchServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def create_batch(self, requests) -> Dict:
+        custom_ids = [r['custom_id'] for r in requests]
+        if len(set(custom_ids)) != len(custom_ids):
+            raise ValueError("custom_id values must be unique within a batch")
+
+        batch_id = f"msgbatch_fake_{uuid.uuid4().hex[:16]}"
+        with self._lock:
+            self.batches[batch_id] = {
+                'requests': requests,
+                'created': time.time(),
+                'canceled_at': None
+            }
+        return self.describe(batch_id)
+
+    def cancel_batch(self, batch_id: str) -> Dict:
+        with self._lock:
+            batch = self.batches[batch_id]
+            # Cancelling an ended batch is a no-op
+            if not self._ended(batch):
+                batch['canceled_at'] = time.time()
+        return self.describe(batch_id)
+
+    def _ended(self, batch: Dict) -> bool:
+        if batch['canceled_at'] is not None:
+            return True
+        return time.time() - batch['created'] >= self.processing_seconds
+
+    def describe(self, batch_id: str) -> Dict:
+        batch = self.batches[batch_id]
+        ended = self._ended(batch)
+        counts = {'processing': 0, 'succeeded': 0, 'errored': 0, 'canceled': 0, 'expired': 0}
+        if ended:
+            for entry in self.results(batch_id):
+                counts[entry['result']['type']] += 1
+        else:
+            counts['processing'] = len(batch['requests'])
+
+        def timestamp(seconds: float) -> str:
+            return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+        return {
+            'id': batch_id,
+            'type': 'message_batch',
+            'processing_status': 'ended' if ended else 'in_progress',
+            'request_counts': counts,
+            'created_at': timestamp(batch['created']),
+            'ended_at': timestamp(batch['canceled_at'] or batch['created'] + self.processing_seconds)
+                        if ended else None,
+            'results_url': f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    def results(self, batch_id: str) -> list:
+        batch = self.batches[batch_id]
+        entries = []
+        for request in batch['requests']:
+            custom_id, params = request['custom_id'], request['params']
+            if batch['canceled_at'] is not None:
+                result = {'type': 'canceled'}
+            elif custom_id in self.fail_custom_ids:
+                result = {'type': 'errored', 'error': {
+                    'type': 'error',
+                    'error': {'type': 'api_error', 'message': 'Simulated failure'}
+                }}
+            else:
+                text = self.responder(params)
+                result = {'type': 'succeeded', 'message': {
+                    'id': f"msg_fake_{uuid.uuid4().hex[:16]}",
+                    'type': 'message',
+                    'role': 'assistant',
+                    'model': params.get('model'),
+                    'content': [{'type': 'text', 'text': text}],
+                    'stop_reason': 'end_turn',
+                    'usage': {'input_tokens': len(str(params.get('messages'))) // 4,
+                              'output_tokens': len(text) // 4}
+                }}
+            entries.append({'custom_id': custom_id, 'result': result})
+        return entries
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: str, content_type: str = 'application/json'):
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _error(self, status: int, error_type: str, message: str):
+                self._send(status, json.dumps({
+                    'type': 'error', 'error': {'type': error_type, 'message': message}
+                }))
+
+            def _route(self, method: str):
+                if not self.headers.get('x-api-key'):
+                    return self._error(401, 'authentication_error', 'x-api-key header is required')
+
+                parts = self.path.rstrip('/').split('/')[1:]
+                if parts[:3] != ['v1', 'messages', 'batches']:
+                    return self._error(404, 'not_found_error', f"Unknown path {self.path}")
+                batch_id = parts[3] if len(parts) > 3 else None
+                action = parts[4] if len(parts) > 4 else None
+
+                if batch_id is not None and batch_id not in server.batches:
+                    return self._error(404, 'not_found_error', f"Batch {batch_id} not found")
+
+                if method == 'POST' and batch_id is None:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    try:
+                        body = json.loads(self.rfile.read(length) or b'{}')
+                        batch = server.create_batch(body['requests'])
+                    except (ValueError, KeyError, TypeError) as e:
+                        return self._error(400, 'invalid_request_error', str(e))
+                    return self._send(200, json.dumps(batch))
+                if method == 'POST' and action == 'cancel':
+                    return self._send(200, json.dumps(server.cancel_batch(batch_id)))
+                if method == 'GET' and batch_id and action is None:
+                    return self._send(200, json.dumps(server.describe(batch_id)))
+                if method == 'GET' and action == 'results':
+                    if not server._ended(server.batches[batch_id]):
+                        return self._error(400, 'invalid_request_error',
+                                           f"Batch {batch_id} is still processing")
+                    lines = '\n'.join(json.dumps(entry) for entry in server.results(batch_id))
+                    return self._send(200, lines + '\n', 'application/x-jsonl')
+                return self._error(405, 'invalid_request_error', f"{method} {self.path} not supported")
+
+            def do_GET(self):
+                self._route('GET')
+
+            def do_POST(self):
+                self._route('POST')
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a fake Message Batches API locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=2.0,
+                        help="seconds each batch spends processing")
+    args = parser.parse_args()
+
+    server = FakeBatchServer(port=args.port, processing_seconds=args.delay)
+    print(f"Fake batch server on {server.base_url}")
+    print(f"   export NOVAMIND_BATCH_BASE_URL={server.base_url} ANTHROPIC_API_KEY=test")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
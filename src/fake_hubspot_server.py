@@ -0,0 +1,217 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+CONTACTS_PATH = '/crm/v3/objects/contacts'
+
+class FakeHubSpotServer:
+    """Local stand-in for the HubSpot CRM v3 contact endpoints that
+    HubSpotManager uses, for tests and dry runs.
+
+    Contacts live in memory keyed by id, with emails matched
+    case-insensitively as HubSpot does. Emails listed in reject_emails come
+    back as per-item errors from batch upsert. Point the manager at it with
+    base_url (or NOVAMIND_HUBSPOT_BASE_URL) and any HUBSPOT_API_KEY:
+
+        with FakeHubSpotServer() as server:
+            crm = HubSpotManager(base_url=server.base_url)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 reject_emails: Iterable[str] = ()):
+        self.reject_emails = {email.lower() for email in reject_emails}
+        self.contacts: Dict[str, Dict] = {}
+        # "METHOD /path" -> number of calls, for asserting on traffic
+        self.requests: Dict[str, int] = {}
+        self._ids = count(1001)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeHubSpotServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True,
+                                        name="fake-hubspot-server")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeHubSpotServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def find_by_email(self, email: str) -> Optional[str]:
+        email = email.lower()
+        for contact_id, properties in self.contacts.items():
+            if (properties.get('email') or '').lower() == email:
+                return contact_id
+        return None
+
+    def delete_contact(self, contact_id: str) -> bool:
+        """Removes a contact, as if it had been deleted or merged in HubSpot."""
+        with self._lock:
+            return self.contacts.pop(contact_id, None) is not None
+
+    def _record(self, properties: Dict, contact_id: Optional[str] = None) -> str:
+        contact_id = contact_id or str(next(self._ids))
+        stored = self.contacts.setdefault(contact_id, {})
+        stored.update({key: value for key, value in properties.items() if value is not None})
+        if stored.get('email'):
+            stored['email'] = stored['email'].lower()
+        return contact_id
+
+    def _result(self, contact_id: str, new: Optional[bool] = None) -> Dict:
+        result = {'id': contact_id, 'properties': dict(self.contacts[contact_id])}
+        if new is not None:
+            result['new'] = new
+        return result
+
+    def batch_upsert(self, inputs) -> Tuple[int, Dict]:
+        ids = [str(item['id']).lower() for item in inputs]
+        if len(set(ids)) != len(ids):
+            return 400, _error('VALIDATION_ERROR', "Duplicate IDs found in batch input")
+
+        results, errors = [], []
+        with self._lock:
+            for item, email in zip(inputs, ids):
+                if email in self.reject_emails:
+                    errors.append(dict(_error('VALIDATION_ERROR', f"Property values were not valid: {email}"),
+                                       context={'ids': [item['id']]}))
+                    continue
+                existing = self.find_by_email(email)
+                contact_id = self._record(dict(item.get('properties') or {}, email=email), existing)
+                results.append(self._result(contact_id, new=existing is None))
+
+        body = {'status': 'COMPLETE', 'results': results}
+        if errors:
+            body['errors'] = errors
+            body['numErrors'] = len(errors)
+        return (207 if errors else 200), body
+
+    def batch_read(self, inputs) -> Tuple[int, Dict]:
+        results, missing = [], []
+        with self._lock:
+            for item in inputs:
+                contact_id = str(item['id'])
+                if contact_id in self.contacts:
+                    results.append(self._result(contact_id))
+                else:
+                    missing.append(contact_id)
+
+        body = {'status': 'COMPLETE', 'results': results}
+        if missing:
+            body['errors'] = [dict(_error('OBJECT_NOT_FOUND', "Could not get some CONTACT objects"),
+                                   context={'ids': missing})]
+            body['numErrors'] = 1
+        return (207 if missing else 200), body
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: Optional[Dict] = None):
+                payload = json.dumps(body).encode('utf-8') if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _json(self) -> Dict:
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def _route(self, method: str):
+                path = urlsplit(self.path).path.rstrip('/')
+                with server._lock:
+                    key = f"{method} {path}"
+                    server.requests[key] = server.requests.get(key, 0) + 1
+
+                if not self.headers.get('Authorization', '').startswith('Bearer '):
+                    return self._send(401, _error('INVALID_AUTHENTICATION', "Authentication credentials not found"))
+                if not path.startswith(CONTACTS_PATH):
+                    return self._send(404, _error('OBJECT_NOT_FOUND', f"Unknown path {path}"))
+
+                rest = path[len(CONTACTS_PATH):].strip('/')
+                if method == 'GET' and rest == '':
+                    with server._lock:
+                        results = [server._result(i) for i in list(server.contacts)[:1]]
+                    return self._send(200, {'results': results})
+                if method == 'POST' and rest == 'batch/upsert':
+                    return self._send(*server.batch_upsert(self._json().get('inputs', [])))
+                if method == 'POST' and rest == 'batch/read':
+                    return self._send(*server.batch_read(self._json().get('inputs', [])))
+                if method == 'POST' and rest == 'search':
+                    filters = self._json()['filterGroups'][0]['filters']
+                    email = next(f['value'] for f in filters if f['propertyName'] == 'email')
+                    with server._lock:
+                        contact_id = server.find_by_email(email)
+                        results = [server._result(contact_id)] if contact_id else []
+                    return self._send(200, {'total': len(results), 'results': results})
+                if method == 'POST' and rest == '':
+                    with server._lock:
+                        contact_id = server._record(self._json().get('properties') or {})
+                        return self._send(201, server._result(contact_id))
+                if rest and '/' not in rest:
+                    with server._lock:
+                        if rest not in server.contacts:
+                            return self._send(404, _error('OBJECT_NOT_FOUND', f"Contact {rest} not found"))
+                        if method == 'PATCH':
+                            server._record(self._json().get('properties') or {}, rest)
+                            return self._send(200, server._result(rest))
+                        if method == 'DELETE':
+                            del server.contacts[rest]
+                            return self._send(204)
+                return self._send(405, _error('VALIDATION_ERROR', f"{method} {path} not supported"))
+
+            def do_GET(self):
+                self._route('GET')
+
+            def do_POST(self):
+                self._route('POST')
+
+            def do_PATCH(self):
+                self._route('PATCH')
+
+            def do_DELETE(self):
+                self._route('DELETE')
+
+        return Handler
+
+def _error(category: str, message: str) -> Dict:
+    return {'status': 'error', 'category': category, 'message': message}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a fake HubSpot contacts API locally")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    server = FakeHubSpotServer(port=args.port)
+    print(f"Fake HubSpot server on {server.base_url}")
+    print(f"   export NOVAMIND_HUBSPOT_BASE_URL={server.base_url} HUBSPOT_API_KEY=test")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
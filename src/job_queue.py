@@ -0,0 +1,149 @@
+import os
+import uuid
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Optional
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested."""
+
+
+class JobContext:
+    """Handed to every job function to report progress and observe cancellation."""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    @property
+    def cancelled(self) -> bool:
+        return self.job_id in self.queue._cancel_requested
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.job_id)
+
+    def progress(self, fraction: float, stage: str):
+        """Records progress and acts as a cancellation point between steps."""
+        self.check_cancelled()
+        self.queue.db.update_job(self.job_id, progress=round(fraction, 3), stage=stage)
+        print(f"   [job {self.job_id[:8]}] {stage} ({fraction:.0%})")
+
+
+class JobQueue:
+    """Runs registered job types on a worker pool, persisting state in the jobs table.
+
+    Several processes can share one jobs table. Each queue owns the jobs it
+    submits and refreshes their heartbeat every heartbeat_interval seconds;
+    a job whose heartbeat is older than stale_after seconds belongs to a
+    process that has exited and is failed by whichever queue notices first.
+    Any process may cancel a job; the owner picks up the request with its
+    next heartbeat.
+    """
+
+    def __init__(self, db, workers: int = 4, heartbeat_interval: float = 15.0,
+                 stale_after: float = 60.0):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="novamind-job")
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._handlers: Dict[str, Callable] = {}
+        self._futures: Dict[str, Future] = {}
+        self._cancel_requested = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        self._fail_stale_jobs()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, daemon=True,
+                                                  name="novamind-job-heartbeat")
+        self._heartbeat_thread.start()
+
+    def _fail_stale_jobs(self):
+        # Jobs whose process exited while they were queued or running can
+        # never finish; surface them as failed instead of stuck
+        interrupted = self.db.fail_stale_jobs("Interrupted: the owning process stopped",
+                                              self.stale_after)
+        if interrupted:
+            print(f"⚠️  Marked {interrupted} interrupted job(s) as failed")
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            try:
+                self.db.heartbeat_jobs(self.instance_id)
+                self._sync_cancellations()
+                self._fail_stale_jobs()
+            except Exception as e:
+                print(f"⚠️  Job heartbeat failed: {str(e)}")
+
+    def _sync_cancellations(self):
+        # Cancellations requested through another process only reach the
+        # jobs table
+        requested = self.db.get_cancel_requested_jobs(self.instance_id)
+        with self._lock:
+            self._cancel_requested.update(job_id for job_id in requested
+                                          if job_id in self._futures)
+
+    def register(self, job_type: str, handler: Callable):
+        """handler(job: JobContext, **params) -> JSON-serialisable result."""
+        self._handlers[job_type] = handler
+
+    def submit(self, job_type: str, params: Optional[Dict] = None) -> str:
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        params = params or {}
+        job_id = uuid.uuid4().hex
+        self.db.create_job(job_id, job_type, params, owner=self.instance_id)
+
+        with self._lock:
+            self._futures[job_id] = self.executor.submit(self._run, job_id, job_type, params)
+        return job_id
+
+    def _run(self, job_id: str, job_type: str, params: Dict):
+        job = JobContext(self, job_id)
+        try:
+            if self.db.get_job(job_id)['cancel_requested']:
+                raise JobCancelled(job_id)
+            job.check_cancelled()
+            self.db.update_job(job_id, status='running')
+            result = self._handlers[job_type](job, **params)
+            self.db.update_job(job_id, status='succeeded', progress=1.0, result=result)
+        except JobCancelled:
+            self.db.update_job(job_id, status='cancelled')
+            print(f"🛑 Job {job_id[:8]} cancelled")
+        except Exception as e:
+            self.db.update_job(job_id, status='failed', error=str(e))
+            print(f"❌ Job {job_id[:8]} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+                self._cancel_requested.discard(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.db.get_job(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a queued job outright, or asks a running one to stop at its
+        next progress checkpoint. Returns False if the job is already finished.
+
+        Jobs owned by another process are flagged in the jobs table and stop
+        once their owner's heartbeat sees the flag.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is None:
+                return self.db.request_job_cancel(job_id)
+            if future.cancel():
+                self._futures.pop(job_id, None)
+                self.db.update_job(job_id, status='cancelled', cancel_requested=1)
+                return True
+            self._cancel_requested.add(job_id)
+
+        self.db.update_job(job_id, cancel_requested=1)
+        return True
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+        self._stopped.set()
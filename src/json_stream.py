@@ -0,0 +1,78 @@
+import re
+import json
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+READ_BLOCK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+_SEPARATORS = re.compile(r'[ \t\r\n,]*')
+
+def iter_json_array(path: str, key: Optional[str] = None) -> Iterator:
+    """Yields the items of a JSON array one at a time without loading the file.
+
+    The file is either a bare array or, when key is given, an object
+    holding the array under that key.
+    """
+    decoder = json.JSONDecoder()
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        # Start of the unparsed part of buffer; consumed text is only
+        # dropped when the next block is read
+        idx = 0
+        
+        def read_more() -> bool:
+            nonlocal buffer, idx
+            # At least double the pending text, so an item larger than a
+            # block is not re-parsed once per block
+            block = f.read(max(READ_BLOCK_SIZE, len(buffer) - idx))
+            if not block:
+                return False
+            buffer = buffer[idx:] + block
+            idx = 0
+            return True
+        
+        # Position just past the opening bracket of the array
+        while True:
+            start = _WHITESPACE.match(buffer).end()
+            if start < len(buffer) and buffer[start] == '[':
+                idx = start + 1
+                break
+            key_at = buffer.find(f'"{key}"') if key and start < len(buffer) else -1
+            bracket_at = buffer.find('[', key_at) if key_at != -1 else -1
+            if bracket_at != -1:
+                idx = bracket_at + 1
+                break
+            if not read_more():
+                raise ValueError(f"No JSON array found in {path}")
+        
+        while True:
+            idx = _SEPARATORS.match(buffer, idx).end()
+            if idx == len(buffer):
+                if not read_more():
+                    raise ValueError(f"Unterminated JSON array in {path}")
+                continue
+            if buffer[idx] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, idx)
+            except json.JSONDecodeError:
+                if not read_more():
+                    raise
+                continue
+            if end == len(buffer) and read_more():
+                # A number or literal cut off by the block boundary would
+                # decode short; parse it again with the rest of the file
+                continue
+            yield item
+            idx = end
+
+def iter_chunks(items: Iterable, size: int) -> Iterator[List]:
+    """Groups an iterable into lists of at most size items."""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
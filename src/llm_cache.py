@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from src.database import ConnectionPool
+
+DEFAULT_MODEL = "claude-sonnet-4-20250514"
+
+class LLMCache:
+    """Disk-backed cache of LLM responses keyed by a hash of the request.
+
+    Entries expire after ttl_seconds and the least recently used ones are
+    evicted once the store holds more than max_entries responses.
+    """
+
+    def __init__(self, path: str = "data/llm_cache.db", ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 5000, enabled: bool = True):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self.pool = ConnectionPool(path, size=4)
+        self._init_store()
+
+    def _init_store(self):
+        conn = self.pool.acquire()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            ''')
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed "
+                "ON llm_cache (last_accessed)"
+            )
+        finally:
+            self.pool.release(conn)
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        payload = json.dumps({
+            'model': model,
+            'prompt': prompt,
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        conn = self.pool.acquire()
+        try:
+            row = conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                row = None
+            elif row:
+                conn.execute("UPDATE llm_cache SET last_accessed = ? WHERE key = ?", (now, key))
+        finally:
+            self.pool.release(conn)
+
+        self._count(row is not None)
+        return row[0] if row else None
+
+    def set(self, key: str, response: str, model: str = None):
+        if not self.enabled:
+            return
+
+        now = time.time()
+        conn = self.pool.acquire()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute('''
+                INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, model, response, now, now))
+            conn.execute('''
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache
+                    ORDER BY last_accessed DESC
+                    LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            conn.execute("COMMIT")
+        finally:
+            self.pool.release(conn)
+
+    def purge_expired(self) -> int:
+        conn = self.pool.acquire()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            return cursor.rowcount
+        finally:
+            self.pool.release(conn)
+
+    def clear(self):
+        conn = self.pool.acquire()
+        try:
+            conn.execute("DELETE FROM llm_cache")
+        finally:
+            self.pool.release(conn)
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        conn = self.pool.acquire()
+        try:
+            entries = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        finally:
+            self.pool.release(conn)
+
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_cache() -> LLMCache:
+    """Process-wide cache shared by every module that calls the LLM.
+
+    Configured through NOVAMIND_LLM_CACHE (set to 0 to disable),
+    NOVAMIND_LLM_CACHE_PATH, NOVAMIND_LLM_CACHE_TTL (seconds) and
+    NOVAMIND_LLM_CACHE_MAX_ENTRIES.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMCache(
+                path=os.getenv('NOVAMIND_LLM_CACHE_PATH', 'data/llm_cache.db'),
+                ttl_seconds=float(os.getenv('NOVAMIND_LLM_CACHE_TTL', 7 * 24 * 3600)),
+                max_entries=int(os.getenv('NOVAMIND_LLM_CACHE_MAX_ENTRIES', '5000')),
+                enabled=os.getenv('NOVAMIND_LLM_CACHE', '1') != '0'
+            )
+        return _shared_cache
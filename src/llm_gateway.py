@@ -0,0 +1,300 @@
+import os
+import time
+import random
+import threading
+from typing import Dict, Iterator, Optional, Union
+
+import anthropic
+import httpx
+from anthropic import Anthropic
+
+from src.llm_cache import DEFAULT_MODEL, LLMCache, get_shared_cache
+from src.message_batches import BatchRequestError, MessageBatchClient
+from src.rate_limit import AdaptiveConcurrencyLimiter, TokenBucket
+
+RETRYABLE_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.APIConnectionError,
+    anthropic.APITimeoutError,
+)
+
+class LLMGateway:
+    """Single entry point for Anthropic calls shared by every pipeline module.
+
+    Requests are admitted through requests/min and tokens/min buckets and an
+    AIMD concurrency limit, answered from the shared response cache when
+    possible, and retried with jittered exponential backoff that honours the
+    server's retry-after header.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, requests_per_minute: int = 50,
+                 tokens_per_minute: int = 40000, max_concurrency: int = 8,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 cache: Optional[LLMCache] = None, batch_poll_interval: float = 15.0):
+        self.client = None
+        self.batches = None
+        if api_key:
+            # Retries are handled here so they respect the shared limits
+            self.client = Anthropic(api_key=api_key, http_client=httpx.Client(), max_retries=0)
+            self.batches = MessageBatchClient(api_key, poll_interval=batch_poll_interval,
+                                              max_retries=max_retries, base_delay=base_delay,
+                                              max_delay=max_delay)
+
+        self.cache = cache if cache is not None else get_shared_cache()
+        self.request_bucket = TokenBucket.per_minute(requests_per_minute)
+        self.token_bucket = TokenBucket.per_minute(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial=max(1, max_concurrency // 2), maximum=max_concurrency
+        )
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.requests = 0
+        self.batch_requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def complete(self, prompt: str, max_tokens: int, temperature: float,
+                 model: str = DEFAULT_MODEL) -> str:
+        """Returns the text of a single-turn completion."""
+        if not self.available:
+            raise RuntimeError("LLM gateway has no Anthropic API key configured")
+
+        key = self.cache.make_key(model, prompt, temperature, max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        message = self.call(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        text = message.content[0].text
+        self.cache.set(key, text, model=model)
+        return text
+
+    def complete_batch(self, prompts: Dict[str, Dict], model: str = DEFAULT_MODEL
+                       ) -> Dict[str, Union[str, BatchRequestError]]:
+        """Completes many independent prompts through the Message Batches API.
+
+        prompts maps a custom_id (letters, digits, _ and -) to
+        {'prompt', 'max_tokens', 'temperature'}. Cached responses are answered
+        locally and only the rest are submitted, as a single batch. Returns
+        the text, or a BatchRequestError, for every custom_id.
+        """
+        if not self.available:
+            raise RuntimeError("LLM gateway has no Anthropic API key configured")
+
+        results = {}
+        keys = {}
+        requests = []
+        for custom_id, request in prompts.items():
+            key = self.cache.make_key(model, request['prompt'], request['temperature'],
+                                      request['max_tokens'])
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[custom_id] = cached
+                continue
+            keys[custom_id] = key
+            requests.append({
+                'custom_id': custom_id,
+                'params': {
+                    'model': model,
+                    'max_tokens': request['max_tokens'],
+                    'temperature': request['temperature'],
+                    'messages': [{"role": "user", "content": request['prompt']}]
+                }
+            })
+
+        if not requests:
+            return results
+
+        with self._stats_lock:
+            self.batch_requests += len(requests)
+        for custom_id, outcome in self.batches.run(requests).items():
+            if not isinstance(outcome, BatchRequestError):
+                # A succeeded message can still carry no text (e.g. an empty
+                # content list); fail just that request rather than the batch
+                text = next((block.get('text') for block in outcome.get('content') or []
+                             if block.get('type') == 'text'), None)
+                if text is None:
+                    outcome = BatchRequestError(custom_id, 'errored', "response had no text content")
+            if isinstance(outcome, BatchRequestError):
+                with self._stats_lock:
+                    self.failures += 1
+                results[custom_id] = outcome
+                continue
+            self.cache.set(keys[custom_id], text, model=model)
+            results[custom_id] = text
+        return results
+
+    def call(self, **params):
+        """Issues messages.create under the rate limits, retrying transient errors."""
+        estimate = self._estimate_tokens(params)
+
+        attempt = 0
+        while True:
+            self._admit(estimate)
+            try:
+                message = self.client.messages.create(**params)
+            except RETRYABLE_ERRORS as e:
+                delay = self._retry_delay_or_raise(e, attempt)
+            else:
+                self.concurrency.on_success()
+                self._settle_tokens(estimate, message)
+                return message
+            finally:
+                self.concurrency.release()
+
+            time.sleep(delay)
+            attempt += 1
+
+    def stream(self, prompt: str, max_tokens: int, temperature: float,
+               model: str = DEFAULT_MODEL) -> Iterator[str]:
+        """Yields completion text as it is generated.
+
+        A cached response is yielded as one chunk. Transient errors are only
+        retried before the first chunk has been handed to the caller.
+        """
+        if not self.available:
+            raise RuntimeError("LLM gateway has no Anthropic API key configured")
+
+        key = self.cache.make_key(model, prompt, temperature, max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        params = {
+            'model': model,
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'messages': [{"role": "user", "content": prompt}]
+        }
+        estimate = self._estimate_tokens(params)
+        chunks = []
+
+        attempt = 0
+        while True:
+            self._admit(estimate)
+            try:
+                with self.client.messages.stream(**params) as stream:
+                    for text in stream.text_stream:
+                        chunks.append(text)
+                        yield text
+                    message = stream.get_final_message()
+            except RETRYABLE_ERRORS as e:
+                if chunks:
+                    with self._stats_lock:
+                        self.failures += 1
+                    raise
+                delay = self._retry_delay_or_raise(e, attempt)
+            else:
+                self.concurrency.on_success()
+                self._settle_tokens(estimate, message)
+                self.cache.set(key, ''.join(chunks), model=model)
+                return
+            finally:
+                self.concurrency.release()
+
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _estimate_tokens(params: Dict) -> int:
+        # Roughly four characters per token for English prose; the estimate is
+        # settled against the reported usage once the call succeeds
+        prompt_chars = sum(len(str(m.get('content', ''))) for m in params.get('messages', []))
+        return prompt_chars // 4 + params.get('max_tokens', 0)
+
+    def _admit(self, estimate: int):
+        self.request_bucket.acquire()
+        self.token_bucket.acquire(estimate)
+        self.concurrency.acquire()
+        with self._stats_lock:
+            self.requests += 1
+
+    def _retry_delay_or_raise(self, error: Exception, attempt: int) -> float:
+        if isinstance(error, (anthropic.RateLimitError, anthropic.InternalServerError)):
+            self.concurrency.on_overload()
+        if attempt >= self.max_retries:
+            with self._stats_lock:
+                self.failures += 1
+            raise error
+
+        delay = self._backoff_delay(attempt, error)
+        with self._stats_lock:
+            self.retries += 1
+            self.throttled += int(isinstance(error, anthropic.RateLimitError))
+        print(f"⏳ LLM call failed ({type(error).__name__}), retrying in {delay:.1f}s...")
+        return delay
+
+    def _settle_tokens(self, estimate: int, message):
+        usage = getattr(message, 'usage', None)
+        if usage is None:
+            return
+        actual = (usage.input_tokens or 0) + (usage.output_tokens or 0)
+        if estimate > actual:
+            self.token_bucket.refund(estimate - actual)
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(ceiling / 2, ceiling)
+
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return min(delay, self.max_delay)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, 'response', None)
+        if response is None:
+            return None
+        value = response.headers.get('retry-after')
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'requests': self.requests,
+                'batch_requests': self.batch_requests,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'failures': self.failures,
+                'concurrency_limit': self.concurrency.limit,
+                'cache': self.cache.stats()
+            }
+
+
+_shared_gateway = None
+_shared_gateway_lock = threading.Lock()
+
+def get_gateway() -> LLMGateway:
+    """Process-wide gateway, configured from ANTHROPIC_API_KEY and
+    NOVAMIND_LLM_RPM, NOVAMIND_LLM_TPM, NOVAMIND_LLM_CONCURRENCY and
+    NOVAMIND_LLM_BATCH_POLL."""
+    global _shared_gateway
+    with _shared_gateway_lock:
+        if _shared_gateway is None:
+            _shared_gateway = LLMGateway(
+                api_key=os.getenv('ANTHROPIC_API_KEY'),
+                requests_per_minute=int(os.getenv('NOVAMIND_LLM_RPM', '50')),
+                tokens_per_minute=int(os.getenv('NOVAMIND_LLM_TPM', '40000')),
+                max_concurrency=int(os.getenv('NOVAMIND_LLM_CONCURRENCY', '8')),
+                batch_poll_interval=float(os.getenv('NOVAMIND_LLM_BATCH_POLL', '15'))
+            )
+        return _shared_gateway
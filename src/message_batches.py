@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import random
+from typing import Dict, Iterator, List, Optional, Union
+
+import httpx
+
+DEFAULT_BASE_URL = "https://api.anthropic.com"
+API_VERSION = "2023-06-01"
+
+# Statuses worth retrying while submitting or polling a batch
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504, 529)
+
+class BatchRequestError(Exception):
+    """A single request in a batch did not succeed (errored, canceled or expired)."""
+
+    def __init__(self, custom_id: str, result_type: str, detail: str = ""):
+        self.custom_id = custom_id
+        self.result_type = result_type
+        super().__init__(f"Batch request {custom_id} {result_type}" + (f": {detail}" if detail else ""))
+
+class MessageBatchClient:
+    """Thin client for the Anthropic Message Batches endpoints.
+
+    The pinned anthropic SDK predates batches, so requests are made over
+    plain HTTP. run() submits every request as one batch, polls until the
+    batch has ended and returns each result keyed by its custom_id. Batches
+    are billed and rate limited separately from interactive calls, which
+    suits overnight runs that don't need an answer within seconds.
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, poll_interval: float = 15.0,
+                 timeout: float = 24 * 3600, max_retries: int = 5, base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        # Not ANTHROPIC_BASE_URL: the SDK client reads that too, and the
+        # interactive calls should keep going to the real API
+        self.base_url = (base_url or os.getenv('NOVAMIND_BATCH_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.http = httpx.Client(
+            headers={
+                'x-api-key': api_key,
+                'anthropic-version': API_VERSION,
+                'content-type': 'application/json'
+            },
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
+
+    def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if not url.startswith('http'):
+            url = f"{self.base_url}{url}"
+
+        attempt = 0
+        while True:
+            try:
+                response = self.http.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.TimeoutException) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                print(f"⏳ Batch API call failed ({type(e).__name__}), retrying in {delay:.1f}s...")
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                delay = self._backoff_delay(attempt, response.headers.get('retry-after'))
+                print(f"⏳ Batch API returned {response.status_code}, retrying in {delay:.1f}s...")
+
+            time.sleep(delay)
+            attempt += 1
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(ceiling / 2, ceiling)
+        try:
+            if retry_after is not None:
+                delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+        return min(delay, self.max_delay)
+
+    def create(self, requests: List[Dict]) -> Dict:
+        """Submits [{'custom_id': ..., 'params': {...messages.create params}}]."""
+        return self._request('POST', '/v1/messages/batches', json={'requests': requests}).json()
+
+    def retrieve(self, batch_id: str) -> Dict:
+        return self._request('GET', f"/v1/messages/batches/{batch_id}").json()
+
+    def cancel(self, batch_id: str) -> Dict:
+        return self._request('POST', f"/v1/messages/batches/{batch_id}/cancel").json()
+
+    def iter_results(self, batch: Dict) -> Iterator[Dict]:
+        """Yields the JSONL result entries of an ended batch, in any order."""
+        url = batch.get('results_url') or f"/v1/messages/batches/{batch['id']}/results"
+        for line in self._request('GET', url).text.splitlines():
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+    def wait(self, batch_id: str) -> Dict:
+        """Polls until the batch has ended, cancelling it once the timeout passes."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            batch = self.retrieve(batch_id)
+            if batch['processing_status'] == 'ended':
+                return batch
+            if time.monotonic() >= deadline:
+                self.cancel(batch_id)
+                raise TimeoutError(f"Message batch {batch_id} did not finish within {self.timeout:.0f}s")
+            time.sleep(self.poll_interval)
+
+    def run(self, requests: List[Dict]) -> Dict[str, Union[Dict, BatchRequestError]]:
+        """Submits requests as one batch and waits for it.
+
+        Returns the message for each succeeded custom_id and a
+        BatchRequestError for each one that did not.
+        """
+        batch = self.create(requests)
+        print(f"📦 Submitted message batch {batch['id']} ({len(requests)} requests), waiting for results...")
+
+        started = time.monotonic()
+        batch = self.wait(batch['id'])
+
+        results = {}
+        for entry in self.iter_results(batch):
+            result = entry['result']
+            if result['type'] == 'succeeded':
+                results[entry['custom_id']] = result['message']
+            else:
+                error = result.get('error') or {}
+                detail = (error.get('error') or error).get('message', '')
+                results[entry['custom_id']] = BatchRequestError(entry['custom_id'], result['type'], detail)
+
+        # Anything the batch did not report on is treated as expired
+        for request in requests:
+            results.setdefault(request['custom_id'],
+                               BatchRequestError(request['custom_id'], 'expired', 'missing from results'))
+
+        succeeded = sum(1 for r in results.values() if not isinstance(r, BatchRequestError))
+        print(f"✅ Message batch {batch['id']} ended in {time.monotonic() - started:.1f}s: "
+              f"{succeeded}/{len(requests)} succeeded")
+        return results
+
+    def close(self):
+        self.http.close()
@@ -1,17 +1,12 @@
-import os
 from typing import Dict, List
-from anthropic import Anthropic
+from src.llm_gateway import get_gateway
 
 class ContentOptimizer:
     def __init__(self):
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if api_key:
-            self.client = Anthropic(api_key=api_key)
-        else:
-            self.client = None
+        self.llm = get_gateway()
     
     def suggest_improvements(self, content: str, performance_data: Dict) -> Dict:
-        if not self.client:
+        if not self.llm.available:
             return {
                 'suggestions': [
                     "Add more specific examples",
@@ -39,14 +34,11 @@ Provide 3-5 specific, actionable suggestions to improve engagement. Focus on:
 Format as a numbered list."""
 
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
+            suggestions_text = self.llm.complete(
+                prompt,
                 max_tokens=400,
-                temperature=0.7,
-                messages=[{"role": "user", "content": prompt}]
+                temperature=0.7
             )
-            
-            suggestions_text = message.content[0].text
             suggestions = [
                 line.strip() for line in suggestions_text.split('\n')
                 if line.strip() and line[0].isdigit()
@@ -65,7 +57,7 @@ Format as a numbered list."""
             }
     
     def optimize_subject_line(self, subject: str, target_persona: str) -> List[str]:
-        if not self.client:
+        if not self.llm.available:
             return [
                 f"[Optimized] {subject}",
                 f"[Improved] {subject}",
@@ -85,14 +77,11 @@ Create 3 variations that:
 Return just the 3 subject lines, numbered."""
 
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
+            response = self.llm.complete(
+                prompt,
                 max_tokens=200,
-                temperature=0.8,
-                messages=[{"role": "user", "content": prompt}]
+                temperature=0.8
             )
-            
-            response = message.content[0].text
             variations = []
             
             for line in response.split('\n'):
@@ -0,0 +1,376 @@
+import os
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from src.content_gen import NewsletterGenerationError
+from src.contact_store import CONTACT_CHUNK_SIZE, DEFAULT_CONTACTS_PATH, ContactStore, iter_contacts
+from src.json_stream import iter_chunks
+
+class Stage:
+    """One step of a pipeline: func(ctx) runs once every stage in requires
+    has finished, and its return value is stored as ctx.results[name].
+
+    Stages whose output is not JSON-serialisable, or is cheap to recompute,
+    set checkpoint=False and are re-run on resume when still needed.
+    """
+
+    def __init__(self, name: str, func: Callable, requires: Sequence[str] = (),
+                 checkpoint: bool = True):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.checkpoint = checkpoint
+
+
+class StageFailed(Exception):
+    """Raised when a stage errors; carries the run so far for reporting."""
+
+    def __init__(self, stage: str, error: Exception, run: "PipelineRun"):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+        self.run = run
+
+
+class PipelineRun:
+    """Results and per-stage timings of one pipeline execution."""
+
+    def __init__(self, results: Optional[Dict[str, Any]] = None):
+        self.results: Dict[str, Any] = dict(results or {})
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.started_at = time.perf_counter()
+        self.wall_seconds = 0.0
+
+    def timing_report(self) -> Dict:
+        busy = sum(t['seconds'] for t in self.timings.values())
+        return {
+            'stages': {name: {k: round(v, 3) for k, v in timing.items()}
+                       for name, timing in self.timings.items()},
+            'wall_seconds': round(self.wall_seconds, 3),
+            'stage_seconds': round(busy, 3)
+        }
+
+
+class Pipeline:
+    """A graph of stages run by a scheduler that starts every stage as soon
+    as its dependencies are done, so independent stages overlap and the run
+    takes roughly as long as its critical path."""
+
+    def __init__(self, stages: Iterable[Stage], max_workers: int = 4):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            self.stages[stage.name] = stage
+        self.max_workers = max_workers
+        self._validate()
+
+    def _validate(self):
+        for stage in self.stages.values():
+            for dependency in stage.requires:
+                if dependency not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' requires unknown stage '{dependency}'")
+
+        # Depth-first search for cycles
+        state: Dict[str, int] = {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 1:
+                raise ValueError(f"Stage dependency cycle: {' -> '.join(path + [name])}")
+            if state.get(name) == 2:
+                return
+            state[name] = 1
+            for dependency in self.stages[name].requires:
+                visit(dependency, path + [name])
+            state[name] = 2
+
+        for name in self.stages:
+            visit(name, [])
+
+    def subset(self, targets: Iterable[str], provided: Iterable[str] = ()) -> "Pipeline":
+        """The stages needed to produce targets, not descending past stages
+        whose results are provided up front."""
+        provided = set(provided)
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in needed:
+                continue
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            needed.add(name)
+            if name not in provided:
+                stack.extend(self.stages[name].requires)
+        # Provided stages stay in the graph as roots so their dependents validate
+        return Pipeline([
+            Stage(name, stage.func) if name in provided else stage
+            for name, stage in self.stages.items() if name in needed
+        ], self.max_workers)
+
+    def resumable(self, completed: Iterable[str]) -> "Pipeline":
+        """The stages still to run given checkpointed results for completed;
+        non-checkpointed stages are included only where a remaining stage needs them."""
+        completed = set(completed)
+        remaining = [name for name, stage in self.stages.items()
+                     if stage.checkpoint and name not in completed]
+        return self.subset(remaining, provided=completed)
+
+    def run(self, ctx, results: Optional[Dict[str, Any]] = None,
+            on_stage_done: Optional[Callable[[str, PipelineRun], None]] = None) -> PipelineRun:
+        """Runs every stage not already present in results.
+
+        on_stage_done(name, run) is called from the scheduling thread after
+        each stage; an exception raised there (e.g. a job cancellation) stops
+        the run. After a failure no new stages start, but the ones already in
+        flight are waited for and still reported to on_stage_done, so their
+        results are checkpointed before the error is raised.
+        """
+        run = PipelineRun(results)
+        ctx.results = run.results
+        pending = {name for name in self.stages if name not in run.results}
+        running: Dict[Future, str] = {}
+        lock = threading.Lock()
+        failure: Optional[Exception] = None
+
+        def execute(stage: Stage):
+            started = time.perf_counter()
+            value = stage.func(ctx)
+            finished = time.perf_counter()
+            with lock:
+                run.results[stage.name] = value
+                run.timings[stage.name] = {
+                    'start': started - run.started_at,
+                    'seconds': finished - started
+                }
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers,
+                                    thread_name_prefix="novamind-stage") as executor:
+                while running or (pending and failure is None):
+                    if failure is None:
+                        with lock:
+                            ready = [name for name in pending
+                                     if all(dep in run.results for dep in self.stages[name].requires)]
+                        for name in sorted(ready):
+                            pending.discard(name)
+                            running[executor.submit(execute, self.stages[name])] = name
+
+                        if not running:
+                            missing = {dep for name in pending for dep in self.stages[name].requires
+                                       if dep not in run.results}
+                            raise ValueError(f"Missing results for stages: {', '.join(sorted(missing))}")
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        error = future.exception()
+                        if error is not None:
+                            failure = failure or StageFailed(name, error, run)
+                            continue
+                        if on_stage_done:
+                            try:
+                                on_stage_done(name, run)
+                            except Exception as e:
+                                failure = failure or e
+
+            if isinstance(failure, StageFailed):
+                raise failure from failure.error
+            if failure is not None:
+                raise failure
+        finally:
+            run.wall_seconds = time.perf_counter() - run.started_at
+        return run
+
+
+class CampaignContext:
+    """Shared components and inputs handed to every campaign stage."""
+
+    def __init__(self, db, generator, crm, analytics, optimizer, topic: str = "",
+                 additional_context: str = "", contact_store: Optional[ContactStore] = None,
+                 wait_for_insights: bool = False, run_id: Optional[str] = None):
+        self.db = db
+        self.generator = generator
+        self.crm = crm
+        self.analytics = analytics
+        self.optimizer = optimizer
+        self.topic = topic
+        self.additional_context = additional_context
+        # A long-lived store (as in the web app) is refreshed and reused;
+        # otherwise the contact file is streamed fresh for each run
+        self.contact_store = contact_store
+        self.wait_for_insights = wait_for_insights
+        # Set for checkpointed runs, so side effects are not repeated on resume
+        self.run_id = run_id
+        self.results: Dict[str, Any] = {}
+
+
+def generate_blog(ctx: CampaignContext) -> Dict:
+    print("▶️  Generating blog content...")
+    blog = ctx.generator.generate_blog_post(ctx.topic, ctx.additional_context)
+    blog_id = ctx.db.save_blog_post(
+        topic=ctx.topic,
+        title=blog['title'],
+        outline=blog['outline'],
+        content=blog['content'],
+        metadata={'status': 'published'}
+    )
+    return {'blog_id': blog_id, 'blog': dict(blog, topic=ctx.topic)}
+
+def generate_newsletters(ctx: CampaignContext) -> Dict:
+    print("▶️  Generating personalized newsletters...")
+    failures = {}
+    try:
+        newsletters = ctx.generator.generate_newsletter_variations(ctx.results['blog']['blog'])
+    except NewsletterGenerationError as e:
+        if not e.newsletters:
+            raise
+        print(f"\n⚠️  {e}. Continuing with the remaining personas.")
+        newsletters = e.newsletters
+        failures = {key: str(error) for key, error in e.failures.items()}
+    return {'newsletters': newsletters, 'failures': failures}
+
+def save_newsletters(ctx: CampaignContext) -> Dict:
+    newsletters = ctx.results['newsletters']['newsletters']
+    ids = ctx.db.save_newsletters_bulk(ctx.results['blog']['blog_id'], newsletters.values())
+    return {'newsletter_ids': dict(zip(newsletters.keys(), ids))}
+
+def generate_alternatives(ctx: CampaignContext) -> Dict[str, List[str]]:
+    print("▶️  Generating A/B subject line alternatives...")
+    return ctx.generator.generate_subject_line_alternatives(
+        ctx.results['newsletters']['newsletters'], count=2
+    )
+
+def sync_contacts(ctx: CampaignContext) -> Dict:
+    """Syncs contacts to the CRM a chunk at a time, streaming the contact
+    file unless the context carries a long-lived store."""
+    print("▶️  Syncing contacts to HubSpot...")
+    contact_map = {}
+
+    if ctx.contact_store is not None:
+        # Pick up edits to the contact file without rebuilding the whole index;
+        # the store only keeps segmenting fields, so full records are
+        # streamed from its source file
+        ctx.contact_store.reload_if_changed()
+        for chunk in iter_chunks(ctx.contact_store.iter_source(), CONTACT_CHUNK_SIZE):
+            contact_map.update(ctx.crm.bulk_create_contacts(chunk, incremental=True))
+        return {'contact_store': ctx.contact_store, 'contact_map': contact_map}
+
+    path = os.getenv('NOVAMIND_CONTACTS_PATH', DEFAULT_CONTACTS_PATH)
+    contact_store = ContactStore(personas=ctx.generator.personas)
+    for chunk in iter_chunks(iter_contacts(path), CONTACT_CHUNK_SIZE):
+        contact_store.upsert_many(chunk)
+        contact_map.update(ctx.crm.bulk_create_contacts(chunk, incremental=True))
+    return {'contact_store': contact_store, 'contact_map': contact_map}
+
+def send_newsletters(ctx: CampaignContext) -> Dict:
+    print("▶️  Distributing newsletters...")
+    blog = ctx.results['blog']
+    contacts = ctx.results['contacts']
+    contact_store = contacts['contact_store']
+
+    campaign_name = f"{blog['blog']['title']} - {blog['blog']['topic']}"
+    campaign_id = ctx.db.get_pipeline_run_campaign(ctx.run_id) if ctx.run_id else None
+    if campaign_id is None:
+        campaign_id = ctx.db.create_campaign(
+            blog['blog_id'], campaign_name,
+            hubspot_campaign_id="sim_campaign" if ctx.crm.simulation_mode else None,
+            run_id=ctx.run_id
+        )
+        already_sent = set()
+    else:
+        # The run failed after creating its campaign; only send to the
+        # segments it had not reached
+        already_sent = ctx.db.get_sent_personas(campaign_id)
+
+    for persona_key, newsletter in ctx.results['newsletters']['newsletters'].items():
+        if persona_key in already_sent:
+            print(f"   Already sent to {newsletter['persona']}, skipping")
+            continue
+        contact_ids = contact_store.segment_contact_ids(persona_key, contacts['contact_map'])
+        if contact_ids:
+            ctx.crm.send_email_to_segment(
+                persona=newsletter['persona'],
+                contact_ids=contact_ids,
+                email_content=newsletter
+            )
+        ctx.db.record_campaign_send(campaign_id, persona_key, len(contact_ids))
+    return {'campaign_id': campaign_id, 'campaign_name': campaign_name}
+
+def collect_metrics(ctx: CampaignContext) -> Dict[str, Dict]:
+    print("▶️  Collecting performance metrics...")
+    campaign_id = ctx.results['send']['campaign_id']
+    # A resumed run may have saved metrics before failing; rollups are
+    # additive, so reuse them rather than inserting a second set
+    recorded = ctx.db.get_campaign_performance(campaign_id)
+    if recorded:
+        return {row['persona']: {key: value for key, value in row.items()
+                                 if key not in ('persona', 'variant')}
+                for row in recorded}
+
+    metrics_by_persona = {
+        persona_key: ctx.crm.generate_simulated_stats(persona_key)
+        for persona_key in ctx.results['newsletters']['newsletters']
+    }
+    ctx.db.save_performance_metrics_bulk(
+        (campaign_id, persona_key, metrics)
+        for persona_key, metrics in metrics_by_persona.items()
+    )
+    return metrics_by_persona
+
+def analyze_performance(ctx: CampaignContext) -> Dict:
+    campaign_id = ctx.results['send']['campaign_id']
+    analysis = ctx.analytics.analyze_campaign_performance(
+        campaign_id, ctx.results['metrics'], wait_for_insights=ctx.wait_for_insights
+    )
+    ctx.analytics.save_analysis_report(campaign_id, analysis)
+    return analysis
+
+def suggest_optimizations(ctx: CampaignContext) -> Dict:
+    print("▶️  Generating optimization suggestions...")
+    worst_performer = ctx.results['analysis']['worst_performer']['persona']
+    improvements = ctx.optimizer.suggest_improvements(
+        ctx.results['newsletters']['newsletters'][worst_performer]['content'],
+        ctx.results['metrics'][worst_performer]
+    )
+    ctx.db.save_optimization_suggestions_bulk(
+        campaign_id=ctx.results['send']['campaign_id'],
+        suggestion_type="content_improvement",
+        suggestions=improvements['suggestions'],
+        confidence_score=improvements['confidence']
+    )
+    return dict(improvements, persona=worst_performer)
+
+def suggest_topics(ctx: CampaignContext) -> List[str]:
+    return ctx.analytics.suggest_next_topics(ctx.db.get_all_campaigns())
+
+
+CAMPAIGN_STAGES = [
+    Stage('blog', generate_blog),
+    Stage('newsletters', generate_newsletters, requires=['blog']),
+    Stage('save_newsletters', save_newsletters, requires=['blog', 'newsletters']),
+    Stage('alternatives', generate_alternatives, requires=['newsletters']),
+    # The synced contact store is rebuilt on resume; incremental sync makes it cheap
+    Stage('contacts', sync_contacts, checkpoint=False),
+    Stage('send', send_newsletters, requires=['blog', 'newsletters', 'contacts']),
+    Stage('metrics', collect_metrics, requires=['send']),
+    Stage('analysis', analyze_performance, requires=['metrics']),
+    Stage('optimize', suggest_optimizations, requires=['analysis']),
+    # Only needs the campaign list, which includes this campaign once sent
+    Stage('next_topics', suggest_topics, requires=['send']),
+]
+
+def campaign_pipeline(max_workers: Optional[int] = None) -> Pipeline:
+    """The full campaign graph; use Pipeline.subset() for partial runs."""
+    return Pipeline(CAMPAIGN_STAGES,
+                    max_workers=max_workers or int(os.getenv('NOVAMIND_PIPELINE_WORKERS', '4')))
+
+def checkpointer(db, run_id: str, pipeline: Pipeline) -> Callable[[str, PipelineRun], None]:
+    """on_stage_done callback that stores each checkpointed stage's output
+    under run_id, so a failed run can be resumed from where it stopped."""
+    def on_stage_done(name: str, run: PipelineRun):
+        if pipeline.stages[name].checkpoint:
+            db.save_pipeline_checkpoint(run_id, name, run.results[name])
+    return on_stage_done
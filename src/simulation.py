@@ -0,0 +1,151 @@
+import json
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Mirrors HubSpotManager.generate_simulated_stats. A persona in personas.json
+# can override these with a "simulation" entry, e.g.
+#   "simulation": {"open_rate": [0.22, 0.32], "click_rate": [0.15, 0.25]}
+DEFAULT_RATE_RANGES = {
+    'founders': {'open_rate': (0.22, 0.32), 'click_rate': (0.15, 0.25)},
+    'creatives': {'open_rate': (0.28, 0.38), 'click_rate': (0.18, 0.28)},
+}
+FALLBACK_RATE_RANGE = {'open_rate': (0.20, 0.28), 'click_rate': (0.12, 0.20)}
+
+METRIC_FIELDS = ('sent', 'delivered', 'opens', 'clicks', 'unsubscribes',
+                 'open_rate', 'click_rate', 'unsubscribe_rate')
+
+def load_rate_ranges(personas: Dict) -> Dict[str, Dict[str, Tuple[float, float]]]:
+    """Open/click rate ranges for each persona, from personas.json overrides
+    or the built-in defaults."""
+    ranges = {}
+    for key, info in personas.items():
+        persona_range = dict(DEFAULT_RATE_RANGES.get(key, FALLBACK_RATE_RANGE))
+        for metric, bounds in (info.get('simulation') or {}).items():
+            persona_range[metric] = tuple(bounds)
+        ranges[key] = persona_range
+    return ranges
+
+
+class MetricsSimulator:
+    """Generates campaign performance metrics for many campaigns at once.
+
+    simulate() draws every campaign x persona x variant cell in a handful of
+    vectorised NumPy operations, using the same distributions as the
+    per-persona simulated stats in the CRM manager.
+    """
+
+    def __init__(self, rate_ranges: Dict[str, Dict[str, Tuple[float, float]]],
+                 seed: Optional[int] = None, sent_range: Tuple[int, int] = (15, 20),
+                 delivery_range: Tuple[float, float] = (0.97, 0.99), max_unsubscribes: int = 1):
+        self.personas = list(rate_ranges)
+        self.rng = np.random.default_rng(seed)
+        self.sent_range = sent_range
+        self.delivery_range = delivery_range
+        self.max_unsubscribes = max_unsubscribes
+
+        # (1, personas, 1) so the bounds broadcast across campaigns and variants
+        def bounds(metric: str, side: int) -> np.ndarray:
+            values = [rate_ranges[p].get(metric, FALLBACK_RATE_RANGE[metric])[side]
+                      for p in self.personas]
+            return np.array(values, dtype=float).reshape(1, -1, 1)
+
+        self.open_low, self.open_high = bounds('open_rate', 0), bounds('open_rate', 1)
+        self.click_low, self.click_high = bounds('click_rate', 0), bounds('click_rate', 1)
+
+    @classmethod
+    def from_personas_file(cls, path: str = "data/personas.json", **kwargs) -> "MetricsSimulator":
+        with open(path, 'r') as f:
+            return cls(load_rate_ranges(json.load(f)), **kwargs)
+
+    def simulate(self, campaigns: int, variants: int = 1) -> Dict[str, np.ndarray]:
+        """Returns one array per metric, each shaped (campaigns, personas, variants).
+
+        Counts are integers and rates are percentages rounded to two places,
+        matching what save_performance_metrics expects.
+        """
+        shape = (campaigns, len(self.personas), variants)
+        rng = self.rng
+
+        sent = rng.integers(self.sent_range[0], self.sent_range[1] + 1, size=shape)
+        delivered = (sent * rng.uniform(*self.delivery_range, size=shape)).astype(np.int64)
+        open_rate = rng.uniform(self.open_low, self.open_high, size=shape)
+        opens = (delivered * open_rate).astype(np.int64)
+        click_rate = rng.uniform(self.click_low, self.click_high, size=shape)
+        clicks = (opens * click_rate).astype(np.int64)
+        unsubscribes = rng.integers(0, self.max_unsubscribes + 1, size=shape)
+
+        unsubscribe_rate = np.divide(unsubscribes * 100.0, delivered,
+                                     out=np.zeros(shape), where=delivered > 0)
+
+        return {
+            'sent': sent,
+            'delivered': delivered,
+            'opens': opens,
+            'clicks': clicks,
+            'unsubscribes': unsubscribes,
+            'open_rate': np.round(open_rate * 100, 2),
+            'click_rate': np.round(click_rate * 100, 2),
+            'unsubscribe_rate': np.round(unsubscribe_rate, 2)
+        }
+
+    def iter_rows(self, metrics: Dict[str, np.ndarray],
+                  campaign_ids: Sequence[int]) -> Iterator[Tuple[int, str, Dict]]:
+        """Flattens simulate() output into (campaign_id, persona, metrics) rows
+        for Database.save_performance_metrics_bulk."""
+        campaigns, personas, variants = metrics['sent'].shape
+        if len(campaign_ids) != campaigns:
+            raise ValueError(f"Expected {campaigns} campaign ids, got {len(campaign_ids)}")
+
+        columns = [metrics[field].reshape(-1).tolist() for field in METRIC_FIELDS]
+        for flat_index, values in enumerate(zip(*columns)):
+            campaign, rest = divmod(flat_index, personas * variants)
+            persona, variant = divmod(rest, variants)
+            row = dict(zip(METRIC_FIELDS, values))
+            row['variant'] = variant
+            yield campaign_ids[campaign], self.personas[persona], row
+
+    def write_to_database(self, db, metrics: Dict[str, np.ndarray],
+                          campaign_ids: Sequence[int]) -> List[int]:
+        """Bulk inserts simulated metrics into performance_metrics."""
+        return db.save_performance_metrics_bulk(self.iter_rows(metrics, campaign_ids))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from src.database import Database
+
+    parser = argparse.ArgumentParser(description="Simulate campaign performance metrics in bulk")
+    parser.add_argument("--campaigns", type=int, default=1000)
+    parser.add_argument("--variants", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--personas", default="data/personas.json")
+    parser.add_argument("--write", action="store_true",
+                        help="create placeholder campaigns and store the metrics")
+    parser.add_argument("--db", default="data/novamind.db")
+    args = parser.parse_args()
+
+    simulator = MetricsSimulator.from_personas_file(args.personas, seed=args.seed)
+
+    started = time.perf_counter()
+    metrics = simulator.simulate(args.campaigns, args.variants)
+    elapsed = time.perf_counter() - started
+    print(f"Simulated {metrics['sent'].size} cells "
+          f"({args.campaigns} campaigns x {len(simulator.personas)} personas x "
+          f"{args.variants} variants) in {elapsed:.3f}s")
+
+    for i, persona in enumerate(simulator.personas):
+        print(f"   {persona}: open rate {metrics['open_rate'][:, i].mean():.2f}%, "
+              f"click rate {metrics['click_rate'][:, i].mean():.2f}%")
+
+    if args.write:
+        db = Database(args.db)
+        started = time.perf_counter()
+        with db.transaction():
+            campaign_ids = [db.create_campaign(None, f"Simulated campaign {i + 1}")
+                            for i in range(args.campaigns)]
+            simulator.write_to_database(db, metrics, campaign_ids)
+        print(f"Wrote {metrics['sent'].size} metric rows in {time.perf_counter() - started:.3f}s")
+        db.close()
@@ -0,0 +1,108 @@
+import math
+from statistics import NormalDist
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+def wilson_interval(successes, trials, confidence: float = 0.95) -> Tuple[np.ndarray, np.ndarray]:
+    """Wilson score interval for each proportion successes / trials.
+
+    Unlike the normal approximation it stays inside [0, 1] and behaves
+    sensibly for the small segments a campaign often has. Segments with no
+    trials get the uninformative interval (0, 1).
+    """
+    successes = np.asarray(successes, dtype=float)
+    trials = np.asarray(trials, dtype=float)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    safe_trials = np.where(trials > 0, trials, 1.0)
+    p = successes / safe_trials
+    denominator = 1 + z ** 2 / safe_trials
+    centre = (p + z ** 2 / (2 * safe_trials)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / safe_trials + z ** 2 / (4 * safe_trials ** 2)) / denominator
+
+    low = np.where(trials > 0, np.clip(centre - margin, 0.0, 1.0), 0.0)
+    high = np.where(trials > 0, np.clip(centre + margin, 0.0, 1.0), 1.0)
+    return low, high
+
+def two_proportion_pvalues(successes, trials) -> Tuple[np.ndarray, np.ndarray]:
+    """Pooled two-proportion z-test between every pair of segments.
+
+    Returns (difference, p_value) matrices where [i, j] compares segment i
+    against segment j; the difference is rate_i - rate_j.
+    """
+    successes = np.asarray(successes, dtype=float)
+    trials = np.asarray(trials, dtype=float)
+    rates = np.divide(successes, trials, out=np.zeros_like(successes), where=trials > 0)
+
+    difference = rates[:, None] - rates[None, :]
+    pooled_trials = trials[:, None] + trials[None, :]
+    pooled = np.divide(successes[:, None] + successes[None, :], pooled_trials,
+                       out=np.zeros_like(difference), where=pooled_trials > 0)
+    inverse_trials = np.divide(1.0, trials, out=np.zeros_like(trials), where=trials > 0)
+    variance = pooled * (1 - pooled) * (inverse_trials[:, None] + inverse_trials[None, :])
+
+    z = np.divide(difference, np.sqrt(variance), out=np.zeros_like(difference),
+                  where=variance > 0)
+    p_values = _erfc(np.abs(z) / math.sqrt(2))
+    # Comparisons involving an empty segment carry no evidence either way
+    p_values[(trials[:, None] == 0) | (trials[None, :] == 0)] = 1.0
+    return difference, p_values
+
+def holm_adjust(p_values: np.ndarray) -> np.ndarray:
+    """Holm-Bonferroni adjusted p-values for a family of comparisons."""
+    p_values = np.asarray(p_values, dtype=float)
+    count = len(p_values)
+    if count == 0:
+        return p_values
+    order = np.argsort(p_values)
+    stepped = np.maximum.accumulate((count - np.arange(count)) * p_values[order])
+    adjusted = np.empty(count)
+    adjusted[order] = np.minimum(stepped, 1.0)
+    return adjusted
+
+def compare_segments(labels: Sequence[str], successes, trials, confidence: float = 0.95,
+                     alpha: float = 0.05) -> Dict[str, List[Dict]]:
+    """Rates with confidence intervals for each segment, plus every pairwise
+    difference with Holm-adjusted p-values. Rates are percentages."""
+    successes = np.asarray(successes, dtype=float)
+    trials = np.asarray(trials, dtype=float)
+    rates = np.divide(successes, trials, out=np.zeros_like(successes), where=trials > 0)
+    low, high = wilson_interval(successes, trials, confidence)
+
+    segments = [
+        {
+            'segment': label,
+            'successes': int(successes[i]),
+            'trials': int(trials[i]),
+            'rate': round(float(rates[i]) * 100, 2),
+            'ci_low': round(float(low[i]) * 100, 2),
+            'ci_high': round(float(high[i]) * 100, 2)
+        }
+        for i, label in enumerate(labels)
+    ]
+
+    difference, p_values = two_proportion_pvalues(successes, trials)
+    first, second = np.triu_indices(len(labels), k=1)
+    adjusted = holm_adjust(p_values[first, second])
+
+    comparisons = [
+        {
+            'a': labels[i],
+            'b': labels[j],
+            'difference': round(float(difference[i, j]) * 100, 2),
+            'p_value': round(float(p), 4),
+            'significant': bool(p < alpha)
+        }
+        for i, j, p in zip(first, second, adjusted)
+    ]
+    return {'segments': segments, 'comparisons': comparisons}
+
+def find_comparison(result: Dict[str, List[Dict]], a: str, b: str) -> Dict:
+    """The comparison between segments a and b from compare_segments()."""
+    for comparison in result['comparisons']:
+        if {comparison['a'], comparison['b']} == {a, b}:
+            return comparison
+    return {'a': a, 'b': b, 'difference': 0.0, 'p_value': 1.0, 'significant': False}
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.contact_store import ContactStore
+
+PERSONAS = {
+    'founders': {'name': 'Founders / Decision-Makers'},
+    'creatives': {'name': 'Creative Professionals'},
+}
+
+def contact(email: str, persona: str, company: str = "Acme") -> dict:
+    return {'email': email, 'persona': persona, 'company': company}
+
+
+class ContactStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "contacts.jsonl")
+
+    def write(self, contacts, mtime: float):
+        with open(self.path, 'w') as f:
+            for c in contacts:
+                f.write(json.dumps(c) + "\n")
+        os.utime(self.path, (mtime, mtime))
+
+    def emails(self, store: ContactStore, persona: str) -> set:
+        return {store.get(row_id)['email'] for row_id in store.segment(persona)}
+
+    def test_upsert_moves_contacts_between_segments(self):
+        store = ContactStore(PERSONAS)
+        store.upsert_many([contact(f"user{i}@example.com", "founders") for i in range(5)])
+        store.upsert(contact("user1@example.com", "Creative Professionals", company="Globex"))
+        store.upsert(contact("user3@example.com", "founders"))
+
+        self.assertEqual(store.segment_sizes(), {'founders': 4, 'creatives': 1})
+        self.assertEqual(self.emails(store, "creatives"), {"user1@example.com"})
+        self.assertEqual([c['email'] for c in store.find('company', 'GLOBEX')], ["user1@example.com"])
+        self.assertEqual(len(store.find('company', 'acme')), 4)
+
+    def test_remove_drops_contact_from_every_index(self):
+        store = ContactStore(PERSONAS)
+        store.upsert_many([contact(f"user{i}@example.com", "founders") for i in range(3)])
+
+        self.assertTrue(store.remove("USER0@example.com"))
+        self.assertFalse(store.remove("user0@example.com"))
+        self.assertEqual(len(store), 2)
+        self.assertEqual(self.emails(store, "founders"), {"user1@example.com", "user2@example.com"})
+        self.assertEqual(len(store.find('company', 'acme')), 2)
+
+    def test_segment_is_a_snapshot(self):
+        store = ContactStore(PERSONAS)
+        store.upsert_many([contact(f"user{i}@example.com", "founders") for i in range(3)])
+        rows = store.segment("founders")
+
+        store.remove("user0@example.com")
+        store.upsert(contact("user3@example.com", "founders"))
+        self.assertEqual(sorted(rows), [0, 1, 2])
+        self.assertEqual(sorted(store.segment("founders")), [1, 2, 3])
+        self.assertEqual(self.emails(store, "founders"),
+                         {"user1@example.com", "user2@example.com", "user3@example.com"})
+
+    def test_reload_applies_changes_and_removals(self):
+        self.write([contact(f"user{i}@example.com", "founders") for i in range(4)], mtime=1000)
+        store = ContactStore.from_file(self.path, PERSONAS)
+        self.assertFalse(store.reload_if_changed())
+
+        self.write([contact("user0@example.com", "creatives"),
+                    contact("user2@example.com", "founders"),
+                    contact("new@example.com", "creatives")], mtime=2000)
+        self.assertTrue(store.reload_if_changed())
+
+        self.assertEqual(len(store), 3)
+        self.assertEqual(self.emails(store, "founders"), {"user2@example.com"})
+        self.assertEqual(self.emails(store, "creatives"), {"user0@example.com", "new@example.com"})
+
+
+if __name__ == "__main__":
+    unittest.main()
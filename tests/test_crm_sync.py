@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src.crm_manager import HubSpotManager
+from src.database import Database
+from src.fake_hubspot_server import FakeHubSpotServer
+
+UPSERT = "POST /crm/v3/objects/contacts/batch/upsert"
+
+def contact(email: str, persona: str = "founders", **properties) -> dict:
+    return dict({'email': email, 'firstname': 'Test', 'persona': persona}, **properties)
+
+
+class ContactSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, "test.db"))
+        self.server = FakeHubSpotServer(reject_emails=["bad@example.com"]).start()
+        env = mock.patch.dict(os.environ, {'HUBSPOT_API_KEY': 'test'})
+        env.start()
+        self.addCleanup(env.stop)
+        self.crm = HubSpotManager(db=self.db, base_url=self.server.base_url,
+                                  requests_per_second=1000)
+        self.assertFalse(self.crm.simulation_mode)
+
+    def tearDown(self):
+        self.server.stop()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_upserts_in_batches_of_100(self):
+        contacts = [contact(f"user{i}@example.com") for i in range(250)]
+        report = self.crm.sync_contacts(contacts)
+
+        self.assertEqual(len(report['contact_map']), 250)
+        self.assertEqual(report['created'], 250)
+        self.assertEqual(self.server.requests[UPSERT], 3)
+
+        report = self.crm.sync_contacts(contacts[:10])
+        self.assertEqual((report['created'], report['updated']), (0, 10))
+
+    def test_reports_rejected_contacts_by_email(self):
+        report = self.crm.sync_contacts([contact("good@example.com"), contact("bad@example.com")])
+
+        self.assertIn("good@example.com", report['contact_map'])
+        self.assertNotIn("bad@example.com", report['contact_map'])
+        self.assertIn("not valid", report['errors']["bad@example.com"])
+        self.assertEqual(report['failed'], 1)
+
+    def test_reports_case_insensitive_duplicates(self):
+        report = self.crm.sync_contacts([
+            contact("Dup@Example.com", persona="founders"),
+            contact("dup@example.com", persona="creatives"),
+        ])
+
+        self.assertEqual(list(report['contact_map']), ["dup@example.com"])
+        self.assertIn("Duplicate of dup@example.com", report['errors']["Dup@Example.com"])
+        contact_id = report['contact_map']["dup@example.com"]
+        self.assertEqual(self.server.contacts[contact_id]['hs_persona'], "creatives")
+
+    def test_incremental_sync_skips_unchanged_contacts(self):
+        contacts = [contact(f"user{i}@example.com") for i in range(5)]
+        self.crm.sync_contacts(contacts, incremental=True)
+
+        contacts[0] = contact("user0@example.com", jobtitle="CTO")
+        report = self.crm.sync_contacts(contacts, incremental=True)
+        self.assertEqual((report['skipped'], report['updated']), (4, 1))
+        self.assertEqual(self.server.requests[UPSERT], 2)
+
+    def test_incremental_sync_recreates_contacts_deleted_in_hubspot(self):
+        contacts = [contact(f"user{i}@example.com") for i in range(3)]
+        first = self.crm.sync_contacts(contacts, incremental=True)
+        deleted_id = first['contact_map']["user1@example.com"]
+        self.server.delete_contact(deleted_id)
+
+        # Recently confirmed ids are trusted without another read
+        report = self.crm.sync_contacts(contacts, incremental=True)
+        self.assertEqual(report['skipped'], 3)
+
+        self.crm.verify_after_seconds = 0
+        report = self.crm.sync_contacts(contacts, incremental=True)
+        self.assertEqual((report['skipped'], report['created']), (2, 1))
+        self.assertNotEqual(report['contact_map']["user1@example.com"], deleted_id)
+        self.assertIn(report['contact_map']["user1@example.com"], self.server.contacts)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+import base64
+import os
+import queue
+import tempfile
+import threading
+import unittest
+
+from src.database import ConnectionPool, Database
+
+
+class DatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, "test.db"))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def add_campaign(self, topic: str = "AI tools", send_date: str = None) -> int:
+        blog_id = self.db.save_blog_post(topic=topic, title=f"{topic} post", outline="o", content="c")
+        campaign_id = self.db.create_campaign(blog_id, f"{topic} campaign")
+        if send_date is not None:
+            with self.db.transaction() as cursor:
+                cursor.execute("UPDATE campaigns SET send_date = ? WHERE id = ?",
+                               (send_date, campaign_id))
+        return campaign_id
+
+
+class CampaignPageTest(DatabaseTestCase):
+    def all_pages(self, limit: int, **filters) -> list:
+        ids, cursor = [], None
+        while True:
+            page = self.db.get_campaigns_page(limit=limit, cursor=cursor, **filters)
+            ids.extend(campaign['id'] for campaign in page['campaigns'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_pages_across_ties_on_send_date(self):
+        # Five campaigns share one send_date, so only the id breaks the tie
+        ids = [self.add_campaign(send_date="2024-05-01 09:00:00") for _ in range(5)]
+        ids.append(self.add_campaign(send_date="2024-04-01 09:00:00"))
+        ids.insert(0, self.add_campaign(send_date="2024-06-01 09:00:00"))
+
+        expected = [ids[0]] + sorted(ids[1:6], reverse=True) + [ids[6]]
+        for limit in (1, 2, 3, 7, 20):
+            self.assertEqual(self.all_pages(limit), expected, f"limit={limit}")
+
+    def test_last_page_has_no_cursor(self):
+        for _ in range(4):
+            self.add_campaign()
+        self.assertIsNotNone(self.db.get_campaigns_page(limit=3)['next_cursor'])
+        self.assertIsNone(self.db.get_campaigns_page(limit=4)['next_cursor'])
+
+    def test_rejects_tampered_cursors(self):
+        def encode(raw: bytes) -> str:
+            return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+        cursors = [
+            "not a cursor!",
+            encode(b"not json"),
+            encode(b'{"send_date": "2024-01-01"}'),
+            encode(b'["2024-01-01", 5, 6]'),
+            encode(b'["2024-01-01", "five"]'),
+            encode(b'["2024-01-01", null]'),
+            encode(b'\xff\xfe'),
+        ]
+        for cursor in cursors:
+            with self.assertRaisesRegex(ValueError, "Invalid campaign cursor"):
+                self.db.get_campaigns_page(cursor=cursor)
+
+    def test_cursor_round_trips(self):
+        cursor = self.db.encode_campaign_cursor("2024-05-01 09:00:00", 42)
+        self.assertEqual(self.db.decode_campaign_cursor(cursor), ("2024-05-01 09:00:00", 42))
+
+    def test_topic_filter_treats_wildcards_literally(self):
+        percent = self.add_campaign(topic="100% growth")
+        underscore = self.add_campaign(topic="snake_case naming")
+        backslash = self.add_campaign(topic="C:\\temp paths")
+        self.add_campaign(topic="1000 growth hacks")
+        self.add_campaign(topic="snakeXcase naming")
+
+        self.assertEqual(self.all_pages(10, topic="0% g"), [percent])
+        self.assertEqual(self.all_pages(10, topic="%"), [percent])
+        self.assertEqual(self.all_pages(10, topic="e_c"), [underscore])
+        self.assertEqual(self.all_pages(10, topic=":\\t"), [backslash])
+        self.assertEqual(len(self.all_pages(10, topic="GROWTH")), 2)
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.pool = ConnectionPool(os.path.join(self.tmp.name, "pool.db"), size=2, timeout=0.1)
+        self.addCleanup(self.pool.close_all)
+
+    def test_reuses_connections_and_blocks_when_exhausted(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.assertIsNot(first, second)
+        with self.assertRaises(queue.Empty):
+            self.pool.acquire()
+
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+        self.pool.release(first)
+        self.pool.release(second)
+
+    def test_release_rolls_back_open_transaction(self):
+        conn = self.pool.acquire()
+        conn.execute("CREATE TABLE items (name TEXT)")
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO items VALUES ('lost')")
+        self.pool.release(conn)
+
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0], 0)
+
+
+class TransactionTest(DatabaseTestCase):
+    def topics(self) -> list:
+        with self.db.connection() as conn:
+            return [row[0] for row in conn.execute("SELECT topic FROM blog_posts ORDER BY id")]
+
+    def test_inner_savepoint_rolls_back_while_outer_commits(self):
+        with self.db.transaction():
+            self.db.save_blog_post(topic="outer", title="t", outline="o", content="c")
+            with self.assertRaises(RuntimeError):
+                with self.db.transaction():
+                    self.db.save_blog_post(topic="inner", title="t", outline="o", content="c")
+                    raise RuntimeError("abandon inner block")
+            self.db.save_blog_post(topic="after", title="t", outline="o", content="c")
+            # Reads inside the transaction reuse its connection and see its writes
+            self.assertEqual(self.topics(), ["outer", "after"])
+
+        self.assertEqual(self.topics(), ["outer", "after"])
+
+    def test_outer_rollback_discards_committed_savepoints(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                with self.db.transaction():
+                    self.db.save_blog_post(topic="inner", title="t", outline="o", content="c")
+                raise RuntimeError("abandon everything")
+
+        self.assertEqual(self.topics(), [])
+
+    def test_uncommitted_writes_are_invisible_to_other_threads(self):
+        seen = []
+        with self.db.transaction():
+            self.db.save_blog_post(topic="pending", title="t", outline="o", content="c")
+            reader = threading.Thread(target=lambda: seen.append(self.topics()))
+            reader.start()
+            reader.join()
+
+        self.assertEqual(seen, [[]])
+        self.assertEqual(self.topics(), ["pending"])
+
+
+class BulkSaveTest(DatabaseTestCase):
+    def test_metric_ids_match_inserted_rows(self):
+        campaign_id = self.add_campaign()
+        # Rows already in the table, and a deleted tail, must not shift the batch ids
+        self.db.save_performance_metrics(campaign_id, "founders", {'sent': 1})
+        doomed = self.db.save_performance_metrics_bulk([(campaign_id, "doomed", {'sent': 2})])
+        with self.db.transaction() as cursor:
+            cursor.execute("DELETE FROM performance_metrics WHERE id = ?", (doomed[0],))
+
+        rows = [(campaign_id, f"persona{i}", {'sent': 100 + i, 'variant': i % 2}) for i in range(5)]
+        ids = self.db.save_performance_metrics_bulk(rows)
+
+        self.assertEqual(len(set(ids)), len(rows))
+        with self.db.connection() as conn:
+            for row_id, (_, persona, metrics) in zip(ids, rows):
+                saved = conn.execute(
+                    "SELECT persona, sent_count, variant FROM performance_metrics WHERE id = ?",
+                    (row_id,)).fetchone()
+                self.assertEqual(saved, (persona, metrics['sent'], metrics['variant']))
+
+    def test_newsletter_ids_match_inserted_rows(self):
+        blog_id = self.db.save_blog_post(topic="AI tools", title="t", outline="o", content="c")
+        self.db.save_newsletter(blog_id, "Founders", "Earlier", "p", "c")
+        newsletters = [{'persona': p, 'subject_line': f"For {p}", 'content': "c"}
+                       for p in ("Founders", "Creatives", "Ops")]
+        ids = self.db.save_newsletters_bulk(blog_id, newsletters)
+
+        saved = {n['id']: n['subject_line'] for n in self.db.get_newsletters_for_blog(blog_id)}
+        self.assertEqual([saved[i] for i in ids], ["For Founders", "For Creatives", "For Ops"])
+
+    def test_empty_batches_return_no_ids(self):
+        self.assertEqual(self.db.save_performance_metrics_bulk([]), [])
+        self.assertEqual(self.db.save_newsletters_bulk(1, []), [])
+
+
+class RollupTest(DatabaseTestCase):
+    def rollups(self) -> dict:
+        return {
+            'day': sorted(self.db.get_metric_rollups('day')[1]),
+            'week': sorted(self.db.get_metric_rollups('week')[1]),
+            'campaign': sorted(self.db.get_campaign_rollups()[1]),
+        }
+
+    def test_incremental_rollups_match_full_rebuild(self):
+        monday = self.add_campaign(topic="AI tools", send_date="2024-05-06 09:00:00")
+        tuesday = self.add_campaign(topic="AI tools", send_date="2024-05-07 09:00:00")
+        next_week = self.add_campaign(topic="Design", send_date="2024-05-14 09:00:00")
+
+        self.db.save_performance_metrics(monday, "founders", {'sent': 100, 'opens': 40})
+        self.db.save_performance_metrics_bulk([
+            (monday, "creatives", {'sent': 80, 'opens': 20, 'clicks': 5}),
+            (tuesday, "founders", {'sent': 50, 'opens': 25, 'variant': 1}),
+            (tuesday, "founders", {'sent': 50, 'opens': 15, 'variant': 2}),
+        ])
+        # Later batches for campaign/persona pairs that already have rollups
+        self.db.save_performance_metrics(monday, "founders", {'sent': 10, 'unsubscribes': 2})
+        self.db.save_performance_metrics_bulk([
+            (tuesday, "founders", {'sent': 5, 'clicks': 3}),
+            (tuesday, "creatives", {'sent': 30, 'delivered': 29}),
+            (next_week, "founders", {'sent': 70, 'opens': 35}),
+        ])
+        self.db.save_performance_metrics(next_week, "founders", {'sent': 7, 'opens': 1})
+
+        incremental = self.rollups()
+        self.db.rebuild_rollups()
+        self.assertEqual(incremental, self.rollups())
+
+        columns, week = self.db.get_metric_rollups('week', persona="founders")
+        first_week = dict(zip(columns, next(row for row in week if row[0] == "2024-05-06")))
+        # Four batches across two campaigns; each campaign is counted once
+        self.assertEqual((first_week['sends'], first_week['campaigns']), (5, 2))
+        self.assertEqual(first_week['sent'], 215)
+
+
+if __name__ == "__main__":
+    unittest.main()
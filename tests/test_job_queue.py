@@ -0,0 +1,61 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from src.database import Database
+from src.job_queue import JobQueue
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db = Database(os.path.join(tmp.name, "test.db"))
+        # Registered first, so it runs after the queues have shut down
+        self.addCleanup(self.db.close)
+        self.started = threading.Event()
+
+    def queue(self) -> JobQueue:
+        queue = JobQueue(self.db, workers=1, heartbeat_interval=0.05)
+        self.addCleanup(queue.shutdown)
+        queue.register('loop', self.loop)
+        return queue
+
+    def loop(self, job, steps: int = 200):
+        self.started.set()
+        for step in range(steps):
+            job.progress(step / steps, f"step {step}")
+            time.sleep(0.01)
+        return {'steps': steps}
+
+    def wait_for_status(self, job_id: str, timeout: float = 5.0) -> str:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.db.get_job(job_id)['status']
+            if status not in ('queued', 'running'):
+                return status
+            time.sleep(0.02)
+        self.fail(f"job {job_id} still unfinished")
+
+    def test_cancel_from_another_queue_stops_the_job(self):
+        owner, other = self.queue(), self.queue()
+        job_id = owner.submit('loop')
+        self.assertTrue(self.started.wait(5))
+
+        self.assertTrue(other.cancel(job_id))
+        self.assertEqual(self.wait_for_status(job_id), 'cancelled')
+        self.assertTrue(self.db.get_job(job_id)['cancel_requested'])
+
+    def test_cancel_of_finished_job_is_refused(self):
+        owner, other = self.queue(), self.queue()
+        job_id = owner.submit('loop', {'steps': 1})
+        self.assertEqual(self.wait_for_status(job_id), 'succeeded')
+
+        self.assertFalse(owner.cancel(job_id))
+        self.assertFalse(other.cancel(job_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import json_stream
+from src.json_stream import iter_chunks, iter_json_array
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "data.json")
+
+    def write(self, text: str):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_reads_bare_and_keyed_arrays(self):
+        items = [{'email': f"user{i}@example.com", 'tags': ["a", "b"]} for i in range(3)]
+        self.write(json.dumps(items))
+        self.assertEqual(list(iter_json_array(self.path)), items)
+
+        self.write(json.dumps({'exported': "2024-01-01", 'contacts': items}, indent=2))
+        self.assertEqual(list(iter_json_array(self.path, key='contacts')), items)
+
+    def test_items_split_across_small_blocks(self):
+        items = [{'email': f"user{i}@example.com", 'note': "x" * (i * 7)} for i in range(50)]
+        items += [12345678, 3.25, True, None, "text, with [brackets]"]
+        self.write(json.dumps(items, indent=1))
+
+        for block_size in (1, 5, 64):
+            with mock.patch.object(json_stream, 'READ_BLOCK_SIZE', block_size):
+                self.assertEqual(list(iter_json_array(self.path)), items)
+
+    def test_empty_array(self):
+        self.write('{"contacts": [ ]}')
+        self.assertEqual(list(iter_json_array(self.path, key='contacts')), [])
+
+    def test_rejects_missing_or_unterminated_array(self):
+        self.write('{"contacts": {}}')
+        with self.assertRaisesRegex(ValueError, "No JSON array"):
+            list(iter_json_array(self.path, key='people'))
+
+        self.write('[{"email": "a@example.com"}, ')
+        with self.assertRaisesRegex(ValueError, "Unterminated"):
+            list(iter_json_array(self.path))
+
+
+class IterChunksTest(unittest.TestCase):
+    def test_groups_items(self):
+        self.assertEqual(list(iter_chunks(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(iter_chunks([], 3)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
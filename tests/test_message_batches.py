@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src.fake_batch_server import FakeBatchServer
+from src.llm_cache import LLMCache
+from src.llm_gateway import LLMGateway
+from src.message_batches import BatchRequestError, MessageBatchClient
+
+def request(custom_id: str, prompt: str) -> dict:
+    return {'custom_id': custom_id, 'params': {
+        'model': 'test-model', 'max_tokens': 50,
+        'messages': [{'role': 'user', 'content': prompt}]
+    }}
+
+def echo(params: dict) -> str:
+    return f"echo: {params['messages'][-1]['content']}"
+
+
+class MessageBatchClientTest(unittest.TestCase):
+    def start_server(self, **kwargs) -> FakeBatchServer:
+        server = FakeBatchServer(responder=echo, **kwargs).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def client(self, server: FakeBatchServer, **kwargs) -> MessageBatchClient:
+        client = MessageBatchClient("test-key", base_url=server.base_url, poll_interval=0.05,
+                                    max_retries=0, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_results_are_keyed_by_custom_id(self):
+        server = self.start_server(processing_seconds=0.1)
+        results = self.client(server).run([request(f"req-{i}", f"prompt {i}") for i in range(5)])
+
+        self.assertEqual(sorted(results), [f"req-{i}" for i in range(5)])
+        for i in range(5):
+            self.assertEqual(results[f"req-{i}"]['content'][0]['text'], f"echo: prompt {i}")
+
+    def test_errored_requests_fail_individually(self):
+        server = self.start_server(fail_custom_ids=["bad"])
+        results = self.client(server).run([request("good", "a"), request("bad", "b")])
+
+        self.assertEqual(results["good"]['content'][0]['text'], "echo: a")
+        self.assertIsInstance(results["bad"], BatchRequestError)
+        self.assertEqual(results["bad"].result_type, "errored")
+        self.assertIn("Simulated failure", str(results["bad"]))
+
+    def test_cancels_batch_after_timeout(self):
+        server = self.start_server(processing_seconds=60)
+        with self.assertRaises(TimeoutError):
+            self.client(server, timeout=0.2).run([request("slow", "a")])
+
+        (batch,) = server.batches.values()
+        self.assertIsNotNone(batch['canceled_at'])
+
+
+class CompleteBatchTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache = LLMCache(os.path.join(tmp.name, "cache.db"))
+        self.gateway = LLMGateway(api_key="test-key", cache=cache)
+
+    def test_message_without_text_fails_only_that_request(self):
+        outcomes = {
+            "ok": {'content': [{'type': 'text', 'text': "hello"}]},
+            "empty": {'content': []},
+        }
+        prompts = {custom_id: {'prompt': custom_id, 'max_tokens': 10, 'temperature': 0.0}
+                   for custom_id in outcomes}
+        with mock.patch.object(self.gateway.batches, 'run', return_value=outcomes):
+            results = self.gateway.complete_batch(prompts)
+
+        self.assertEqual(results["ok"], "hello")
+        self.assertIsInstance(results["empty"], BatchRequestError)
+        self.assertEqual(self.gateway.failures, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from src.database import Database
+from src.pipeline import (CAMPAIGN_STAGES, Pipeline, Stage, StageFailed, campaign_pipeline,
+                          checkpointer, send_newsletters)
+
+class Context:
+    """Bare stand-in for CampaignContext; Pipeline.run only sets results."""
+
+
+class Recorder:
+    """Builds stage functions that log their calls and return their name."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def stage(self, name: str, seconds: float = 0.0, error: Exception = None):
+        def func(ctx):
+            with self._lock:
+                self.calls.append(name)
+            time.sleep(seconds)
+            if error is not None:
+                raise error
+            return f"{name} done"
+        return func
+
+
+class PipelineTest(unittest.TestCase):
+    def test_stages_wait_for_dependencies_and_overlap(self):
+        recorder = Recorder()
+        pipeline = Pipeline([
+            Stage('a', recorder.stage('a', 0.2)),
+            Stage('b', recorder.stage('b', 0.2)),
+            Stage('c', recorder.stage('c'), requires=['a', 'b']),
+        ])
+        run = pipeline.run(Context())
+
+        self.assertEqual(run.results, {'a': "a done", 'b': "b done", 'c': "c done"})
+        self.assertEqual(recorder.calls[-1], 'c')
+        timings = run.timings
+        self.assertGreaterEqual(timings['c']['start'],
+                                max(timings[n]['start'] + timings[n]['seconds'] for n in 'ab'))
+        # a and b ran side by side rather than one after the other
+        self.assertLess(timings['b']['start'], timings['a']['start'] + timings['a']['seconds'])
+        self.assertLess(timings['a']['start'], timings['b']['start'] + timings['b']['seconds'])
+
+    def test_rejects_cycles_and_unknown_dependencies(self):
+        noop = Recorder().stage('x')
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            Pipeline([Stage('a', noop, requires=['b']), Stage('b', noop, requires=['a'])])
+        with self.assertRaisesRegex(ValueError, "unknown stage"):
+            Pipeline([Stage('a', noop, requires=['missing'])])
+
+    def test_failure_stops_dependents_and_reports_in_flight_stages(self):
+        recorder = Recorder()
+        pipeline = Pipeline([
+            Stage('slow', recorder.stage('slow', 0.3)),
+            Stage('boom', recorder.stage('boom', 0.05, error=RuntimeError("boom"))),
+            Stage('after', recorder.stage('after'), requires=['boom']),
+        ])
+        done = []
+        with self.assertRaises(StageFailed) as failure:
+            pipeline.run(Context(), on_stage_done=lambda name, run: done.append(name))
+
+        self.assertEqual(failure.exception.stage, 'boom')
+        self.assertIsInstance(failure.exception.__cause__, RuntimeError)
+        # The stage already running when boom failed was still reported
+        self.assertEqual(done, ['slow'])
+        self.assertNotIn('after', recorder.calls)
+        self.assertEqual(failure.exception.run.results, {'slow': "slow done"})
+
+    def test_subset_keeps_only_needed_stages(self):
+        pipeline = campaign_pipeline(max_workers=2)
+
+        content = pipeline.subset(['save_newsletters'])
+        self.assertEqual(set(content.stages), {'blog', 'newsletters', 'save_newsletters'})
+
+        launch = pipeline.subset(['analysis'], provided=['blog', 'newsletters'])
+        self.assertEqual(set(launch.stages),
+                         {'blog', 'newsletters', 'contacts', 'send', 'metrics', 'analysis'})
+
+        remaining = pipeline.resumable(['blog', 'newsletters', 'alternatives'])
+        self.assertNotIn('alternatives', remaining.stages)
+        self.assertIn('contacts', remaining.stages)
+        self.assertEqual(len(CAMPAIGN_STAGES), len(pipeline.stages))
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, "test.db"))
+        self.db.create_pipeline_run("run-1", {'topic': "Testing"})
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_resume_skips_checkpointed_stages(self):
+        recorder = Recorder()
+        attempts = {'n': 0}
+
+        def flaky(ctx):
+            attempts['n'] += 1
+            if attempts['n'] == 1:
+                raise RuntimeError("temporary outage")
+            return "flaky done"
+
+        stages = [
+            Stage('first', recorder.stage('first')),
+            Stage('side', recorder.stage('side', 0.1)),
+            Stage('scratch', recorder.stage('scratch'), checkpoint=False),
+            Stage('flaky', flaky, requires=['first', 'scratch']),
+            Stage('last', recorder.stage('last'), requires=['flaky']),
+        ]
+        pipeline = Pipeline(stages)
+        with self.assertRaises(StageFailed):
+            pipeline.run(Context(), on_stage_done=checkpointer(self.db, "run-1", pipeline))
+
+        saved = self.db.get_pipeline_run("run-1")['checkpoints']
+        self.assertEqual(saved, {'first': "first done", 'side': "side done"})
+
+        recorder.calls.clear()
+        resumed = Pipeline(stages).resumable(saved)
+        run = resumed.run(Context(), results=saved,
+                          on_stage_done=checkpointer(self.db, "run-1", resumed))
+
+        # Non-checkpointed stages re-run when a remaining stage needs them
+        self.assertEqual(sorted(recorder.calls), ['last', 'scratch'])
+        self.assertEqual(run.results['last'], "last done")
+        self.assertEqual(set(self.db.get_pipeline_run("run-1")['checkpoints']),
+                         {'first', 'side', 'flaky', 'last'})
+
+    def test_resumed_send_skips_personas_already_sent(self):
+        blog_id = self.db.save_blog_post(topic="Testing", title="Title", outline="o", content="c")
+        ctx = SendContext(self.db, "run-1", blog_id, failing_persona="Creatives")
+
+        with self.assertRaises(RuntimeError):
+            send_newsletters(ctx)
+        campaign_id = self.db.get_pipeline_run_campaign("run-1")
+        self.assertEqual(self.db.get_sent_personas(campaign_id), {'founders'})
+
+        ctx.crm.failing_persona = None
+        result = send_newsletters(ctx)
+
+        self.assertEqual(result['campaign_id'], campaign_id)
+        self.assertEqual(ctx.crm.sent, ["Founders", "Creatives", "Creatives"])
+        self.assertEqual(self.db.get_sent_personas(campaign_id), {'founders', 'creatives'})
+
+
+class FakeSegmentStore:
+    def segment_contact_ids(self, persona_key, contact_map):
+        return [contact_map[persona_key]]
+
+
+class FakeCRM:
+    simulation_mode = True
+
+    def __init__(self, failing_persona=None):
+        self.failing_persona = failing_persona
+        self.sent = []
+
+    def send_email_to_segment(self, persona, contact_ids, email_content):
+        self.sent.append(persona)
+        if persona == self.failing_persona:
+            raise RuntimeError(f"send to {persona} failed")
+        return True
+
+
+class SendContext:
+    def __init__(self, db, run_id, blog_id, failing_persona=None):
+        self.db = db
+        self.run_id = run_id
+        self.crm = FakeCRM(failing_persona)
+        self.results = {
+            'blog': {'blog_id': blog_id, 'blog': {'title': "Title", 'topic': "Testing"}},
+            'contacts': {'contact_store': FakeSegmentStore(),
+                         'contact_map': {'founders': "101", 'creatives': "102"}},
+            'newsletters': {'newsletters': {'founders': {'persona': "Founders"},
+                                            'creatives': {'persona': "Creatives"}}},
+        }
+
+
+if __name__ == "__main__":
+    unittest.main()
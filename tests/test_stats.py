@@ -0,0 +1,92 @@
+import unittest
+
+import numpy as np
+
+from src.stats import (compare_segments, find_comparison, holm_adjust, two_proportion_pvalues,
+                       wilson_interval)
+
+
+class WilsonIntervalTest(unittest.TestCase):
+    def test_matches_reference_values(self):
+        # 95% Wilson intervals as tabulated by Newcombe (1998) and Agresti & Coull
+        low, high = wilson_interval([81, 5], [263, 10])
+        np.testing.assert_allclose(low, [0.2553, 0.2366], atol=1e-4)
+        np.testing.assert_allclose(high, [0.3662, 0.7634], atol=1e-4)
+
+    def test_zero_and_full_counts_stay_inside_unit_interval(self):
+        low, high = wilson_interval([0, 10], [10, 10])
+        np.testing.assert_allclose(low, [0.0, 0.7225], atol=1e-4)
+        np.testing.assert_allclose(high, [0.2775, 1.0], atol=1e-4)
+
+    def test_empty_segment_gets_uninformative_interval(self):
+        low, high = wilson_interval([0], [0])
+        self.assertEqual((low[0], high[0]), (0.0, 1.0))
+
+    def test_wider_confidence_gives_wider_interval(self):
+        low95, high95 = wilson_interval([30], [100], confidence=0.95)
+        low99, high99 = wilson_interval([30], [100], confidence=0.99)
+        self.assertLess(low99[0], low95[0])
+        self.assertGreater(high99[0], high95[0])
+
+
+class TwoProportionTest(unittest.TestCase):
+    def test_matches_pooled_z_test(self):
+        # 45/100 vs 60/100: pooled p = 0.525, z = 2.124, two-sided p = 0.0337
+        difference, p_values = two_proportion_pvalues([45, 60], [100, 100])
+        self.assertAlmostEqual(difference[0, 1], -0.15)
+        self.assertAlmostEqual(difference[1, 0], 0.15)
+        self.assertAlmostEqual(p_values[0, 1], 0.03367, places=5)
+        self.assertEqual(p_values[0, 1], p_values[1, 0])
+
+    def test_identical_proportions_are_not_different(self):
+        difference, p_values = two_proportion_pvalues([20, 40], [100, 200])
+        self.assertEqual(difference[0, 1], 0.0)
+        self.assertAlmostEqual(p_values[0, 1], 1.0)
+
+    def test_zero_counts_and_empty_segments(self):
+        difference, p_values = two_proportion_pvalues([0, 0, 5], [50, 80, 0])
+        # No successes anywhere means no variance and no evidence
+        self.assertEqual(p_values[0, 1], 1.0)
+        # An empty segment is never significant
+        self.assertEqual(p_values[0, 2], 1.0)
+        self.assertEqual(p_values[2, 1], 1.0)
+        self.assertFalse(np.isnan(difference).any())
+
+
+class HolmAdjustTest(unittest.TestCase):
+    def test_steps_down_and_keeps_order(self):
+        adjusted = holm_adjust([0.01, 0.04, 0.03, 0.005])
+        np.testing.assert_allclose(adjusted, [0.03, 0.06, 0.06, 0.02])
+
+    def test_caps_at_one_and_handles_empty(self):
+        np.testing.assert_allclose(holm_adjust([0.5, 0.6]), [1.0, 1.0])
+        self.assertEqual(len(holm_adjust([])), 0)
+
+
+class CompareSegmentsTest(unittest.TestCase):
+    def test_reports_rates_intervals_and_adjusted_comparisons(self):
+        result = compare_segments(['founders', 'creatives', 'ops'], [45, 60, 45], [100, 100, 100])
+
+        founders = result['segments'][0]
+        self.assertEqual((founders['rate'], founders['trials']), (45.0, 100))
+        self.assertLess(founders['ci_low'], 45.0)
+        self.assertGreater(founders['ci_high'], 45.0)
+
+        comparison = find_comparison(result, 'creatives', 'founders')
+        self.assertEqual(comparison['difference'], -15.0)
+        # Two tied comparisons at p = 0.0337 among three: Holm's running
+        # maximum gives both the larger factor, 3 x 0.0337
+        self.assertAlmostEqual(comparison['p_value'], 0.101, places=3)
+        self.assertEqual(find_comparison(result, 'creatives', 'ops')['p_value'],
+                         comparison['p_value'])
+        self.assertFalse(comparison['significant'])
+        self.assertEqual(find_comparison(result, 'founders', 'ops')['p_value'], 1.0)
+
+    def test_missing_comparison_defaults_to_no_difference(self):
+        result = compare_segments(['only'], [3], [10])
+        self.assertEqual(result['comparisons'], [])
+        self.assertEqual(find_comparison(result, 'only', 'other')['p_value'], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
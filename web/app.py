@@ -2,14 +2,18 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, stream_with_context
 from dotenv import load_dotenv
 from src.database import Database
-from src.content_gen import ContentGenerator
+from src.content_gen import ContentGenerator, NewsletterGenerationError
 from src.crm_manager import HubSpotManager
 from src.analytics_engine import AnalyticsEngine
 from src.optimizer import ContentOptimizer
+from src.job_queue import JobQueue
+from src.contact_store import DEFAULT_CONTACTS_PATH, ContactStore
+from src.pipeline import CampaignContext, Pipeline, PipelineRun, campaign_pipeline
 import json
+import uuid
 
 load_dotenv()
 
@@ -19,53 +23,63 @@ app.secret_key = 'novamind-secret-key-change-in-production'
 # Initialize components
 db = Database()
 generator = ContentGenerator()
-crm = HubSpotManager()
+crm = HubSpotManager(db=db)
 analytics = AnalyticsEngine(db)
 optimizer = ContentOptimizer()
+contact_store = ContactStore.from_file(
+    os.getenv('NOVAMIND_CONTACTS_PATH', DEFAULT_CONTACTS_PATH), personas=generator.personas
+)
+
+CAMPAIGN_PAGE_SIZE = 20
+MAX_CAMPAIGN_PAGE_SIZE = 100
 
 @app.route('/')
 def index():
-    campaigns = db.get_all_campaigns()
-    return render_template('index.html', campaigns=campaigns)
+    page = db.get_campaigns_page(limit=CAMPAIGN_PAGE_SIZE)
+    return render_template('index.html', campaigns=page['campaigns'],
+                           next_cursor=page['next_cursor'])
 
 @app.route('/generate')
 def generate_page():
     return render_template('generate.html')
 
+def report_progress(job, fraction: float, stage: str):
+    if job is not None:
+        job.progress(fraction, stage)
+
+def campaign_context(**inputs) -> CampaignContext:
+    return CampaignContext(db=db, generator=generator, crm=crm, analytics=analytics,
+                           optimizer=optimizer, contact_store=contact_store, **inputs)
+
+def stage_progress(job, pipeline: Pipeline, provided: dict = None):
+    """Reports each finished stage as job progress (and a cancellation point)."""
+    total = len([stage for stage in pipeline.stages if stage not in (provided or {})])
+    
+    def on_stage_done(name: str, run: PipelineRun):
+        report_progress(job, len(run.timings) / total, f"Finished {name}")
+    return on_stage_done
+
+def run_generate_content(job, topic: str, context: str = '') -> dict:
+    pipeline = campaign_pipeline().subset(['save_newsletters'])
+    report_progress(job, 0.0, 'Generating blog post')
+    run = pipeline.run(campaign_context(topic=topic, additional_context=context),
+                       on_stage_done=stage_progress(job, pipeline))
+    
+    return {
+        'blog_id': run.results['blog']['blog_id'],
+        'blog': run.results['blog']['blog'],
+        'newsletters': run.results['newsletters']['newsletters'],
+        'failures': run.results['newsletters']['failures'],
+        'timings': run.timing_report()
+    }
+
 @app.route('/api/generate-content', methods=['POST'])
 def generate_content():
     data = request.json
-    topic = data.get('topic')
-    context = data.get('context', '')
     
     try:
-        # Generate blog
-        blog_content = generator.generate_blog_post(topic, context)
-        blog_id = db.save_blog_post(
-            topic=topic,
-            title=blog_content['title'],
-            outline=blog_content['outline'],
-            content=blog_content['content']
-        )
-        
-        # Generate newsletters
-        newsletters = generator.generate_newsletter_variations(blog_content)
-        
-        for persona_key, newsletter in newsletters.items():
-            db.save_newsletter(
-                blog_id=blog_id,
-                persona=newsletter['persona'],
-                subject_line=newsletter['subject_line'],
-                preview_text=newsletter['preview_text'],
-                content=newsletter['content']
-            )
-        
-        return jsonify({
-            'success': True,
-            'blog_id': blog_id,
-            'blog': blog_content,
-            'newsletters': newsletters
-        })
+        result = run_generate_content(None, data.get('topic'), data.get('context', ''))
+        return jsonify({'success': True, **result})
     
     except Exception as e:
         return jsonify({
@@ -73,64 +87,162 @@ def generate_content():
             'error': str(e)
         }), 500
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+STREAM_JOB_TYPE = 'generate-content-stream'
+# A stream job nobody opens within this many seconds is failed
+STREAM_OPEN_TIMEOUT = int(os.getenv('NOVAMIND_STREAM_OPEN_TIMEOUT', '300'))
+
+def expire_unopened_streams():
+    # The job queue's heartbeat keeps this process's jobs alive, so stream
+    # jobs that were created but never opened have to be expired here
+    db.expire_queued_jobs(STREAM_JOB_TYPE, "Stream was never opened", STREAM_OPEN_TIMEOUT)
+
+@app.route('/api/generate-content/stream', methods=['POST'])
+def create_generate_content_stream():
+    """Records a streamed generation request; the client then opens
+    GET /api/generate-content/stream/<job_id> to run it and receive events."""
+    data = request.json or {}
+    topic = data.get('topic') or ''
+    
+    if not topic.strip():
+        return jsonify({
+            'success': False,
+            'error': 'topic is required'
+        }), 400
+    
+    expire_unopened_streams()
+    job_id = uuid.uuid4().hex
+    db.create_job(job_id, STREAM_JOB_TYPE, {'topic': topic, 'context': data.get('context', '')},
+                  owner=jobs.instance_id)
+    return jsonify({'success': True, 'job_id': job_id}), 201
+
+@app.route('/api/generate-content/stream/<job_id>')
+def generate_content_stream(job_id):
+    expire_unopened_streams()
+    job = db.get_job(job_id)
+    # Each stream runs once; a reconnecting EventSource must not generate again
+    if job is None or not db.claim_job(job_id, STREAM_JOB_TYPE, owner=jobs.instance_id):
+        return jsonify({
+            'success': False,
+            'error': 'Stream not found or already started'
+        }), 404
+    topic = job['params']['topic']
+    context = job['params'].get('context', '')
+    
+    def events():
+        finished = False
+        try:
+            blog_content = None
+            for event in generator.stream_blog_post(topic, context):
+                if event['type'] == 'token':
+                    yield sse_event('blog_token', {'text': event['text']})
+                else:
+                    blog_content = event['blog']
+            
+            blog_id = db.save_blog_post(
+                topic=topic,
+                title=blog_content['title'],
+                outline=blog_content['outline'],
+                content=blog_content['content']
+            )
+            yield sse_event('blog', {'blog_id': blog_id, 'blog': blog_content})
+            
+            newsletters = {}
+            failures = {}
+            for persona_key, newsletter, error in generator.iter_newsletter_variations(blog_content):
+                if error is None:
+                    newsletters[persona_key] = newsletter
+                    yield sse_event('newsletter', {'persona_key': persona_key, 'newsletter': newsletter})
+                else:
+                    failures[persona_key] = error
+                    yield sse_event('newsletter_error', {'persona_key': persona_key, 'error': str(error)})
+            
+            if not newsletters:
+                raise NewsletterGenerationError(failures, newsletters)
+            
+            ordered = [newsletters[key] for key in generator.personas if key in newsletters]
+            db.save_newsletters_bulk(blog_id, ordered)
+            
+            failures = {key: str(error) for key, error in failures.items()}
+            db.update_job(job_id, status='succeeded', progress=1.0,
+                          result={'blog_id': blog_id, 'failures': failures})
+            finished = True
+            yield sse_event('done', {'blog_id': blog_id, 'failures': failures})
+        
+        except Exception as e:
+            db.update_job(job_id, status='failed', error=str(e))
+            finished = True
+            yield sse_event('error', {'error': str(e)})
+        finally:
+            # A client disconnect closes the generator with GeneratorExit,
+            # which the handler above does not see
+            if not finished:
+                db.update_job(job_id, status='cancelled', error='Client disconnected')
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def newsletters_by_persona(blog_id: int):
+    """Maps a blog's saved newsletters to persona keys.
+
+    Returns (newsletters, unmapped), where unmapped holds a reason for each
+    newsletter whose persona is not in personas.json. Two newsletters that
+    map to the same persona are ambiguous and raise ValueError.
+    """
+    newsletters = {}
+    unmapped = {}
+    for newsletter in db.get_newsletters_for_blog(blog_id):
+        persona_key = contact_store.persona_key(newsletter['persona'])
+        if persona_key is None:
+            unmapped[newsletter['persona']] = "Unknown persona; newsletter not sent"
+            continue
+        if persona_key in newsletters:
+            raise ValueError(
+                f"Newsletters {newsletters[persona_key]['id']} and {newsletter['id']} both map "
+                f"to persona '{persona_key}'; remove one before launching"
+            )
+        newsletters[persona_key] = newsletter
+    return newsletters, unmapped
+
+def run_launch_campaign(job, blog_id: int) -> dict:
+    blog = db.get_blog_post(blog_id)
+    if blog is None:
+        raise ValueError(f"Blog post {blog_id} not found")
+    newsletters, unmapped = newsletters_by_persona(blog_id)
+    for persona, reason in unmapped.items():
+        print(f"⚠️  Skipping newsletter for '{persona}': {reason}")
+    if not newsletters:
+        raise ValueError(f"Blog post {blog_id} has no newsletters for a known persona")
+    
+    # Content already exists; run the launch half of the campaign graph
+    # starting from it
+    provided = {
+        'blog': {'blog_id': blog_id, 'blog': blog},
+        'newsletters': {'newsletters': newsletters, 'failures': unmapped}
+    }
+    pipeline = campaign_pipeline().subset(['analysis'], provided=provided)
+    report_progress(job, 0.0, 'Syncing contacts')
+    run = pipeline.run(campaign_context(), results=provided,
+                       on_stage_done=stage_progress(job, pipeline, provided))
+    
+    return {
+        'campaign_id': run.results['send']['campaign_id'],
+        'skipped_personas': unmapped,
+        'analysis': run.results['analysis'],
+        'timings': run.timing_report()
+    }
+
 @app.route('/api/launch-campaign', methods=['POST'])
 def launch_campaign():
     data = request.json
-    blog_id = data.get('blog_id')
     
     try:
-        # Load contacts
-        with open('data/mock_contacts.json', 'r') as f:
-            contacts = json.load(f)['contacts']
-        
-        # Create contacts in HubSpot
-        contact_map = crm.bulk_create_contacts(contacts)
-        
-        # Group by persona
-        contacts_by_persona = {}
-        for contact in contacts:
-            persona = contact['persona']
-            if persona not in contacts_by_persona:
-                contacts_by_persona[persona] = []
-            if contact['email'] in contact_map:
-                contacts_by_persona[persona].append(contact_map[contact['email']])
-        
-        # Get blog and newsletters
-        blog = db.get_blog_post(blog_id)
-        newsletters = db.get_newsletters_for_blog(blog_id)
-        
-        # Create campaign
-        campaign_name = f"{blog['title']}"
-        campaign_id = db.create_campaign(blog_id, campaign_name)
-        
-        # Send newsletters
-        for newsletter in newsletters:
-            persona_key = newsletter['persona'].lower().split()[0]
-            contact_ids = contacts_by_persona.get(persona_key, [])
-            
-            if contact_ids:
-                crm.send_email_to_segment(
-                    persona=newsletter['persona'],
-                    contact_ids=contact_ids,
-                    email_content=newsletter
-                )
-        
-        # Generate metrics
-        metrics_by_persona = {}
-        for newsletter in newsletters:
-            persona_key = newsletter['persona'].lower().split()[0]
-            metrics = crm.generate_simulated_stats(persona_key)
-            db.save_performance_metrics(campaign_id, persona_key, metrics)
-            metrics_by_persona[persona_key] = metrics
-        
-        # Analyze
-        analysis = analytics.analyze_campaign_performance(campaign_id, metrics_by_persona)
-        
-        return jsonify({
-            'success': True,
-            'campaign_id': campaign_id,
-            'analysis': analysis
-        })
+        result = run_launch_campaign(None, data.get('blog_id'))
+        return jsonify({'success': True, **result})
     
     except Exception as e:
         return jsonify({
@@ -138,15 +250,85 @@ def launch_campaign():
             'error': str(e)
         }), 500
 
+jobs = JobQueue(db, workers=int(os.getenv('NOVAMIND_JOB_WORKERS', '4')))
+jobs.register('generate-content', run_generate_content)
+jobs.register('launch-campaign', run_launch_campaign)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    data = request.json or {}
+    
+    try:
+        job_id = jobs.submit(data.get('type'), data.get('params', {}))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if jobs.get(job_id) is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    return jsonify({'success': jobs.cancel(job_id)})
+
 @app.route('/analytics')
 def analytics_page():
-    campaigns = db.get_all_campaigns()
-    return render_template('analytics.html', campaigns=campaigns)
+    page = db.get_campaigns_page(limit=CAMPAIGN_PAGE_SIZE)
+    return render_template('analytics.html', campaigns=page['campaigns'],
+                           next_cursor=page['next_cursor'], personas=generator.personas)
+
+@app.route('/api/campaigns')
+def list_campaigns():
+    limit = request.args.get('limit', CAMPAIGN_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_CAMPAIGN_PAGE_SIZE))
+    
+    try:
+        page = db.get_campaigns_page(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            topic=request.args.get('topic'),
+            status=request.args.get('status')
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return jsonify(page)
+
+@app.route('/api/analytics/cross-campaign')
+def cross_campaign_analytics():
+    months = request.args.get('months', 6, type=int)
+    persona = request.args.get('persona') or None
+    return jsonify(analytics.cross_campaign_report(months=months or None, persona=persona))
+
+@app.route('/api/llm/stats')
+def llm_stats():
+    return jsonify(generator.llm.stats())
 
 @app.route('/api/campaign/<int:campaign_id>')
 def get_campaign_details(campaign_id):
     metrics = db.get_campaign_performance(campaign_id)
-    return jsonify({'metrics': metrics})
+    # AI insights as of the last background refresh, if any
+    insights = db.get_campaign_insights(campaign_id)
+    return jsonify({'metrics': metrics, 'insights': insights['insights'] if insights else None})
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file